@@ -0,0 +1,147 @@
+"""
+Отрисовка графика курса: прежняя фигура на каждый вызов против шаблонов
+ChartGenerator (фигура на пару валюта/период, меняются только данные).
+
+Каждый путь меряется в отдельном процессе, чтобы пиковый RSS одного не
+смешивался с другим. Данные — синтетические замеры раз в 5 минут; для
+месяца их больше ширины графика, и в силу вступает прореживание LTTB.
+
+Запуск:
+    python -m benchmarks.chart_render
+    python -m benchmarks.chart_render --renders 100 --period week --out /tmp/charts
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from services.chart_prerender import PERIOD_HOURS
+from services.rate_columns import RateWindow
+
+
+def make_window(period: str, step: int = 300, shift: int = 0) -> RateWindow:
+    """
+    Окно замеров раз в step секунд: случайное блуждание курса с шагом в
+    копейку. shift сдвигает окно на столько замеров вперёд по тому же ряду
+    """
+    end = int(datetime(2024, 6, 1).timestamp()) + shift * step
+    count = PERIOD_HOURS[period] * 3600 // step
+    rng = random.Random(42)
+    value, series = 41.0, []
+    for _ in range(count + shift):
+        value += rng.choice((-0.01, 0.0, 0.0, 0.01))
+        series.append(round(value, 2))
+    
+    timestamps = array('q', range(end - count * step, end, step))
+    buy = array('d', series[shift:])
+    sell = array('d', (value + 0.5 for value in buy))
+    return RateWindow(timestamps, buy, sell)
+
+
+# === ПРЕЖНИЙ ПУТЬ ===
+# generate_rate_chart до шаблонов: фигура, оси и оформление на каждый вызов
+def old_render(currency: str, data: RateWindow, period: str):
+    import io
+    import numpy as np
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+    from services.charts import chart_generator
+    
+    colors = chart_generator.colors
+    timestamps = [datetime.fromtimestamp(ts) for ts in data.timestamps]
+    buy_rates = np.frombuffer(data.buy, dtype=np.float64)
+    sell_rates = np.frombuffer(data.sell, dtype=np.float64)
+    
+    fig, ax = plt.subplots(figsize=(12, 6), facecolor='#f8f9fa')
+    ax.set_facecolor('#ffffff')
+    ax.plot(timestamps, buy_rates, label='Покупка', color=colors.get(currency, '#2ecc71'),
+            linewidth=2.5, marker='o', markersize=4)
+    ax.plot(timestamps, sell_rates, label='Продажа', color=colors['line'],
+            linewidth=2.5, marker='s', markersize=4, linestyle='--')
+    ax.fill_between(timestamps, buy_rates, sell_rates, alpha=0.2,
+                    color=colors.get(currency, '#2ecc71'))
+    
+    period_titles = {'day': 'День', 'week': 'Тиждень', 'month': 'Місяць'}
+    ax.set_title(f'Динаміка курсу {currency}/UAH за {period_titles.get(period, "період")}',
+                 fontsize=16, fontweight='bold', pad=20)
+    ax.set_xlabel('Час', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Курс (₴)', fontsize=12, fontweight='bold')
+    if period == 'day':
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+        ax.xaxis.set_major_locator(mdates.HourLocator(interval=2))
+    elif period == 'week':
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d.%m'))
+        ax.xaxis.set_major_locator(mdates.DayLocator(interval=1))
+    else:
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d.%m'))
+        ax.xaxis.set_major_locator(mdates.DayLocator(interval=3))
+    plt.xticks(rotation=45, ha='right')
+    ax.grid(True, alpha=0.3, linestyle='--', linewidth=0.5)
+    ax.legend(loc='upper left', frameon=True, shadow=True, fontsize=11)
+    
+    textstr = f'Поточний курс:\nПокупка: {buy_rates[-1]:.2f} ₴\nПродаж: {sell_rates[-1]:.2f} ₴'
+    ax.text(0.02, 0.98, textstr, transform=ax.transAxes, fontsize=10,
+            verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
+    plt.tight_layout()
+    
+    buf = io.BytesIO()
+    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='#f8f9fa')
+    buf.seek(0)
+    plt.close(fig)
+    return buf
+
+
+# === НОВЫЙ ПУТЬ ===
+def new_render(currency: str, data: RateWindow, period: str):
+    from services.charts import chart_generator
+    return chart_generator.generate_rate_chart(currency, data, period)
+
+
+PATHS = {'прежний': old_render, 'шаблоны': new_render}
+
+
+def _run(path: str, period: str, renders: int, out: str) -> tuple:
+    """В отдельном процессе: рендеров в секунду и пиковый RSS, МБ"""
+    render = PATHS[path]
+    # Окна сдвигаются на замер: каждый вызов рисует новые данные
+    windows = [make_window(period, shift=i) for i in range(renders)]
+    render('USD', windows[0], period)  # импорт matplotlib и шрифты — вне замера
+    
+    started = time.perf_counter()
+    for window in windows:
+        png = render('USD', window, period)
+    elapsed = time.perf_counter() - started
+    
+    if out:
+        os.makedirs(out, exist_ok=True)
+        with open(os.path.join(out, f'{path}_{period}.png'), 'wb') as f:
+            f.write(png.getvalue())
+    
+    # ru_maxrss в Linux — в КБ
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return renders / elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--renders', type=int, default=30)
+    parser.add_argument('--period', choices=list(PERIOD_HOURS), default='day')
+    parser.add_argument('--out', help='папка для последнего PNG каждого пути')
+    args = parser.parse_args()
+    
+    print(f"период {args.period}, замеров в окне: {len(make_window(args.period))}")
+    print(f"{'путь':10} {'рендеров/с':>11} {'пик RSS, МБ':>12}")
+    context = multiprocessing.get_context('spawn')
+    for path in PATHS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            rate, peak = executor.submit(_run, path, args.period, args.renders, args.out).result()
+        print(f"{path:10} {rate:11.2f} {peak:12.1f}")
+
+
+if __name__ == '__main__':
+    main()
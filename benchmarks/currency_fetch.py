@@ -0,0 +1,97 @@
+"""
+Задержка запроса курсов: новая ClientSession на каждый запрос (как было)
+против общей сессии CurrencyAPI с keep-alive, и весь путь get_all_rates.
+
+По умолчанию запросы идут на локальную замену банков
+(benchmarks/provider_server.py; без TLS, поэтому выигрыш сессии здесь —
+только TCP и её создание). С --url сессии меряются на настоящем банке,
+где к этому добавляются DNS и TLS-рукопожатие.
+
+Запуск:
+    python -m benchmarks.currency_fetch
+    python -m benchmarks.currency_fetch --latency 150 --jitter 100 --errors 0.1 --throttle 0.05
+    python -m benchmarks.currency_fetch --url https://api.privatbank.ua/p24api/pubinfo?exchange&coursid=5 --requests 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+import aiohttp
+
+from benchmarks.provider_server import ProviderStandIn
+from services.currency_api import PROVIDER_PATHS, PROVIDERS, CurrencyAPI, TokenBucket
+
+
+async def _fetch_per_request(url: str):
+    """Старый _fetch: сессия и соединение создаются заново"""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url, timeout=10) as response:
+            return await response.json()
+
+
+async def _measure(fetch, url: str, requests: int) -> list:
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await fetch(url)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list):
+    ordered = sorted(timings)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    print(f"{label:22} медиана {statistics.median(ordered):8.2f} мс   "
+          f"p95 {p95:8.2f} мс   первый {timings[0]:8.2f} мс")
+
+
+async def _measure_all_rates(api: CurrencyAPI, requests: int) -> tuple:
+    """Весь путь: параллельный опрос трёх банков, разбор, отметки свежести"""
+    timings = []
+    statuses = Counter()
+    for _ in range(requests):
+        started = time.perf_counter()
+        rates = await api.get_all_rates(max_age=0)
+        timings.append((time.perf_counter() - started) * 1000)
+        statuses.update(mark['status'] for mark in rates['sources'].values())
+    return timings, statuses
+
+
+async def run(args):
+    stand_in = ProviderStandIn(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                               errors=args.errors, throttle=args.throttle)
+    base_url = await stand_in.start()
+    url = args.url or base_url + PROVIDER_PATHS['privatbank']
+    
+    api = CurrencyAPI(base_urls={name: base_url for name in PROVIDERS})
+    # Лимиты настоящих банков к замене не относятся
+    api.buckets = {name: TokenBucket(rate=1e6, capacity=1e6) for name in PROVIDERS}
+    try:
+        _report('сессия на запрос', await _measure(_fetch_per_request, url, args.requests))
+        _report('общая сессия', await _measure(api._fetch, url, args.requests))
+        
+        timings, statuses = await _measure_all_rates(api, args.requests)
+        _report('get_all_rates', timings)
+        print(f"отметки банков: {dict(statuses)}; замена: {stand_in.stats}")
+    finally:
+        await api.close()
+        await stand_in.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='адрес для замера (по умолчанию локальный сервер)')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0, help='задержка замены, мс')
+    parser.add_argument('--jitter', type=float, default=0, help='разброс задержки, ±мс')
+    parser.add_argument('--errors', type=float, default=0, help='доля ответов 500')
+    parser.add_argument('--throttle', type=float, default=0, help='доля ответов 429')
+    args = parser.parse_args()
+    
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Разбор ответов банков: прежний обход списка словарей против разбора в
+индекс котировок (services/provider_payloads.py).
+
+Ответы берутся из benchmarks/payloads/ (та же форма, что у настоящих
+API; обновить записи — python -m benchmarks.provider_server --record).
+Парсер JSON нового пути — orjson, если он установлен.
+
+Запуск:
+    python -m benchmarks.provider_decoding
+    python -m benchmarks.provider_decoding --repeat 20000
+"""
+import argparse
+import json
+import os
+import time
+
+from services import provider_payloads
+from services.provider_payloads import decode_mono, decode_nbu, decode_privat
+
+
+PAYLOADS_DIR = os.path.join(os.path.dirname(__file__), 'payloads')
+CURRENCIES = ['USD', 'EUR']
+
+
+# === ПРЕЖНИЙ ПУТЬ ===
+# Циклы из прежних get_*_rates; aiohttp response.json() — это json.loads
+def old_nbu(raw: bytes) -> dict:
+    rates = {}
+    for item in json.loads(raw.decode('utf-8')):
+        if item.get('cc') in ['USD', 'EUR']:
+            rates[item['cc']] = {'rate': round(item.get('rate', 0), 2), 'source': 'nbu'}
+    return rates
+
+
+def old_mono(raw: bytes) -> dict:
+    rates = {}
+    currency_codes = {840: 'USD', 978: 'EUR'}
+    for item in json.loads(raw.decode('utf-8')):
+        currency_code = item.get('currencyCodeA')
+        base_code = item.get('currencyCodeB')
+        if currency_code in currency_codes and base_code == 980:
+            rates[currency_codes[currency_code]] = {
+                'buy': round(item.get('rateBuy', 0), 2),
+                'sell': round(item.get('rateSell', 0), 2),
+                'source': 'monobank'
+            }
+    return rates
+
+
+def old_privat(raw: bytes) -> dict:
+    rates = {}
+    for item in json.loads(raw.decode('utf-8')):
+        currency = item.get('ccy')
+        if currency in ['USD', 'EUR']:
+            rates[currency] = {
+                'buy': round(float(item.get('buy', 0)), 2),
+                'sell': round(float(item.get('sale', 0)), 2),
+                'source': 'privatbank'
+            }
+    return rates
+
+
+# === НОВЫЙ ПУТЬ ===
+# Как в CurrencyAPI.get_*_rates: индекс за один проход и выбор по коду
+def new_nbu(raw: bytes) -> dict:
+    index = decode_nbu(raw)
+    return {
+        code: {'rate': round(index.get(code).rate, 2), 'source': 'nbu'}
+        for code in CURRENCIES
+        if index.get(code) is not None and index.get(code).rate is not None
+    }
+
+
+def new_mono(raw: bytes) -> dict:
+    index = decode_mono(raw)
+    return {
+        code: {'buy': round(index.get(code).buy, 2),
+               'sell': round(index.get(code).sell, 2), 'source': 'monobank'}
+        for code in CURRENCIES
+        if index.get(code) is not None and index.get(code).buy is not None
+        and index.get(code).sell is not None
+    }
+
+
+def new_privat(raw: bytes) -> dict:
+    index = decode_privat(raw)
+    return {
+        code: {'buy': round(index.get(code).buy, 2),
+               'sell': round(index.get(code).sell, 2), 'source': 'privatbank'}
+        for code in CURRENCIES if index.get(code) is not None
+    }
+
+
+CASES = {
+    'nbu': (old_nbu, new_nbu),
+    'monobank': (old_mono, new_mono),
+    'privatbank': (old_privat, new_privat)
+}
+
+
+def _per_second(func, raw: bytes, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(raw)
+    return repeat / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5000)
+    args = parser.parse_args()
+    
+    decoder = 'orjson' if 'orjson' in vars(provider_payloads) else 'json'
+    print(f"парсер нового пути: {decoder}")
+    print(f"{'банк':12} {'байт':>7} {'прежний/с':>11} {'новый/с':>11} {'ускорение':>10}")
+    
+    for name, (old, new) in CASES.items():
+        with open(os.path.join(PAYLOADS_DIR, f'{name}.json'), 'rb') as f:
+            raw = f.read()
+        assert old(raw) == new(raw), name
+        
+        old_rate = _per_second(old, raw, args.repeat)
+        new_rate = _per_second(new, raw, args.repeat)
+        print(f"{name:12} {len(raw):7} {old_rate:11.0f} {new_rate:11.0f} {new_rate / old_rate:9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
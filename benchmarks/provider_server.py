@@ -0,0 +1,168 @@
+"""
+Локальная замена API НБУ, Monobank и PrivatBank для прогонов без сети.
+
+Отдаёт записанные ответы из benchmarks/payloads/ по тем же путям, что и
+настоящие API, поэтому боту достаточно направить на неё адреса банков.
+Умеет добавлять задержку, ошибки 500 и ответы 429 (лимит запросов), а в
+режиме --record ходит в настоящие API и сохраняет их ответы в payloads.
+
+Запуск:
+    python -m benchmarks.provider_server --port 8080 --latency 200 --errors 0.1 --throttle 0.05
+    python -m benchmarks.provider_server --record
+
+Бот против замены:
+    NBU_BASE_URL=http://127.0.0.1:8080 MONOBANK_BASE_URL=http://127.0.0.1:8080 \\
+    PRIVATBANK_BASE_URL=http://127.0.0.1:8080 python bot.py
+"""
+import argparse
+import asyncio
+import os
+import random
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp import web
+
+from config import MONOBANK_BASE_URL, NBU_BASE_URL, PRIVATBANK_BASE_URL
+from services.currency_api import PROVIDER_PATHS
+
+
+PAYLOADS_DIR = os.path.join(os.path.dirname(__file__), 'payloads')
+
+# Настоящие адреса для --record (переменные окружения не должны
+# указывать на саму замену)
+UPSTREAM_URLS = {
+    'nbu': NBU_BASE_URL,
+    'monobank': MONOBANK_BASE_URL,
+    'privatbank': PRIVATBANK_BASE_URL
+}
+
+
+class ProviderStandIn:
+    """
+    Сервер-замена банков. latency и jitter — в секундах; errors и
+    throttle — доли запросов, на которые приходит 500 и 429.
+    """
+    
+    def __init__(self, payloads_dir: str = PAYLOADS_DIR, latency: float = 0.0,
+                 jitter: float = 0.0, errors: float = 0.0, throttle: float = 0.0,
+                 record: bool = False, upstream: Optional[Dict[str, str]] = None):
+        self.payloads_dir = payloads_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.errors = errors
+        self.throttle = throttle
+        self.record = record
+        self.upstream = {**UPSTREAM_URLS, **(upstream or {})}
+        
+        self.stats = {name: {'ok': 0, 'error': 0, 'throttled': 0} for name in PROVIDER_PATHS}
+        self._payloads: Dict[str, bytes] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self._client: Optional[aiohttp.ClientSession] = None
+    
+    # === ОТВЕТЫ ===
+    def _payload_path(self, name: str) -> str:
+        return os.path.join(self.payloads_dir, f'{name}.json')
+    
+    def _replay(self, name: str) -> bytes:
+        if name not in self._payloads:
+            with open(self._payload_path(name), 'rb') as f:
+                self._payloads[name] = f.read()
+        return self._payloads[name]
+    
+    async def _record(self, name: str) -> bytes:
+        """Ответ настоящего API; сохраняется как новая запись"""
+        if self._client is None:
+            self._client = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        
+        url = self.upstream[name].rstrip('/') + PROVIDER_PATHS[name]
+        async with self._client.get(url) as response:
+            response.raise_for_status()
+            body = await response.read()
+        
+        tmp_path = f"{self._payload_path(name)}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, self._payload_path(name))
+        self._payloads[name] = body
+        print(f"Записан ответ {name}: {len(body)} байт")
+        return body
+    
+    def _handler(self, name: str):
+        async def handle(request: web.Request) -> web.Response:
+            delay = self.latency + random.uniform(-self.jitter, self.jitter)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            roll = random.random()
+            if roll < self.throttle:
+                self.stats[name]['throttled'] += 1
+                return web.json_response({'errorDescription': 'Too many requests'}, status=429)
+            if roll < self.throttle + self.errors:
+                self.stats[name]['error'] += 1
+                return web.json_response({'error': 'stand-in failure'}, status=500)
+            
+            body = await self._record(name) if self.record else self._replay(name)
+            self.stats[name]['ok'] += 1
+            return web.Response(body=body, content_type='application/json')
+        
+        return handle
+    
+    # === СЕРВЕР ===
+    def app(self) -> web.Application:
+        app = web.Application()
+        for name, path in PROVIDER_PATHS.items():
+            app.router.add_get(urlsplit(path).path, self._handler(name))
+        return app
+    
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Запустить сервер; возвращает адрес для *_BASE_URL"""
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+    
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+async def serve(stand_in: ProviderStandIn, host: str, port: int):
+    base_url = await stand_in.start(host, port)
+    print(f"Замена банков: {base_url} ({', '.join(PROVIDER_PATHS)})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stand_in.stop()
+        print(f"Ответы: {stand_in.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--payloads', default=PAYLOADS_DIR, help='папка с записанными ответами')
+    parser.add_argument('--latency', type=float, default=0, help='задержка ответа, мс')
+    parser.add_argument('--jitter', type=float, default=0, help='разброс задержки, ±мс')
+    parser.add_argument('--errors', type=float, default=0, help='доля ответов 500')
+    parser.add_argument('--throttle', type=float, default=0, help='доля ответов 429')
+    parser.add_argument('--record', action='store_true', help='брать ответы у настоящих API и записывать')
+    args = parser.parse_args()
+    
+    stand_in = ProviderStandIn(args.payloads, args.latency / 1000, args.jitter / 1000,
+                               args.errors, args.throttle, args.record)
+    try:
+        asyncio.run(serve(stand_in, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
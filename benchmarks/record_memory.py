@@ -0,0 +1,76 @@
+"""
+Память на запись: словари с ISO-строками против записей со __slots__.
+
+Запуск:
+    python -m benchmarks.record_memory
+    python -m benchmarks.record_memory --count 200000
+"""
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+from services.records import Alert, ExchangerRate, RateSample
+
+
+START = datetime(2024, 1, 1)
+
+
+def _sample_dict(i: int) -> dict:
+    return {
+        'buy': 41.0 + i % 100 / 100,
+        'sell': 41.5 + i % 100 / 100,
+        'timestamp': (START + timedelta(minutes=5 * i)).isoformat()
+    }
+
+
+def _alert_dict(i: int) -> dict:
+    return {
+        'id': i,
+        'currency': 'USD' if i % 2 else 'EUR',
+        'type': 'price',
+        'threshold': 40.0 + i % 50 / 10,
+        'active': True,
+        'created': (START + timedelta(seconds=i)).isoformat()
+    }
+
+
+def _rate_dict(i: int) -> dict:
+    return {
+        'buy': 41.0 + i % 100 / 100,
+        'sell': 41.5 + i % 100 / 100,
+        'updated': (START + timedelta(seconds=i)).isoformat()
+    }
+
+
+CASES = {
+    'RateSample': (_sample_dict, RateSample.from_dict),
+    'Alert': (_alert_dict, Alert.from_dict),
+    'ExchangerRate': (_rate_dict, ExchangerRate.from_dict)
+}
+
+
+def _bytes_per_item(build, count: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    
+    # Список общий для обоих вариантов — его восемь байт на элемент не считаем
+    return (after - before) / len(items) - 8
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=100_000)
+    args = parser.parse_args()
+    
+    print(f"{'запись':14} {'dict, Б':>9} {'slots, Б':>9} {'экономия':>9}")
+    for name, (make_dict, decode) in CASES.items():
+        as_dict = _bytes_per_item(make_dict, args.count)
+        as_record = _bytes_per_item(lambda i: decode(make_dict(i)), args.count)
+        print(f"{name:14} {as_dict:9.0f} {as_record:9.0f} {1 - as_record / as_dict:9.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Бенчмарк операций хранилища на всех бэкендах при разном числе пользователей.
+
+Запуск:
+    python -m benchmarks.storage_backends --users 1000 10000 100000
+    python -m benchmarks.storage_backends --backends memory sqlite --users 10000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from services.memory_storage import InMemoryStorage
+from services.sqlite_storage import SQLiteStorage
+from services.storage import Storage
+
+
+BACKENDS = {
+    'memory': lambda path: InMemoryStorage(),
+    'json': lambda path: Storage(data_dir=path),
+    'sqlite': lambda path: SQLiteStorage(data_dir=path)
+}
+
+
+def _fill(backend, users: int):
+    """Каждому третьему пользователю — оповещение, как в живой базе"""
+    with backend.deferred_writes():
+        for uid in range(users):
+            backend.set_user_language(uid, 'ru' if uid % 3 else 'uk')
+            if uid % 3 == 0:
+                backend.add_alert(uid, 'USD', 'price', 40.0 + uid % 5)
+        for i in range(2000):
+            backend.save_rate('bench', 'USD', 41.0 + i % 10 / 10, 41.5 + i % 10 / 10)
+
+
+def _rate(func, calls: int, users: int) -> float:
+    started = time.perf_counter()
+    for i in range(calls):
+        func(i * 7919 % users)
+    return calls / (time.perf_counter() - started)
+
+
+def _scan(func) -> float:
+    """Время полного прохода по итератору, мс"""
+    started = time.perf_counter()
+    for _ in func():
+        pass
+    return (time.perf_counter() - started) * 1000
+
+
+def run(name: str, users: int, calls: int, tmp: str) -> dict:
+    path = os.path.join(tmp, f"{name}-{users}")
+    backend = BACKENDS[name](path)
+    
+    started = time.perf_counter()
+    _fill(backend, users)
+    fill = time.perf_counter() - started
+    
+    # Записи и тяжёлые чтения дороже — им меньше итераций
+    writes = max(calls // 20, 1)
+    heavy = max(calls // 10, 1)
+    
+    result = {
+        'fill, с': fill,
+        # Обменники
+        'get_exchangers/с': _rate(lambda _: backend.get_exchangers(), calls, users),
+        'get_exchanger_by_id/с': _rate(lambda uid: backend.get_exchanger_by_id(uid % 10 + 1),
+                                       calls, users),
+        'add_exchanger/с': _rate(lambda uid: backend.add_exchanger(
+                                     f"Bench {uid}", "вул. Тестова, 1", "Центр", 50.4, 30.6),
+                                 writes, users),
+        'update_exchanger_rate/с': _rate(lambda uid: backend.update_exchanger_rate(
+                                             uid % 10 + 1, 'USD', 41.0, 41.5),
+                                         writes, users),
+        # История курсов
+        'save_rate/с': _rate(lambda uid: backend.save_rate('bench', 'EUR', 44.0, 44.5),
+                             writes, users),
+        'get_rate_window/с': _rate(lambda _: backend.get_rate_window('USD', 'bench', 24),
+                                   heavy, users),
+        'get_rate_history/с': _rate(lambda _: backend.get_rate_history('USD', 'bench', 24),
+                                    heavy, users),
+        # Пользователи
+        'get_user_language/с': _rate(backend.get_user_language, calls, users),
+        'set_user_language/с': _rate(lambda uid: backend.set_user_language(uid, 'uk'),
+                                     writes, users),
+        'get_all_users, мс': _scan(backend.get_all_users),
+        'iter_user_languages, мс': _scan(backend.iter_user_languages),
+        # Оповещения
+        'get_user_alerts/с': _rate(backend.get_user_alerts, calls, users),
+        'add_alert/с': _rate(lambda uid: backend.add_alert(uid, 'EUR', 'percent', 1.0),
+                             writes, users),
+        'delete_alert/с': _rate(lambda uid: backend.delete_alert(uid, 1), writes, users),
+        'iter_all_alerts, мс': _scan(backend.iter_all_alerts)
+    }
+    backend.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS),
+                        default=list(BACKENDS))
+    parser.add_argument('--calls', type=int, default=5000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for users in args.users:
+            results = {name: run(name, users, args.calls, tmp) for name in args.backends}
+            
+            print(f"\n{users} пользователей")
+            print(f"{'':26}" + "".join(f"{name:>14}" for name in results))
+            for metric in next(iter(results.values())):
+                row = "".join(f"{results[name][metric]:14.1f}" for name in results)
+                print(f"{metric:26}{row}")
+
+
+if __name__ == '__main__':
+    main()
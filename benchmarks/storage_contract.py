@@ -0,0 +1,110 @@
+"""
+Проверка контракта StorageBackend на всех реализациях хранилища.
+
+Запуск:
+    python -m benchmarks.storage_contract
+"""
+import tempfile
+from datetime import datetime, timedelta
+
+from services.backend import StorageBackend
+from services.memory_storage import InMemoryStorage
+from services.records import Alert, Exchanger, RateSample
+from services.sqlite_storage import SQLiteStorage
+from services.storage import Storage
+
+
+def check_contract(backend: StorageBackend):
+    """Общее поведение, на которое рассчитывают бот и хендлеры"""
+    assert isinstance(backend, StorageBackend), type(backend).__name__
+    
+    # Обменники
+    exchangers = backend.get_exchangers()
+    assert exchangers, "нет обменников по умолчанию"
+    assert all(isinstance(ex, Exchanger) for ex in exchangers)
+    added = backend.add_exchanger("Тест", "вул. Тестова, 1", "Центр", 50.0, 30.0)
+    assert added.id == max(ex.id for ex in exchangers) + 1
+    before = backend.get_exchanger_by_id(added.id)
+    backend.update_exchanger_rate(added.id, 'USD', 41.0, 41.5)
+    rates = backend.get_exchanger_by_id(added.id).rates['USD']
+    assert (rates.buy, rates.sell) == (41.0, 41.5)
+    # Выданная раньше запись не меняется под читателем
+    assert before.rates['USD'].buy is None
+    assert backend.get_exchanger_by_id(-1) is None
+    
+    # История курсов
+    assert len(backend.get_rate_window('USD', 'contract', 24)) == 0
+    with backend.deferred_writes():
+        for i in range(5):
+            backend.save_rate('contract', 'USD', 41.0 + i, 41.5 + i)
+    window = backend.get_rate_window('USD', 'contract', 24)
+    assert len(window) == 5 and window.sell[-1] == 45.5
+    history = backend.get_rate_history('USD', 'contract', 24)
+    assert all(isinstance(r, RateSample) for r in history)
+    assert [r.buy for r in history] == [41.0, 42.0, 43.0, 44.0, 45.0]
+    # Длинные периоды отдаются свечами: закрытие — последний замер
+    assert backend.get_rate_window('USD', 'contract', 24 * 30).sell[-1] == 45.5
+    assert backend.get_rate_window('USD', 'contract', 24 * 365).sell[-1] == 45.5
+    assert backend.compact_history() == 0
+    
+    # Все валюты одного опроса — одной записью, с общей отметкой времени
+    backend.save_rates('contract', {'USD': (46.0, 46.5), 'PLN': (10.1, 10.4)})
+    usd = backend.get_rate_window('USD', 'contract', 24)
+    pln = backend.get_rate_window('PLN', 'contract', 24)
+    assert usd.sell[-1] == 46.5 and len(pln) == 1 and pln.buy[-1] == 10.1
+    assert usd.timestamps[-1] == pln.timestamps[-1]
+    
+    # Курс пишется только при изменении: замер до начала окна остаётся
+    # действующим курсом (база изменения за 2 часа, первая точка графика)
+    now = datetime.now()
+    assert backend.get_rate_at('USD', 'contract', now).sell == 46.5
+    assert backend.get_rate_at('USD', 'contract', now - timedelta(hours=1)) is None
+    backend.import_rates([('GBP', 'contract', 52.0, 52.6, now - timedelta(hours=5))])
+    assert len(backend.get_rate_window('GBP', 'contract', 2)) == 0
+    base = backend.get_rate_at('GBP', 'contract', now - timedelta(hours=2))
+    assert (base.buy, base.sell) == (52.0, 52.6)
+    
+    # Настройки пользователей
+    assert backend.get_user_language(1) == 'uk'
+    backend.set_user_language(1, 'ru')
+    backend.set_user_language(2, 'uk')
+    assert backend.get_user_language(1) == 'ru'
+    assert sorted(backend.get_all_users()) == [1, 2]
+    assert sorted(backend.iter_user_languages()) == [(1, 'ru'), (2, 'uk')]
+    
+    # Оповещения: id уникальны и после удаления
+    first = backend.add_alert(1, 'USD', 'price', 42.0)
+    second = backend.add_alert(1, 'EUR', 'percent', 1.5)
+    assert isinstance(first, Alert)
+    backend.delete_alert(1, first.id)
+    third = backend.add_alert(1, 'USD', 'price', 43.0)
+    assert third.id not in (first.id, second.id)
+    assert [a.id for a in backend.get_user_alerts(1)] == [second.id, third.id]
+    assert backend.get_user_alerts(2) == []
+    
+    backend.delete_alert(1, second.id)
+    backend.delete_alert(1, third.id)
+    assert list(backend.iter_all_alerts()) == []
+    assert backend.get_all_alerts() == {}
+    
+    backend.add_alert(2, 'USD', 'price', 40.0)
+    assert list(backend.get_all_alerts()) == ['2']
+    
+    backend.flush()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            'memory': InMemoryStorage(),
+            'json': Storage(data_dir=f"{tmp}/json"),
+            'sqlite': SQLiteStorage(data_dir=f"{tmp}/sqlite")
+        }
+        for name, backend in backends.items():
+            check_contract(backend)
+            backend.close()
+            print(f"{name:8} OK")
+
+
+if __name__ == '__main__':
+    main()
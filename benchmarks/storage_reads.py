@@ -0,0 +1,79 @@
+"""
+Бенчмарк чтений Storage: кэш в памяти против чтения файла на каждый вызов.
+
+Запуск:
+    python -m benchmarks.storage_reads --users 10000 --reads 20000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from services.storage import Storage
+
+
+def _legacy_get_user_language(settings_file: str, user_id: int) -> str:
+    # Поведение до появления кэша: открыть и разобрать весь файл
+    with open(settings_file, 'r', encoding='utf-8') as f:
+        settings = json.load(f)
+    return settings.get(str(user_id), {}).get('language', 'uk')
+
+
+def _fill_settings(storage: Storage, users: int, legacy_file: str):
+    with storage.deferred_writes():
+        for uid in range(users):
+            storage.set_user_language(uid, 'ru' if uid % 3 else 'uk')
+    
+    # Тот же набор в старом формате: один общий файл
+    settings = {
+        str(uid): {'language': 'ru' if uid % 3 else 'uk', 'updated': '2024-01-01T00:00:00'}
+        for uid in range(users)
+    }
+    with open(legacy_file, 'w', encoding='utf-8') as f:
+        json.dump(settings, f, ensure_ascii=False, indent=2)
+
+
+def _measure(func, reads: int, users: int) -> float:
+    started = time.perf_counter()
+    for i in range(reads):
+        func(i % users)
+    elapsed = time.perf_counter() - started
+    return reads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--reads', type=int, default=20000)
+    parser.add_argument('--legacy-reads', type=int, default=200,
+                        help='старый путь медленный, ему хватит меньше итераций')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Storage(data_dir=tmp)
+        legacy_file = os.path.join(tmp, 'legacy_settings.json')
+        _fill_settings(storage, args.users, legacy_file)
+        
+        # Сбрасываем кэш, чтобы первые чтения тоже попали в замер
+        storage._cache.clear()
+        storage._cache_stamps.clear()
+        
+        cached = _measure(storage.get_user_language, args.reads, args.users)
+        legacy = _measure(
+            lambda uid: _legacy_get_user_language(legacy_file, uid),
+            args.legacy_reads,
+            args.users
+        )
+        
+        size_kb = os.path.getsize(legacy_file) / 1024
+    
+    print(f"user_settings.json: {args.users} пользователей, {size_kb:.0f} КБ "
+          f"({storage.user_shards} шардов в кэше)")
+    print(f"get_user_language (кэш):        {cached:12.0f} чтений/с")
+    print(f"get_user_language (без кэша):   {legacy:12.0f} чтений/с")
+    print(f"ускорение: x{cached / legacy:.0f}")
+
+
+if __name__ == '__main__':
+    main()
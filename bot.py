@@ -5,11 +5,14 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import BOT_TOKEN, UPDATE_INTERVAL
+from config import BOT_TOKEN, CURRENCIES
 from handlers import start_router, rates_router, alerts_router, admin_router
 from handlers.webapp import router as webapp_router
+from services.chart_pool import chart_pool
+from services.chart_prerender import chart_prerenderer
 from services.currency_api import currency_api
-from services.storage import storage
+from services.async_storage import async_storage
+from services.storage import create_storage
 
 
 logging.basicConfig(
@@ -19,38 +22,52 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def save_fresh_rates(source: str, snapshot):
+    """
+    Сохранить в историю курсы Monobank, когда они изменились (тот же
+    курс повторно не пишется — он уже в истории)
+    """
+    if source != 'monobank':
+        return
+    
+    rates = snapshot.rates
+    
+    # Все валюты из CURRENCIES — одной записью в историю за опрос
+    quotes = {
+        currency: (rates[currency]['monobank']['buy'], rates[currency]['monobank']['sell'])
+        for currency in CURRENCIES
+        if rates[currency]['monobank']
+    }
+    if quotes:
+        await async_storage.save_rates('monobank', quotes)
+        # Графики по новой истории дорисовываются в фоне до первого нажатия
+        chart_prerenderer.trigger()
+        logger.info("Курсы сохранены: " + ", ".join(
+            f"{currency} {buy}/{sell}" for currency, (buy, sell) in quotes.items()
+        ))
+
+
 async def update_rates_periodically():
     """
-    Фоновая задача для обновления курсов валют каждые 5 минут
+    Фоновая задача обновления курсов: каждый банк опрашивается в своём
+    ритме (см. CurrencyAPI.schedules), после опроса публикуется снимок
+    """
+    await currency_api.run_scheduler(on_update=save_fresh_rates)
+
+
+async def compact_history_periodically():
+    """
+    Фоновая задача для сжатия журнала истории курсов раз в час
     """
     while True:
+        await asyncio.sleep(3600)
+        
         try:
-            logger.info("Обновление курсов валют...")
-            
-            rates = await currency_api.get_all_rates()
-            
-            if rates['USD']['monobank']:
-                storage.save_rate(
-                    'monobank', 
-                    'USD',
-                    rates['USD']['monobank']['buy'],
-                    rates['USD']['monobank']['sell']
-                )
-                logger.info(f"USD сохранен: {rates['USD']['monobank']['buy']}/{rates['USD']['monobank']['sell']}")
-            
-            if rates['EUR']['monobank']:
-                storage.save_rate(
-                    'monobank',
-                    'EUR',
-                    rates['EUR']['monobank']['buy'],
-                    rates['EUR']['monobank']['sell']
-                )
-                logger.info(f"EUR сохранен: {rates['EUR']['monobank']['buy']}/{rates['EUR']['monobank']['sell']}")
-            
+            dropped = await async_storage.compact_history()
+            if dropped:
+                logger.info(f"Журнал истории сжат, удалено записей: {dropped}")
         except Exception as e:
-            logger.error(f"Ошибка при обновлении курсов: {e}")
-        
-        await asyncio.sleep(UPDATE_INTERVAL)
+            logger.error(f"Ошибка при сжатии истории: {e}")
 
 
 async def check_alerts(bot: Bot):
@@ -58,25 +75,41 @@ async def check_alerts(bot: Bot):
     Фоновая задача для проверки alerts пользователей
     """
     previous_rates = {}
+    checked_version = None
+    skipped = 0
     
     while True:
         try:
             await asyncio.sleep(300)
             
-            rates = await currency_api.get_all_rates()
-            all_alerts = storage.get_all_alerts()
+            # Опубликованный снимок, без запросов к банкам
+            snapshot = await currency_api.get_snapshot()
             
-            for user_id_str, user_alerts in all_alerts.items():
-                user_id = int(user_id_str)
-                lang = storage.get_user_language(user_id)
+            # Курсы не менялись с прошлой проверки — alerts не сработают
+            if snapshot.version == checked_version:
+                skipped += 1
+                logger.info(f"Курсы без изменений, проверка alerts пропущена (всего {skipped})")
+                continue
+            checked_version = snapshot.version
+            rates = snapshot.rates
+            # Валюты alerts, которых больше нет в CURRENCIES (и в снимке)
+            unknown = set()
+            
+            # alerts читаются потоком, шард за шардом
+            async for user_id, user_alerts in async_storage.iter_all_alerts():
+                lang = await async_storage.get_user_language(user_id)
                 
                 for alert in user_alerts:
-                    if not alert.get('active'):
+                    if not alert.active:
                         continue
                     
-                    currency = alert['currency']
-                    alert_type = alert['type']
-                    threshold = alert['threshold']
+                    currency = alert.currency
+                    alert_type = alert.type
+                    threshold = alert.threshold
+                    
+                    if currency not in rates:
+                        unknown.add(currency)
+                        continue
                     
                     current_rate = None
                     if rates[currency]['monobank']:
@@ -115,6 +148,9 @@ async def check_alerts(bot: Bot):
                     
                     previous_rates[f"{user_id}_{currency}"] = current_rate
             
+            if unknown:
+                logger.warning(f"alerts по валютам вне CURRENCIES пропущены: {', '.join(sorted(unknown))}")
+        
         except Exception as e:
             logger.error(f"Ошибка при проверке alerts: {e}")
 
@@ -125,12 +161,19 @@ async def on_startup(bot: Bot):
     """
     logger.info("Бот запущен!")
     
+    async_storage.start()
+    await currency_api.start()
+    await chart_pool.start()
+    chart_prerenderer.trigger()
     asyncio.create_task(update_rates_periodically())
     asyncio.create_task(check_alerts(bot))
+    asyncio.create_task(compact_history_periodically())
     
     try:
-        rates = await currency_api.get_all_rates()
-        logger.info(f"Первоначальная загрузка курсов: USD={rates['USD']['monobank']}, EUR={rates['EUR']['monobank']}")
+        rates = (await currency_api.refresh()).rates
+        logger.info("Первоначальная загрузка курсов: " + ", ".join(
+            f"{currency}={dict(rates[currency]['monobank'])}" for currency in CURRENCIES
+        ))
     except Exception as e:
         logger.error(f"Ошибка при первоначальной загрузке курсов: {e}")
 
@@ -140,6 +183,10 @@ async def on_shutdown(bot: Bot):
     Выполняется при остановке бота
     """
     logger.info("Бот остановлен!")
+    await async_storage.close()
+    async_storage.backend.close()
+    await currency_api.close()
+    await chart_pool.close()
     await bot.session.close()
 
 
@@ -152,6 +199,9 @@ async def main():
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     
+    # Хранилище создаётся здесь, а не при импорте модулей
+    async_storage.attach(create_storage())
+    
     storage_fsm = MemoryStorage()
     dp = Dispatcher(storage=storage_fsm)
     
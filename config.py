@@ -10,10 +10,42 @@ WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
 # Валюты для отслеживания
 CURRENCIES = ['USD', 'EUR']
 
-# Интервал обновления курсов (в секундах)
+# Интервал опроса PrivatBank (в секундах); Monobank опрашивается вдвое
+# чаще, НБУ — по расписанию публикаций (см. CurrencyAPI.schedules)
 UPDATE_INTERVAL = 300  # 5 минут
 
+# Адреса API банков; для прогонов без сети — локальная замена
+# (python -m benchmarks.provider_server) на всех трёх
+NBU_BASE_URL = os.getenv('NBU_BASE_URL', 'https://bank.gov.ua')
+MONOBANK_BASE_URL = os.getenv('MONOBANK_BASE_URL', 'https://api.monobank.ua')
+PRIVATBANK_BASE_URL = os.getenv('PRIVATBANK_BASE_URL', 'https://api.privatbank.ua')
+
 # Путь к данным
 DATA_DIR = 'data'
+
+# Хранилище: 'json' (файлы в DATA_DIR), 'sqlite' (DATA_DIR/storage.db)
+# или 'memory' (только в памяти процесса, для прогонов и бенчмарков)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json')
+
+# Формат истории курсов в JSON-хранилище: 'columnar' (колонки с mmap)
+# или 'log' (журнал JSON-строк)
+RATES_HISTORY_FORMAT = os.getenv('RATES_HISTORY_FORMAT', 'columnar')
+
+# На сколько файлов делятся настройки и alerts пользователей в JSON-хранилище
+# (число записывается в data/users/meta.json; с другим значением бот не запустится)
+USER_SHARDS = int(os.getenv('USER_SHARDS', 16))
+
+# Отрисовка графиков в отдельных процессах: число процессов, сколько
+# графиков может ждать в очереди и сколько секунд ждать один график
+CHART_WORKERS = int(os.getenv('CHART_WORKERS', 2))
+CHART_QUEUE_LIMIT = int(os.getenv('CHART_QUEUE_LIMIT', 8))
+CHART_RENDER_TIMEOUT = float(os.getenv('CHART_RENDER_TIMEOUT', 20))
+
+# Сколько секунд отрисовки за проход тратит фоновая дорисовка графиков
+# после обновления курсов (services/chart_prerender.py)
+CHART_PRERENDER_BUDGET = float(os.getenv('CHART_PRERENDER_BUDGET', 3))
+
+# Языки интерфейса (файлы в locales/)
+LANGUAGES = ['uk', 'ru']
 WEBAPP_URL = os.getenv('WEBAPP_URL', 'https://darnitsacash.netlify.app')
 
@@ -1,8 +1,9 @@
 
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from services.storage import storage
-from handlers.start import get_text
+from services.async_storage import async_storage
+from config import CURRENCIES
+from handlers.start import currency_label, get_text
 
 router = Router()
 
@@ -10,18 +11,19 @@ router = Router()
 @router.callback_query(F.data == 'show_alerts')
 async def show_alerts_menu(callback: CallbackQuery):
     user_id = callback.from_user.id
+    lang = await async_storage.get_user_language(user_id)
     
     # Получаем алерты пользователя
-    alerts = storage.get_user_alerts(user_id)
+    alerts = await async_storage.get_user_alerts(user_id)
     
     keyboard_buttons = []
     
     if alerts:
         for alert in alerts:
-            if alert.get('active'):
-                currency = alert.get('currency')
-                threshold = alert.get('threshold')
-                alert_type = alert.get('type')
+            if alert.active:
+                currency = alert.currency
+                threshold = alert.threshold
+                alert_type = alert.type
                 
                 if alert_type == 'percent':
                     text = f"🔔 {currency}: зміна >  {threshold}%"
@@ -31,30 +33,30 @@ async def show_alerts_menu(callback: CallbackQuery):
                 keyboard_buttons.append([
                     InlineKeyboardButton(
                         text=text,
-                        callback_data=f"alert_view_{alert['id']}"
+                        callback_data=f"alert_view_{alert.id}"
                     )
                 ])
     
     keyboard_buttons.append([
         InlineKeyboardButton(
-            text=get_text(user_id, 'btn_add_alert'),
+            text=get_text(lang, 'btn_add_alert'),
             callback_data="alert_add"
         )
     ])
     
     keyboard_buttons.append([
         InlineKeyboardButton(
-            text=get_text(user_id, 'btn_back'),
+            text=get_text(lang, 'btn_back'),
             callback_data="main_menu"
         )
     ])
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
     
-    alerts_text = get_text(user_id, 'alerts_menu')
+    alerts_text = get_text(lang, 'alerts_menu')
     
     if not alerts:
-        alerts_text += f"\n\n<i>{get_text(user_id, 'no_alerts')}</i>"
+        alerts_text += f"\n\n<i>{get_text(lang, 'no_alerts')}</i>"
     
     await callback.message.edit_text(
         alerts_text,
@@ -68,21 +70,21 @@ async def show_alerts_menu(callback: CallbackQuery):
 @router.callback_query(F.data == 'alert_add')
 async def alert_add_select_currency(callback: CallbackQuery):
     user_id = callback.from_user.id
+    lang = await async_storage.get_user_language(user_id)
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="💵 USD", callback_data="alertnew_USD"),
-            InlineKeyboardButton(text="💶 EUR", callback_data="alertnew_EUR")
+            InlineKeyboardButton(text=currency_label(currency), callback_data=f"alertnew_{currency}")
+            for currency in CURRENCIES
         ],
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_back'),
+                text=get_text(lang, 'btn_back'),
                 callback_data="show_alerts"
             )
         ]
     ])
     
-    lang = storage.get_user_language(user_id)
     text = "Оберіть валюту:" if lang == 'uk' else "Выберите валюту:"
     
     await callback.message.edit_text(
@@ -97,6 +99,7 @@ async def alert_add_select_currency(callback: CallbackQuery):
 @router.callback_query(F.data.startswith('alertnew_'))
 async def alert_add_type(callback: CallbackQuery):
     user_id = callback.from_user.id
+    lang = await async_storage.get_user_language(user_id)
     currency = callback.data.split('_')[1]
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -114,13 +117,12 @@ async def alert_add_type(callback: CallbackQuery):
         ],
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_back'),
+                text=get_text(lang, 'btn_back'),
                 callback_data="alert_add"
             )
         ]
     ])
     
-    lang = storage.get_user_language(user_id)
     text = f"Налаштування сповіщення для {currency}:" if lang == 'uk' else f"Настройка уведомления для {currency}:"
     
     await callback.message.edit_text(
@@ -135,6 +137,7 @@ async def alert_add_type(callback: CallbackQuery):
 @router.callback_query(F.data.startswith('alertcreate_'))
 async def alert_create(callback: CallbackQuery):
     user_id = callback.from_user.id
+    lang = await async_storage.get_user_language(user_id)
     
     parts = callback.data.split('_')
     currency = parts[1]
@@ -142,9 +145,8 @@ async def alert_create(callback: CallbackQuery):
     threshold = float(parts[3])
     
     # Создаём алерт
-    storage.add_alert(user_id, currency, alert_type, threshold)
+    await async_storage.add_alert(user_id, currency, alert_type, threshold)
     
-    lang = storage.get_user_language(user_id)
     success_text = f"✅ Сповіщення створено!\n\nВи отримаєте повідомлення, коли курс {currency} зміниться більше ніж на {threshold}%"
     
     if lang == 'ru':
@@ -153,7 +155,7 @@ async def alert_create(callback: CallbackQuery):
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_back'),
+                text=get_text(lang, 'btn_back'),
                 callback_data="show_alerts"
             )
         ]
@@ -171,27 +173,26 @@ async def alert_create(callback: CallbackQuery):
 @router.callback_query(F.data.startswith('alert_view_'))
 async def alert_view(callback: CallbackQuery):
     user_id = callback.from_user.id
+    lang = await async_storage.get_user_language(user_id)
     alert_id = int(callback.data.split('_')[2])
     
-    alerts = storage.get_user_alerts(user_id)
-    alert = next((a for a in alerts if a.get('id') == alert_id), None)
+    alerts = await async_storage.get_user_alerts(user_id)
+    alert = next((a for a in alerts if a.id == alert_id), None)
     
     if not alert:
         await callback.answer("❌ Сповіщення не знайдено")
         return
     
-    lang = storage.get_user_language(user_id)
-    
     text = f"🔔 <b>Деталі сповіщення</b>\n\n"
-    text += f"💱 Валюта: {alert['currency']}\n"
-    text += f"📊 Тип: {alert['type']}\n"
-    text += f"📈 Поріг: {alert['threshold']}\n"
+    text += f"💱 Валюта: {alert.currency}\n"
+    text += f"📊 Тип: {alert.type}\n"
+    text += f"📈 Поріг: {alert.threshold}\n"
     
     if lang == 'ru':
         text = f"🔔 <b>Детали уведомления</b>\n\n"
-        text += f"💱 Валюта: {alert['currency']}\n"
-        text += f"📊 Тип: {alert['type']}\n"
-        text += f"📈 Порог: {alert['threshold']}\n"
+        text += f"💱 Валюта: {alert.currency}\n"
+        text += f"📊 Тип: {alert.type}\n"
+        text += f"📈 Порог: {alert.threshold}\n"
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
@@ -202,7 +203,7 @@ async def alert_view(callback: CallbackQuery):
         ],
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_back'),
+                text=get_text(lang, 'btn_back'),
                 callback_data="show_alerts"
             )
         ]
@@ -222,9 +223,9 @@ async def alert_delete(callback: CallbackQuery):
     user_id = callback.from_user.id
     alert_id = int(callback.data.split('_')[2])
     
-    storage.delete_alert(user_id, alert_id)
+    await async_storage.delete_alert(user_id, alert_id)
     
-    lang = storage.get_user_language(user_id)
+    lang = await async_storage.get_user_language(user_id)
     success_text = "✅ Сповіщення видалено" if lang == 'uk' else "✅ Уведомление удалено"
     
     await callback.answer(success_text)
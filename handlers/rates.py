@@ -1,118 +1,108 @@
+import asyncio
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
 from services.currency_api import currency_api
-from services.storage import storage
-from services.charts import chart_generator
-from handlers.start import get_text
+from services.async_storage import async_storage
+from services.chart_cache import chart_cache, window_fingerprint
+from services.chart_pool import ChartQueueFull, chart_pool
+from services.chart_prerender import CHART_SOURCE, load_chart_window
+from config import CURRENCIES
+from handlers.start import CURRENCY_EMOJI, currency_label, currency_title, get_text
 from datetime import datetime, timedelta
 
 router = Router()
 
 
-def get_back_keyboard(user_id: int) -> InlineKeyboardMarkup:
+def get_back_keyboard(lang: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_back'),
+                text=get_text(lang, 'btn_back'),
                 callback_data="main_menu"
             )
         ]
     ])
 
 
+async def format_currency_block(lang: str, currency: str, quotes: dict) -> str:
+    """Курсы одной валюты по банкам и изменение продажи Monobank за 2 часа"""
+    text = f"{CURRENCY_EMOJI.get(currency, '💱')} <b>{currency_title(lang, currency)}</b>\n"
+    text += f"┣ <b>{get_text(lang, 'nbu')}:</b> {quotes['nbu']:.2f} ₴\n" if quotes['nbu'] else ""
+    
+    if quotes['monobank']:
+        text += f"┣ <b>Monobank:</b>\n"
+        text += f"┃  ├ {get_text(lang, 'buy')}: <code>{quotes['monobank']['buy']:.2f}</code> ₴\n"
+        text += f"┃  └ {get_text(lang, 'sell')}: <code>{quotes['monobank']['sell']:.2f}</code> ₴\n"
+    
+    if quotes['privatbank']:
+        text += f"┗ <b>PrivatBank:</b>\n"
+        text += f"   ├ {get_text(lang, 'buy')}: <code>{quotes['privatbank']['buy']:.2f}</code> ₴\n"
+        text += f"   └ {get_text(lang, 'sell')}: <code>{quotes['privatbank']['sell']:.2f}</code> ₴\n"
+    
+    # Изменение продажи за 2 часа. Курс пишется в историю только при
+    # изменении, поэтому база — последний замер не позже 2 часов назад
+    change = 0
+    if quotes['monobank']:
+        base = await async_storage.get_rate_at(currency, 'monobank',
+                                               datetime.now() - timedelta(hours=2))
+        if base is None:
+            # История моложе 2 часов: база — первый замер
+            history = await async_storage.get_rate_history(currency, 'monobank', hours=2)
+            base = history[0] if history else None
+        if base is not None:
+            change = round(quotes['monobank']['sell'] - base.sell, 2)
+    
+    if change != 0:
+        change_sign = "+" if change > 0 else ""
+        text += (f"📊 {get_text(lang, 'change_2h')}: {currency_api.get_trend_emoji(change)} "
+                 f"{change_sign}{change:.2f} ₴\n")
+    
+    return text
+
+
 @router.callback_query(F.data == 'show_rates')
 async def show_current_rates(callback: CallbackQuery):
     user_id = callback.from_user.id
+    lang = await async_storage.get_user_language(user_id)
     
     await callback.answer("⏳ Оновлюю курси...")
     
     try:
-        rates = await currency_api.get_all_rates()
-        
-        # Получаем историю для расчета изменений за 2 часа
-        usd_history = storage.get_rate_history('USD', 'monobank', hours=2)
-        eur_history = storage.get_rate_history('EUR', 'monobank', hours=2)
-        
-        # Рассчитываем изменение
-        usd_change = 0
-        eur_change = 0
-        
-        if len(usd_history) > 1:
-            usd_old = usd_history[0]['sell']
-            usd_new = rates['USD']['monobank'].get('sell', 0)
-            usd_change = round(usd_new - usd_old, 2) if usd_new else 0
-        
-        if len(eur_history) > 1:
-            eur_old = eur_history[0]['sell']
-            eur_new = rates['EUR']['monobank'].get('sell', 0)
-            eur_change = round(eur_new - eur_old, 2) if eur_new else 0
-        
-        # Эмодзи тренда
-        usd_emoji = currency_api.get_trend_emoji(usd_change)
-        eur_emoji = currency_api.get_trend_emoji(eur_change)
-        
-        # Форматируем сообщение
-        text = get_text(user_id, 'current_rates', time=rates['timestamp'])
-        
-        # USD блок
-        text += f"💵 <b>{get_text(user_id, 'usd')}</b>\n"
-        text += f"┣ <b>{get_text(user_id, 'nbu')}:</b> {rates['USD']['nbu']:.2f} ₴\n" if rates['USD']['nbu'] else ""
-        
-        if rates['USD']['monobank']:
-            text += f"┣ <b>Monobank:</b>\n"
-            text += f"┃  ├ {get_text(user_id, 'buy')}: <code>{rates['USD']['monobank']['buy']:.2f}</code> ₴\n"
-            text += f"┃  └ {get_text(user_id, 'sell')}: <code>{rates['USD']['monobank']['sell']:.2f}</code> ₴\n"
+        # Снимок публикует фоновое обновление: здесь нет запросов к банкам
+        rates = (await currency_api.get_snapshot()).rates
         
-        if rates['USD']['privatbank']:
-            text += f"┗ <b>PrivatBank:</b>\n"
-            text += f"   ├ {get_text(user_id, 'buy')}: <code>{rates['USD']['privatbank']['buy']:.2f}</code> ₴\n"
-            text += f"   └ {get_text(user_id, 'sell')}: <code>{rates['USD']['privatbank']['sell']:.2f}</code> ₴\n"
+        # Форматируем сообщение: блок на каждую валюту из CURRENCIES
+        text = get_text(lang, 'current_rates', time=rates['timestamp'])
         
-        if usd_change != 0:
-            change_sign = "+" if usd_change > 0 else ""
-            text += f"📊 {get_text(user_id, 'change_2h')}: {usd_emoji} {change_sign}{usd_change:.2f} ₴\n"
+        blocks = []
+        for currency in CURRENCIES:
+            blocks.append(await format_currency_block(lang, currency, rates[currency]))
+        text += "\n".join(blocks)
         
-        text += "\n"
+        # Банки без свежего ответа: пустые блоки выше пропущены, а вместо
+        # недоступных показаны последние удачные курсы с их возрастом
+        source_names = {'nbu': get_text(lang, 'nbu'), 'monobank': 'Monobank', 'privatbank': 'PrivatBank'}
+        missing = [source_names[name] for name, mark in rates['sources'].items()
+                   if mark['status'] not in ('ok', 'stale')]
+        if missing:
+            text += f"\n{get_text(lang, 'source_unavailable', sources=', '.join(missing))}\n"
         
-        # EUR блок
-        text += f"💶 <b>{get_text(user_id, 'eur')}</b>\n"
-        text += f"┣ <b>{get_text(user_id, 'nbu')}:</b> {rates['EUR']['nbu']:.2f} ₴\n" if rates['EUR']['nbu'] else ""
-        
-        if rates['EUR']['monobank']:
-            text += f"┣ <b>Monobank:</b>\n"
-            text += f"┃  ├ {get_text(user_id, 'buy')}: <code>{rates['EUR']['monobank']['buy']:.2f}</code> ₴\n"
-            text += f"┃  └ {get_text(user_id, 'sell')}: <code>{rates['EUR']['monobank']['sell']:.2f}</code> ₴\n"
-        
-        if rates['EUR']['privatbank']:
-            text += f"┗ <b>PrivatBank:</b>\n"
-            text += f"   ├ {get_text(user_id, 'buy')}: <code>{rates['EUR']['privatbank']['buy']:.2f}</code> ₴\n"
-            text += f"   └ {get_text(user_id, 'sell')}: <code>{rates['EUR']['privatbank']['sell']:.2f}</code> ₴\n"
-        
-        if eur_change != 0:
-            change_sign = "+" if eur_change > 0 else ""
-            text += f"📊 {get_text(user_id, 'change_2h')}: {eur_emoji} {change_sign}{eur_change:.2f} ₴\n"
-        
-        # Сохраняем в историю
-        if rates['USD']['monobank']:
-            storage.save_rate('monobank', 'USD', 
-                            rates['USD']['monobank']['buy'],
-                            rates['USD']['monobank']['sell'])
-        
-        if rates['EUR']['monobank']:
-            storage.save_rate('monobank', 'EUR',
-                            rates['EUR']['monobank']['buy'],
-                            rates['EUR']['monobank']['sell'])
+        for name, mark in rates['sources'].items():
+            if mark['status'] == 'stale':
+                text += get_text(lang, 'source_stale', source=source_names[name],
+                                 minutes=max(1, mark['age'] // 60)) + "\n"
         
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [
                 InlineKeyboardButton(
-                    text=get_text(user_id, 'btn_chart'),
+                    text=get_text(lang, 'btn_chart'),
                     callback_data="show_chart_menu"
                 )
             ],
             [
                 InlineKeyboardButton(
-                    text=get_text(user_id, 'btn_back'),
+                    text=get_text(lang, 'btn_back'),
                     callback_data="main_menu"
                 )
             ]
@@ -123,11 +113,11 @@ async def show_current_rates(callback: CallbackQuery):
             reply_markup=keyboard,
             parse_mode='HTML'
         )
-        
+    
     except Exception as e:
         await callback.message.edit_text(
-            get_text(user_id, 'error', error=str(e)),
-            reply_markup=get_back_keyboard(user_id),
+            get_text(lang, 'error', error=str(e)),
+            reply_markup=get_back_keyboard(lang),
             parse_mode='HTML'
         )
 
@@ -135,22 +125,23 @@ async def show_current_rates(callback: CallbackQuery):
 @router.callback_query(F.data == 'show_chart_menu')
 async def show_chart_menu(callback: CallbackQuery):
     user_id = callback.from_user.id
+    lang = await async_storage.get_user_language(user_id)
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="💵 USD", callback_data="chart_USD"),
-            InlineKeyboardButton(text="💶 EUR", callback_data="chart_EUR")
+            InlineKeyboardButton(text=currency_label(currency), callback_data=f"chart_{currency}")
+            for currency in CURRENCIES
         ],
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_back'),
+                text=get_text(lang, 'btn_back'),
                 callback_data="main_menu"
             )
         ]
     ])
     
     await callback.message.edit_text(
-        get_text(user_id, 'select_currency_chart'),
+        get_text(lang, 'select_currency_chart'),
         reply_markup=keyboard,
         parse_mode='HTML'
     )
@@ -161,37 +152,38 @@ async def show_chart_menu(callback: CallbackQuery):
 @router.callback_query(F.data.startswith('chart_'))
 async def select_chart_currency(callback: CallbackQuery):
     user_id = callback.from_user.id
+    lang = await async_storage.get_user_language(user_id)
     currency = callback.data.split('_')[1]
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'period_day'),
+                text=get_text(lang, 'period_day'),
                 callback_data=f"chartgen_{currency}_day"
             )
         ],
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'period_week'),
+                text=get_text(lang, 'period_week'),
                 callback_data=f"chartgen_{currency}_week"
             )
         ],
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'period_month'),
+                text=get_text(lang, 'period_month'),
                 callback_data=f"chartgen_{currency}_month"
             )
         ],
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_back'),
+                text=get_text(lang, 'btn_back'),
                 callback_data="show_chart_menu"
             )
         ]
     ])
     
     await callback.message.edit_text(
-        get_text(user_id, 'select_period'),
+        get_text(lang, 'select_period'),
         reply_markup=keyboard,
         parse_mode='HTML'
     )
@@ -202,47 +194,79 @@ async def select_chart_currency(callback: CallbackQuery):
 @router.callback_query(F.data.startswith('chartgen_'))
 async def generate_chart(callback: CallbackQuery):
     user_id = callback.from_user.id
+    lang = await async_storage.get_user_language(user_id)
     
     parts = callback.data.split('_')
     currency = parts[1]
     period = parts[2]
     
-    await callback.answer(get_text(user_id, 'generating_chart'))
+    await callback.answer(get_text(lang, 'generating_chart'))
+    
+    period_names = {'day': 'день', 'week': 'тиждень', 'month': 'місяць'}
+    caption = get_text(lang, 'chart_caption', 
+                     currency=currency, 
+                     period=period_names.get(period, period))
     
     try:
-        # Получаем данные из истории
-        hours_map = {'day': 24, 'week': 168, 'month': 720}
-        hours = hours_map.get(period, 24)
+        # Версия берётся до чтения истории: замер, пришедший во время
+        # отрисовки, сменит её, и следующий запрос нарисует график заново
+        version = async_storage.history_version(currency, CHART_SOURCE)
+        cached = chart_cache.get(currency, period, lang, version)
         
-        history = storage.get_rate_history(currency, 'monobank', hours=hours)
-        
-        if not history or len(history) < 2:
-            await callback.message.answer(
-                f"❌ Недостатньо даних для побудови графіка {currency}",
-                parse_mode='HTML'
-            )
-            return
-        
-        # Генерируем график
-        chart_buffer = chart_generator.generate_rate_chart(currency, history, period)
+        # График уже отправлялся: Telegram отдаёт то же фото по file_id
+        if cached is not None and cached.file_id:
+            try:
+                await callback.message.answer_photo(
+                    photo=cached.file_id,
+                    caption=caption,
+                    parse_mode='HTML'
+                )
+                return
+            except TelegramBadRequest:
+                # file_id больше не действителен — рисуем и загружаем заново
+                chart_cache.drop(currency, period, lang)
+                cached = None
         
-        # Отправляем как фото
-        photo = BufferedInputFile(chart_buffer.read(), filename=f"{currency}_{period}.png")
+        if cached is not None and cached.png:
+            png = cached.png
+        else:
+            # Получаем данные из истории
+            history = await load_chart_window(currency, period)
+            
+            if len(history) < 2:
+                await callback.message.answer(
+                    f"❌ Недостатньо даних для побудови графіка {currency}",
+                    parse_mode='HTML'
+                )
+                return
+            
+            # Генерируем график в пуле процессов: цикл событий не ждёт matplotlib
+            try:
+                png = await chart_pool.render(currency, history, period)
+            except ChartQueueFull:
+                await callback.message.answer(get_text(lang, 'chart_busy'))
+                return
+            except asyncio.TimeoutError:
+                await callback.message.answer(get_text(lang, 'chart_timeout'))
+                return
+            
+            chart_cache.put_png(currency, period, lang, version, png,
+                                window_fingerprint(history))
         
-        period_names = {'day': 'день', 'week': 'тиждень', 'month': 'місяць'}
-        caption = get_text(user_id, 'chart_caption', 
-                         currency=currency, 
-                         period=period_names.get(period, period))
+        # Отправляем как фото и запоминаем file_id загруженного файла
+        photo = BufferedInputFile(png, filename=f"{currency}_{period}.png")
         
-        await callback.message.answer_photo(
+        message = await callback.message.answer_photo(
             photo=photo,
             caption=caption,
             parse_mode='HTML'
         )
-        
+        if message.photo:
+            chart_cache.put_file_id(currency, period, lang, version, message.photo[-1].file_id)
+    
     except Exception as e:
         await callback.message.answer(
-            get_text(user_id, 'error', error=str(e)),
+            get_text(lang, 'error', error=str(e)),
             parse_mode='HTML'
         )
 
@@ -3,20 +3,23 @@ from aiogram import Router, F
 from aiogram.filters import CommandStart
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
-from services.storage import storage
+from services.async_storage import async_storage
+from functools import lru_cache
 import json
 import os
 
 router = Router()
 
-# Загрузка локалей
+# Загрузка локалей (файлы не меняются, читаем каждый один раз)
+@lru_cache(maxsize=None)
 def load_locale(lang: str) -> dict:
     locale_path = os.path.join('locales', f'{lang}.json')
     with open(locale_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def get_text(user_id: int, key: str, **kwargs) -> str:
-    lang = storage.get_user_language(user_id)
+def get_text(lang: str, key: str, **kwargs) -> str:
+    # Язык хендлер получает заранее через async_storage: здесь нет обращений
+    # к хранилищу, вызов не блокирует цикл событий
     locale = load_locale(lang)
     text = locale.get(key, key)
     
@@ -25,6 +28,19 @@ def get_text(user_id: int, key: str, **kwargs) -> str:
     
     return text
 
+# Значок валюты на кнопках и в сводке; для валют без своего значка — 💱
+CURRENCY_EMOJI = {'USD': '💵', 'EUR': '💶'}
+
+def currency_label(currency: str) -> str:
+    """Текст кнопки валюты: «💵 USD»"""
+    return f"{CURRENCY_EMOJI.get(currency, '💱')} {currency}"
+
+def currency_title(lang: str, currency: str) -> str:
+    """Название валюты из локали (ключ — код строчными), иначе сам код"""
+    key = currency.lower()
+    text = get_text(lang, key)
+    return currency if text == key else text
+
 def get_language_keyboard() -> InlineKeyboardMarkup:
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
@@ -34,35 +50,35 @@ def get_language_keyboard() -> InlineKeyboardMarkup:
     ])
     return keyboard
 
-def get_main_menu_keyboard(user_id: int) -> InlineKeyboardMarkup:
+def get_main_menu_keyboard(lang: str) -> InlineKeyboardMarkup:
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_rates'),
+                text=get_text(lang, 'btn_rates'),
                 callback_data="show_rates"
             )
         ],
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_chart'),
+                text=get_text(lang, 'btn_chart'),
                 callback_data="show_chart_menu"
             )
         ],
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_map'),
+                text=get_text(lang, 'btn_map'),
                 callback_data="show_map"
             )
         ],
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_alerts'),
+                text=get_text(lang, 'btn_alerts'),
                 callback_data="show_alerts"
             )
         ],
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_settings'),
+                text=get_text(lang, 'btn_settings'),
                 callback_data="show_settings"
             )
         ]
@@ -75,7 +91,7 @@ async def cmd_start(message: Message):
     user_id = message.from_user.id
     
     # Проверяем, есть ли уже язык у пользователя
-    lang = storage.get_user_language(user_id)
+    lang = await async_storage.get_user_language(user_id)
     
     if lang == 'uk':  # Дефолтное значение означает, что пользователь новый
         # Новый пользователь - предлагаем выбрать язык
@@ -89,8 +105,8 @@ async def cmd_start(message: Message):
     else:
         # Пользователь уже есть - показываем главное меню
         await message.answer(
-            get_text(user_id, 'main_menu'),
-            reply_markup=get_main_menu_keyboard(user_id),
+            get_text(lang, 'main_menu'),
+            reply_markup=get_main_menu_keyboard(lang),
             parse_mode='HTML'
         )
 
@@ -100,17 +116,17 @@ async def select_language(callback: CallbackQuery):
     lang = callback.data.split('_')[1]
     user_id = callback.from_user.id
     
-    storage.set_user_language(user_id, lang)
+    await async_storage.set_user_language(user_id, lang)
     
     await callback.message.edit_text(
-        get_text(user_id, 'language_selected'),
+        get_text(lang, 'language_selected'),
         parse_mode='HTML'
     )
     
     # Показываем главное меню
     await callback.message.answer(
-        get_text(user_id, 'main_menu'),
-        reply_markup=get_main_menu_keyboard(user_id),
+        get_text(lang, 'main_menu'),
+        reply_markup=get_main_menu_keyboard(lang),
         parse_mode='HTML'
     )
     
@@ -120,10 +136,11 @@ async def select_language(callback: CallbackQuery):
 @router.callback_query(F.data == 'main_menu')
 async def back_to_main_menu(callback: CallbackQuery):
     user_id = callback.from_user.id
+    lang = await async_storage.get_user_language(user_id)
     
     await callback.message.edit_text(
-        get_text(user_id, 'main_menu'),
-        reply_markup=get_main_menu_keyboard(user_id),
+        get_text(lang, 'main_menu'),
+        reply_markup=get_main_menu_keyboard(lang),
         parse_mode='HTML'
     )
     
@@ -133,7 +150,7 @@ async def back_to_main_menu(callback: CallbackQuery):
 @router.callback_query(F.data == 'show_settings')
 async def show_settings(callback: CallbackQuery):
     user_id = callback.from_user.id
-    lang = storage.get_user_language(user_id)
+    lang = await async_storage.get_user_language(user_id)
     
     settings_keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
@@ -144,13 +161,13 @@ async def show_settings(callback: CallbackQuery):
         ],
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_back'),
+                text=get_text(lang, 'btn_back'),
                 callback_data="main_menu"
             )
         ]
     ])
     
-    settings_text = get_text(user_id, 'main_menu').replace('Головне меню', 'Налаштування').replace('Главное меню', 'Настройки')
+    settings_text = get_text(lang, 'main_menu').replace('Головне меню', 'Налаштування').replace('Главное меню', 'Настройки')
     
     await callback.message.edit_text(
         settings_text,
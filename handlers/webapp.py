@@ -1,7 +1,7 @@
 
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, WebAppInfo, InlineKeyboardMarkup, InlineKeyboardButton
-from services.storage import storage
+from services.async_storage import async_storage
 from handlers.start import get_text
 from config import WEBAPP_URL
 
@@ -11,8 +11,9 @@ router = Router()
 @router.callback_query(F.data == 'show_map')
 async def show_map(callback: CallbackQuery):
     user_id = callback.from_user.id
+    lang = await async_storage.get_user_language(user_id)
     
-    exchangers = storage.get_exchangers()
+    exchangers = await async_storage.get_exchangers()
     
     # Формируем URL для Web App с данными обменников
     webapp_url = WEBAPP_URL
@@ -20,19 +21,19 @@ async def show_map(callback: CallbackQuery):
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_open_map'),
+                text=get_text(lang, 'btn_open_map'),
                 web_app=WebAppInfo(url=webapp_url)
             )
         ],
         [
             InlineKeyboardButton(
-                text=get_text(user_id, 'btn_back'),
+                text=get_text(lang, 'btn_back'),
                 callback_data="main_menu"
             )
         ]
     ])
     
-    text = get_text(user_id, 'map_description', count=len(exchangers))
+    text = get_text(lang, 'map_description', count=len(exchangers))
     
     await callback.message.edit_text(
         text,
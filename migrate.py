@@ -0,0 +1,179 @@
+"""
+Перенос данных из JSON-хранилища (data/) в новое хранилище со сжатием.
+
+Файлы читаются потоково и грузятся пачками по --batch записей (одна
+транзакция SQLite или одна запись шардов на пачку), поэтому история и
+база пользователей могут быть намного больше оперативной памяти. После
+загрузки число записей сверяется с источником, затем цель сжимается
+(история по срокам хранения, VACUUM для SQLite).
+
+Запуск:
+    python -m migrate --to sqlite
+    python -m migrate --to sqlite --target /srv/bot/data --batch 10000
+    python -m migrate --to json --target data.new
+
+Бота на время переноса лучше остановить.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from config import DATA_DIR
+from services.defaults import DEFAULT_EXCHANGERS
+from services.history_log import RateHistoryLog
+from services.json_stream import iter_json_items
+from services.rate_columns import ColumnarRateHistory
+from services.records import Alert, Exchanger, decode_exchangers, decode_legacy_alerts
+
+
+# === ИСТОЧНИК ===
+def read_exchangers(source: str) -> List[Exchanger]:
+    # Обменников единицы — файл читается целиком
+    path = os.path.join(source, 'exchangers.json')
+    if not os.path.exists(path):
+        return decode_exchangers(DEFAULT_EXCHANGERS)
+    with open(path, 'r', encoding='utf-8') as f:
+        return decode_exchangers(json.load(f))
+
+
+def iter_rates(source: str) -> Iterator[tuple]:
+    """
+    (currency, source, buy, sell, timestamp) в порядке времени внутри серии.
+    
+    Берётся самый новый формат, который есть в папке: колонки, журнал или
+    старый rates_history.json.
+    """
+    columns_dir = os.path.join(source, 'rates_columns')
+    log_dir = os.path.join(source, 'rates_history')
+    legacy_file = os.path.join(source, 'rates_history.json')
+    
+    if os.path.isdir(columns_dir):
+        yield from ColumnarRateHistory(columns_dir).iter_records()
+    elif os.path.isdir(log_dir):
+        yield from RateHistoryLog(log_dir).iter_records()
+    elif os.path.exists(legacy_file):
+        for (currency, rate_source, _), r in iter_json_items(legacy_file, depth=3):
+            yield (currency, rate_source, r['buy'], r['sell'],
+                   datetime.fromisoformat(r['timestamp']))
+
+
+def iter_users(source: str, kind: str) -> Iterator[Tuple[int, object]]:
+    """(user_id, значение) из шардов data/users или из старого общего файла"""
+    users_dir = os.path.join(source, 'users')
+    
+    # Шарды полны, только если перенос в них завершён (есть meta.json)
+    if os.path.exists(os.path.join(users_dir, 'meta.json')):
+        paths = sorted(glob.glob(os.path.join(users_dir, f'{kind}-*.json')))
+    else:
+        legacy = {'settings': 'user_settings.json', 'alerts': 'user_alerts.json'}[kind]
+        paths = [os.path.join(source, legacy)]
+    
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        for (user_key,), value in iter_json_items(path, depth=1):
+            yield int(user_key), value
+
+
+def iter_alerts(source: str) -> Iterator[Tuple[int, List[Alert]]]:
+    for user_id, alerts in iter_users(source, 'alerts'):
+        if not alerts:
+            continue
+        
+        yield user_id, decode_legacy_alerts(alerts)
+
+
+# === ЦЕЛЬ ===
+def open_target(kind: str, target: str):
+    if kind == 'sqlite':
+        from services.sqlite_storage import SQLiteStorage
+        if os.path.exists(os.path.join(target, 'storage.db')):
+            sys.exit(f"{target}/storage.db уже существует — перенос только в новую базу")
+        return SQLiteStorage(data_dir=target)
+    
+    from services.storage import Storage
+    if os.path.exists(target) and os.listdir(target):
+        sys.exit(f"{target} не пуста — перенос только в новую папку")
+    return Storage(data_dir=target)
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def load(label: str, items: Iterable, loader: Callable, batch: int,
+         count_items: Optional[Callable] = None) -> int:
+    """Загрузить items пачками; возвращает число записей"""
+    total = 0
+    started = time.perf_counter()
+    for chunk in _batches(items, batch):
+        loader(chunk)
+        total += len(chunk) if count_items is None else sum(map(count_items, chunk))
+        print(f"\r{label}: {total}", end='', flush=True)
+    print(f"\r{label}: {total} ({time.perf_counter() - started:.1f} с)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--source', default=DATA_DIR, help='папка JSON-хранилища')
+    parser.add_argument('--to', choices=('sqlite', 'json'), required=True)
+    parser.add_argument('--target', help='папка нового хранилища (по умолчанию: '
+                                         'для sqlite — source, для json — source.new)')
+    parser.add_argument('--batch', type=int, default=5000, help='записей на транзакцию')
+    parser.add_argument('--no-compact', action='store_true', help='не сжимать после переноса')
+    args = parser.parse_args()
+    
+    target_dir = args.target or (args.source if args.to == 'sqlite' else f"{args.source}.new")
+    if args.to == 'json' and os.path.abspath(target_dir) == os.path.abspath(args.source):
+        sys.exit("JSON-хранилище переносится только в другую папку")
+    
+    target = open_target(args.to, target_dir)
+    
+    exchangers = read_exchangers(args.source)
+    target.replace_exchangers(exchangers)
+    
+    expected = {
+        'exchangers': len(exchangers),
+        'rates': load('История курсов', iter_rates(args.source),
+                      target.import_rates, args.batch),
+        'settings': load('Настройки', iter_users(args.source, 'settings'),
+                         target.import_user_settings, args.batch),
+        'alerts': load('Оповещения', iter_alerts(args.source),
+                       target.import_alerts, args.batch,
+                       count_items=lambda item: len(item[1]))
+    }
+    
+    # Сверка до сжатия: сжатие законно удаляет старые сырые замеры
+    actual = target.count_rows()
+    mismatched = [name for name in expected if expected[name] != actual[name]]
+    for name in expected:
+        mark = 'OK' if name not in mismatched else 'РАСХОЖДЕНИЕ'
+        print(f"{name:12} источник {expected[name]:>10}  цель {actual[name]:>10}  {mark}")
+    
+    if mismatched:
+        target.close()
+        sys.exit(f"Перенос не сошёлся: {', '.join(mismatched)}")
+    
+    if not args.no_compact:
+        started = time.perf_counter()
+        target.vacuum()
+        print(f"Сжатие: {time.perf_counter() - started:.1f} с")
+    
+    target.close()
+    print(f"Готово: {args.to} в {target_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+from datetime import datetime
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from services.rate_columns import RateWindow
+from services.records import Alert, Exchanger, RateSample
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncStorage:
+    """
+    Асинхронный фасад над любым StorageBackend (services/backend.py).
+    
+    Чтения выполняются в пуле потоков, чтобы файловый ввод-вывод не
+    останавливал цикл событий. Все мутации идут через одну задачу-писатель:
+    она забирает из очереди всё, что накопилось за flush_delay, применяет
+    пачку внутри backend.deferred_writes() и сбрасывает каждый затронутый
+    файл на диск один раз. Мутации выполняются строго по очереди, поэтому
+    параллельные read-modify-write больше не теряют чужие изменения.
+    """
+    
+    def __init__(self, backend=None, flush_delay: float = 0.02):
+        # Хранилище передаётся в attach() (bot.py); модуль сам его не создаёт
+        self._backend = backend
+        self.flush_delay = flush_delay
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        
+        # Версия истории каждой серии (валюта, источник): растёт с каждым
+        # записанным замером; по ней кэш графиков узнаёт о новых данных
+        self._history_versions: Dict[Tuple[str, str], int] = {}
+    
+    # === ЖИЗНЕННЫЙ ЦИКЛ ===
+    @property
+    def backend(self):
+        if self._backend is None:
+            raise RuntimeError("Хранилище не подключено: вызовите async_storage.attach()")
+        return self._backend
+    
+    def attach(self, backend):
+        """Подключить хранилище (StorageBackend) до первого обращения"""
+        self._backend = backend
+    
+    def start(self):
+        if self._writer is None or self._writer.done():
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._write_loop())
+    
+    async def close(self):
+        """Дождаться записи всех поставленных мутаций и остановить писателя"""
+        if self._writer is None:
+            return
+        
+        await self._queue.join()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+    
+    # === ПИСАТЕЛЬ ===
+    async def _write_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            
+            # Даём пачке набраться: всплеск кликов превращается в одну запись
+            if self.flush_delay:
+                await asyncio.sleep(self.flush_delay)
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            
+            try:
+                results = await asyncio.to_thread(self._apply_batch, batch)
+            except Exception as e:
+                # Упал сам сброс на диск: сообщаем всем ожидающим
+                logger.error(f"Ошибка записи пачки изменений: {e}")
+                results = [(None, e)] * len(batch)
+            
+            for (_, _, _, future), (result, error) in zip(batch, results):
+                if not future.done():
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(result)
+                self._queue.task_done()
+    
+    def _apply_batch(self, batch: List[tuple]) -> List[tuple]:
+        results = []
+        with self.backend.deferred_writes():
+            for method, args, kwargs, _ in batch:
+                try:
+                    results.append((method(*args, **kwargs), None))
+                except Exception as e:
+                    results.append((None, e))
+        return results
+    
+    async def _submit(self, method: Callable, *args, **kwargs) -> Any:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((method, args, kwargs, future))
+        return await future
+    
+    async def _read(self, method: Callable, *args, **kwargs) -> Any:
+        return await asyncio.to_thread(method, *args, **kwargs)
+    
+    async def _iterate(self, iterator: Iterator, chunk: int = 1000) -> AsyncIterator:
+        """Пройти синхронный итератор хранилища порциями в пуле потоков"""
+        while True:
+            items = await asyncio.to_thread(lambda: list(islice(iterator, chunk)))
+            if not items:
+                return
+            for item in items:
+                yield item
+    
+    # === EXCHANGERS ===
+    async def get_exchangers(self) -> List[Exchanger]:
+        return await self._read(self.backend.get_exchangers)
+    
+    async def get_exchanger_by_id(self, exchanger_id: int) -> Optional[Exchanger]:
+        return await self._read(self.backend.get_exchanger_by_id, exchanger_id)
+    
+    async def add_exchanger(self, name: str, address: str, district: str,
+                            lat: float, lon: float, phone: str = "") -> Exchanger:
+        return await self._submit(self.backend.add_exchanger,
+                                  name, address, district, lat, lon, phone)
+    
+    async def update_exchanger_rate(self, exchanger_id: int, currency: str,
+                                    buy: float, sell: float):
+        return await self._submit(self.backend.update_exchanger_rate,
+                                  exchanger_id, currency, buy, sell)
+    
+    # === RATES HISTORY ===
+    async def save_rate(self, source: str, currency: str, buy: float, sell: float):
+        result = await self._submit(self.backend.save_rate, source, currency, buy, sell)
+        self._bump_history(source, [currency])
+        return result
+    
+    async def save_rates(self, source: str, quotes: Dict[str, Tuple[float, float]]):
+        result = await self._submit(self.backend.save_rates, source, quotes)
+        self._bump_history(source, quotes)
+        return result
+    
+    def _bump_history(self, source: str, currencies):
+        for currency in currencies:
+            key = (currency, source)
+            self._history_versions[key] = self._history_versions.get(key, 0) + 1
+    
+    def history_version(self, currency: str, source: str) -> int:
+        """Номер версии истории серии; меняется, когда записан новый замер"""
+        return self._history_versions.get((currency, source), 0)
+    
+    async def get_rate_history(self, currency: str, source: str,
+                               hours: int = 24) -> List[RateSample]:
+        return await self._read(self.backend.get_rate_history, currency, source, hours)
+    
+    async def get_rate_window(self, currency: str, source: str,
+                              hours: int = 24) -> RateWindow:
+        return await self._read(self.backend.get_rate_window, currency, source, hours)
+    
+    async def get_rate_at(self, currency: str, source: str,
+                          at: datetime) -> Optional[RateSample]:
+        return await self._read(self.backend.get_rate_at, currency, source, at)
+    
+    async def compact_history(self) -> int:
+        # Сжатие долгое и не пересекается с дозаписью — мимо очереди
+        return await self._read(self.backend.compact_history)
+    
+    # === USER SETTINGS ===
+    async def get_user_language(self, user_id: int) -> str:
+        return await self._read(self.backend.get_user_language, user_id)
+    
+    async def set_user_language(self, user_id: int, language: str):
+        return await self._submit(self.backend.set_user_language, user_id, language)
+    
+    async def get_all_users(self) -> List[int]:
+        return await self._read(self.backend.get_all_users)
+    
+    def iter_user_languages(self) -> AsyncIterator[Tuple[int, str]]:
+        return self._iterate(self.backend.iter_user_languages())
+    
+    # === USER ALERTS ===
+    async def get_user_alerts(self, user_id: int) -> List[Alert]:
+        return await self._read(self.backend.get_user_alerts, user_id)
+    
+    async def add_alert(self, user_id: int, currency: str, alert_type: str,
+                        threshold: float) -> Alert:
+        return await self._submit(self.backend.add_alert,
+                                  user_id, currency, alert_type, threshold)
+    
+    async def delete_alert(self, user_id: int, alert_id: int):
+        return await self._submit(self.backend.delete_alert, user_id, alert_id)
+    
+    async def get_all_alerts(self) -> Dict:
+        return await self._read(self.backend.get_all_alerts)
+    
+    def iter_all_alerts(self) -> AsyncIterator[Tuple[int, List[Alert]]]:
+        return self._iterate(self.backend.iter_all_alerts())
+
+
+# Глобальный экземпляр
+async_storage = AsyncStorage()
@@ -0,0 +1,94 @@
+from datetime import datetime
+from typing import ContextManager, Dict, Iterator, List, Optional, Protocol, Tuple, runtime_checkable
+from services.rate_columns import RateWindow
+from services.records import Alert, Exchanger, RateSample
+
+
+@runtime_checkable
+class StorageBackend(Protocol):
+    """
+    Контракт хранилища, на который опираются AsyncStorage, бот и хендлеры.
+    
+    Реализации: Storage (JSON-файлы), SQLiteStorage и InMemoryStorage.
+    Общая проверка контракта — benchmarks/storage_contract.py.
+    """
+    
+    # === ЗАПИСЬ ПАЧКАМИ ===
+    def deferred_writes(self) -> ContextManager:
+        """Выполнить пачку мутаций с одним сбросом на диск"""
+        ...
+    
+    def flush(self):
+        ...
+    
+    def close(self):
+        ...
+    
+    # === EXCHANGERS ===
+    def get_exchangers(self) -> List[Exchanger]:
+        ...
+    
+    def get_exchanger_by_id(self, exchanger_id: int) -> Optional[Exchanger]:
+        ...
+    
+    def add_exchanger(self, name: str, address: str, district: str,
+                      lat: float, lon: float, phone: str = "") -> Exchanger:
+        ...
+    
+    def update_exchanger_rate(self, exchanger_id: int, currency: str,
+                              buy: float, sell: float):
+        ...
+    
+    # === RATES HISTORY ===
+    def save_rate(self, source: str, currency: str, buy: float, sell: float):
+        ...
+    
+    def save_rates(self, source: str, quotes: Dict[str, Tuple[float, float]]):
+        """Курсы всех валют одного опроса банка: {currency: (buy, sell)}"""
+        ...
+    
+    def get_rate_history(self, currency: str, source: str,
+                         hours: int = 24) -> List[RateSample]:
+        ...
+    
+    def get_rate_window(self, currency: str, source: str,
+                        hours: int = 24) -> RateWindow:
+        ...
+    
+    def get_rate_at(self, currency: str, source: str,
+                    at: datetime) -> Optional[RateSample]:
+        """Последний замер не позже at — действующий на тот момент курс"""
+        ...
+    
+    def compact_history(self) -> int:
+        ...
+    
+    # === USER SETTINGS ===
+    def get_user_language(self, user_id: int) -> str:
+        ...
+    
+    def set_user_language(self, user_id: int, language: str):
+        ...
+    
+    def get_all_users(self) -> List[int]:
+        ...
+    
+    def iter_user_languages(self) -> Iterator[Tuple[int, str]]:
+        ...
+    
+    # === USER ALERTS ===
+    def get_user_alerts(self, user_id: int) -> List[Alert]:
+        ...
+    
+    def add_alert(self, user_id: int, currency: str, alert_type: str,
+                  threshold: float) -> Alert:
+        ...
+    
+    def delete_alert(self, user_id: int, alert_id: int):
+        ...
+    
+    def get_all_alerts(self) -> Dict:
+        ...
+    
+    def iter_all_alerts(self) -> Iterator[Tuple[int, List[Alert]]]:
+        ...
@@ -0,0 +1,107 @@
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from services.rate_columns import RateWindow
+
+
+def window_fingerprint(window: RateWindow) -> int:
+    """Контрольная сумма колонок окна: одинаковые данные — одинаковый график"""
+    crc = 0
+    for column in (window.timestamps, window.buy, window.sell):
+        crc = zlib.crc32(memoryview(column), crc)
+    return crc
+
+
+class CachedChart:
+    """
+    Готовый график: PNG и, после первой отправки, file_id фото в Telegram
+    (повторная отправка по file_id не требует ни отрисовки, ни загрузки).
+    inputs — отпечаток окна истории, по которому график нарисован.
+    """
+    
+    __slots__ = ('version', 'png', 'file_id', 'inputs')
+    
+    def __init__(self, version: int, png: Optional[bytes] = None,
+                 file_id: Optional[str] = None, inputs: Optional[int] = None):
+        self.version = version
+        self.png = png
+        self.file_id = file_id
+        self.inputs = inputs
+
+
+class ChartCache:
+    """
+    Графики по (валюта, период, язык). Запись годна, пока совпадает версия
+    истории серии (AsyncStorage.history_version): новый замер меняет версию,
+    и при следующем запросе график рисуется заново. На каждый ключ хранится
+    только последняя версия, поэтому кэш не растёт со временем.
+    """
+    
+    def __init__(self):
+        self._charts: Dict[Tuple[str, str, str], CachedChart] = {}
+        # Сколько раз просили график (валюта, период) — порядок дорисовки
+        self.demand = Counter()
+        self.stats = {'file_id': 0, 'png': 0, 'miss': 0}
+    
+    def get(self, currency: str, period: str, lang: str, version: int) -> Optional[CachedChart]:
+        self.demand[(currency, period)] += 1
+        chart = self._charts.get((currency, period, lang))
+        if chart is None or chart.version != version:
+            self.stats['miss'] += 1
+            return None
+        
+        self.stats['file_id' if chart.file_id else 'png'] += 1
+        return chart
+    
+    def is_current(self, currency: str, period: str, lang: str, version: int) -> bool:
+        chart = self._charts.get((currency, period, lang))
+        return chart is not None and chart.version == version
+    
+    def _entry(self, currency: str, period: str, lang: str, version: int) -> Optional[CachedChart]:
+        # Версии только растут: график по старой истории, дорисованный
+        # позже графика по новой, не должен его вытеснить
+        key = (currency, period, lang)
+        chart = self._charts.get(key)
+        if chart is None or chart.version < version:
+            chart = self._charts[key] = CachedChart(version)
+        return chart if chart.version == version else None
+    
+    def restamp(self, currency: str, period: str, lang: str, version: int, inputs: int) -> bool:
+        """
+        Версия сменилась, а окно истории то же (inputs совпадает): запись
+        остаётся годной вместе с file_id. False — график нужно рисовать
+        """
+        chart = self._charts.get((currency, period, lang))
+        if chart is None or chart.inputs != inputs or chart.version > version:
+            return False
+        chart.version = version
+        return True
+    
+    def put_png(self, currency: str, period: str, lang: str, version: int, png: bytes,
+                inputs: Optional[int] = None):
+        chart = self._entry(currency, period, lang, version)
+        if chart is not None and chart.file_id is None:
+            chart.png = png
+            chart.inputs = inputs
+    
+    def put_file_id(self, currency: str, period: str, lang: str, version: int, file_id: str):
+        chart = self._entry(currency, period, lang, version)
+        if chart is None:
+            return
+        chart.file_id = file_id
+        # PNG больше не нужен: дальше график отправляется по file_id
+        chart.png = None
+    
+    def drop(self, currency: str, period: str, lang: str):
+        self._charts.pop((currency, period, lang), None)
+    
+    def popular(self, candidates: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """candidates по убыванию спроса (без запросов — в исходном порядке)"""
+        return sorted(candidates, key=lambda key: -self.demand[key])
+    
+    def get_stats(self) -> dict:
+        return {**self.stats, 'charts': len(self._charts)}
+
+
+# Глобальный экземпляр
+chart_cache = ChartCache()
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from config import CHART_QUEUE_LIMIT, CHART_RENDER_TIMEOUT, CHART_WORKERS
+from services.rate_columns import RateWindow
+
+
+logger = logging.getLogger(__name__)
+
+
+class ChartQueueFull(Exception):
+    """В очереди на отрисовку уже max_queue графиков"""
+
+
+# === ВОРКЕР ===
+# Выполняется в процессах пула: matplotlib и стиль загружаются один раз
+# при старте процесса, пробная отрисовка прогревает кэш шрифтов
+_generator = None
+
+
+def _init_worker():
+    global _generator
+    from services.charts import chart_generator
+    _generator = chart_generator
+    _generator.generate_rate_chart(
+        'USD', RateWindow(array('q', [0, 3600]), array('d', [1.0, 1.1]), array('d', [1.2, 1.3]))
+    )
+
+
+def _warm_up() -> bool:
+    return _generator is not None
+
+
+def _render(currency: str, period: str, timestamps: bytes, buy: bytes, sell: bytes) -> bytes:
+    window = RateWindow(array('q', timestamps), array('d', buy), array('d', sell))
+    return _generator.generate_rate_chart(currency, window, period).getvalue()
+
+
+def _column_bytes(column) -> bytes:
+    # Колонки окна — array или memoryview поверх mmap: в процесс уходят байты
+    return memoryview(column).tobytes()
+
+
+class ChartRenderPool:
+    """
+    Отрисовка графиков в пуле процессов, вне цикла событий.
+    
+    Процессы создаются в start() и сразу прогреваются (matplotlib
+    импортирован, стиль применён). render() ждёт готовый PNG не дольше
+    timeout; если в очереди уже max_queue графиков, новый запрос сразу
+    получает ChartQueueFull — бот отвечает «занято», а не копит очередь.
+    """
+    
+    def __init__(self, workers: int = CHART_WORKERS, max_queue: int = CHART_QUEUE_LIMIT,
+                 timeout: float = CHART_RENDER_TIMEOUT):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._restart_lock = asyncio.Lock()
+        # Отправленные в пул и ещё не законченные отрисовки (в том числе
+        # те, чей ответ уже не ждут после таймаута: процесс всё ещё занят)
+        self._pending = 0
+        self.stats = {'rendered': 0, 'rejected': 0, 'timeouts': 0, 'failed': 0}
+    
+    # === ЖИЗНЕННЫЙ ЦИКЛ ===
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn: дочерний процесс не наследует потоки и цикл событий бота
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+    
+    async def _launch(self):
+        """Новый пул процессов; готов, когда все процессы прогреты"""
+        self._executor = self._create_executor()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, _warm_up) for _ in range(self.workers)
+        ))
+    
+    async def start(self):
+        """Запустить процессы и дождаться их прогрева"""
+        if self._executor is not None:
+            return
+        
+        await self._launch()
+        logger.info(f"Пул отрисовки графиков готов: {self.workers} процесса(ов)")
+    
+    async def _replace(self, broken: ProcessPoolExecutor):
+        """
+        Заменить сломанный пул: остатки старого гасятся без ожидания, новый
+        прогревается так же, как в start(). Одновременные запросы, заставшие
+        тот же сломанный пул, пересоздают его один раз
+        """
+        async with self._restart_lock:
+            if self._executor is not broken:
+                return
+            logger.error("Пул отрисовки графиков сломан, пересоздаю")
+            broken.shutdown(wait=False, cancel_futures=True)
+            await self._launch()
+    
+    async def close(self):
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+    
+    # === ОТРИСОВКА ===
+    def _release(self, _future):
+        self._pending -= 1
+    
+    async def render(self, currency: str, data: RateWindow, period: str = 'day') -> bytes:
+        """PNG графика currency за period; ChartQueueFull или asyncio.TimeoutError"""
+        if self._executor is None:
+            await self.start()
+        
+        if self._pending >= self.max_queue:
+            self.stats['rejected'] += 1
+            raise ChartQueueFull(f"в очереди {self._pending} графиков")
+        
+        args = (_render, currency, period, _column_bytes(data.timestamps),
+                _column_bytes(data.buy), _column_bytes(data.sell))
+        executor = self._executor
+        try:
+            future = executor.submit(*args)
+        except BrokenProcessPool:
+            # Процесс пула упал: пул пересоздаётся, запрос пробует ещё раз
+            await self._replace(executor)
+            future = self._executor.submit(*args)
+        
+        # Слот в очереди освобождается, когда процесс закончил работу, а не
+        # когда истёк таймаут ожидания
+        self._pending += 1
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._release, f))
+        
+        try:
+            png = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise
+        except Exception:
+            self.stats['failed'] += 1
+            raise
+        
+        self.stats['rendered'] += 1
+        return png
+    
+    def get_stats(self) -> dict:
+        return {**self.stats, 'pending': self._pending, 'workers': self.workers}
+
+
+# Глобальный экземпляр
+chart_pool = ChartRenderPool()
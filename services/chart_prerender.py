@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Optional
+from config import CHART_PRERENDER_BUDGET, CURRENCIES, LANGUAGES
+from services.async_storage import async_storage
+from services.chart_cache import chart_cache, window_fingerprint
+from services.chart_pool import ChartQueueFull, chart_pool
+from services.rate_columns import RateWindow
+from services.rollups import RAW_MAX_AGE, bucket_start, pick_tier
+
+
+logger = logging.getLogger(__name__)
+
+# Периоды графиков (callback chartgen_{currency}_{period}) и их длина в часах
+PERIOD_HOURS = {'day': 24, 'week': 168, 'month': 720}
+
+# История графиков — курсы Monobank
+CHART_SOURCE = 'monobank'
+
+
+async def load_chart_window(currency: str, period: str) -> RateWindow:
+    """Окно истории для графика currency за period"""
+    hours = PERIOD_HOURS.get(period, 24)
+    history = await async_storage.get_rate_window(currency, CHART_SOURCE, hours=hours)
+    
+    # Молодая история: свечей ещё мало, а сырые замеры уже есть
+    if len(history) < 2 and pick_tier(hours) is not None:
+        hours = RAW_MAX_AGE.total_seconds() / 3600
+        history = await async_storage.get_rate_window(currency, CHART_SOURCE, hours=hours)
+    
+    return await _carry_forward(currency, history, hours)
+
+
+async def _carry_forward(currency: str, history: RateWindow, hours: float) -> RateWindow:
+    """
+    Курс пишется в историю только при изменении: последний замер до начала
+    окна — действующий курс на его начало. Он становится первой точкой окна,
+    а если за окно курс не менялся — и последней. Отметки округлены до часа,
+    чтобы окно (и его отпечаток в ChartCache) не менялось каждую секунду
+    """
+    now = datetime.now()
+    start = bucket_start('hour', now - timedelta(hours=hours))
+    if len(history) and history.timestamps[0] <= start:
+        return history
+    
+    base = await async_storage.get_rate_at(currency, CHART_SOURCE, datetime.fromtimestamp(start))
+    if base is None:
+        return history
+    
+    timestamps = array('q', [start])
+    buy = array('d', [base.buy])
+    sell = array('d', [base.sell])
+    if len(history):
+        timestamps.extend(history.timestamps)
+        buy.extend(history.buy)
+        sell.extend(history.sell)
+    else:
+        timestamps.append(bucket_start('hour', now))
+        buy.append(base.buy)
+        sell.append(base.sell)
+    return RateWindow(timestamps, buy, sell)
+
+
+class ChartPrerenderer:
+    """
+    Дорисовка графиков в фоне после записи новых курсов, чтобы нажатие
+    кнопки находило готовый PNG.
+    
+    Графики (валюта, период) идут по убыванию спроса (ChartCache.demand) по
+    одному, занимая не больше одного процесса пула. За проход тратится не
+    больше budget секунд отрисовки; остальное дорисуется по запросу.
+    Пропускаются графики, уже годные для текущей версии истории, и те, чьё
+    окно истории не изменилось (запись просто получает новую версию).
+    """
+    
+    def __init__(self, budget: float = CHART_PRERENDER_BUDGET):
+        self.budget = budget
+        self._task: Optional[asyncio.Task] = None
+        # Новые курсы пришли во время прохода: после него нужен ещё один
+        self._dirty = False
+        self.stats = {'rendered': 0, 'unchanged': 0, 'current': 0, 'deferred': 0}
+    
+    def trigger(self):
+        """Запланировать проход; во время идущего — повторить его после"""
+        if self._task is not None and not self._task.done():
+            self._dirty = True
+            return
+        self._task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        while True:
+            self._dirty = False
+            try:
+                await self.prerender()
+            except Exception as e:
+                logger.error(f"Ошибка фоновой отрисовки графиков: {e}")
+            if not self._dirty:
+                return
+    
+    async def prerender(self):
+        spent = 0.0
+        candidates = [(currency, period) for currency in CURRENCIES for period in PERIOD_HOURS]
+        
+        for currency, period in chart_cache.popular(candidates):
+            version = async_storage.history_version(currency, CHART_SOURCE)
+            stale = [lang for lang in LANGUAGES
+                     if not chart_cache.is_current(currency, period, lang, version)]
+            if not stale:
+                self.stats['current'] += 1
+                continue
+            
+            history = await load_chart_window(currency, period)
+            if len(history) < 2:
+                continue
+            
+            inputs = window_fingerprint(history)
+            stale = [lang for lang in stale
+                     if not chart_cache.restamp(currency, period, lang, version, inputs)]
+            if not stale:
+                self.stats['unchanged'] += 1
+                continue
+            
+            # Бюджет исчерпан или пул занят запросами пользователей
+            if spent >= self.budget or chart_pool.get_stats()['pending']:
+                self.stats['deferred'] += 1
+                continue
+            
+            started = time.perf_counter()
+            try:
+                png = await chart_pool.render(currency, history, period)
+            except (ChartQueueFull, asyncio.TimeoutError):
+                self.stats['deferred'] += 1
+                continue
+            finally:
+                spent += time.perf_counter() - started
+            
+            for lang in stale:
+                chart_cache.put_png(currency, period, lang, version, png, inputs)
+            self.stats['rendered'] += 1
+        
+        if spent:
+            logger.info(f"Графики дорисованы за {spent:.2f} с: {self.stats}")
+
+
+# Глобальный экземпляр
+chart_prerenderer = ChartPrerenderer()
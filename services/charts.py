@@ -2,9 +2,88 @@ import matplotlib
 matplotlib.use('Agg')  # Важно! Для работы без GUI
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+import numpy as np
 from datetime import datetime
-from typing import List, Dict
+from typing import Dict, Tuple
 import io
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from services.rate_columns import RateWindow
+
+
+# Соседние точки графика — не ближе этого числа пикселей: маркер размером
+# 4 pt при 150 dpi занимает около 8 px, чаще точки сливаются в полосу
+POINT_SPACING_PX = 4
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Индексы точек, оставляемых Largest-Triangle-Three-Buckets.
+    
+    Первая и последняя точки сохраняются, остальные делятся на threshold - 2
+    корзины; из каждой берётся точка, образующая самый большой треугольник
+    с соседними корзинами. Вершинами служат средние соседних корзин (а не
+    выбранная в предыдущей точка) — так все корзины считаются одним
+    векторным проходом без цикла Python.
+    """
+    size = len(x)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+    
+    # Границы корзин внутренних точек 1..size-2: шаг не меньше 1, пустых нет
+    edges = np.linspace(1, size - 1, threshold - 1).astype(np.int64)
+    starts = edges[:-1]
+    counts = np.diff(edges)
+    bucket = np.repeat(np.arange(threshold - 2), counts)
+    
+    avg_x = np.add.reduceat(x[:-1], starts) / counts
+    avg_y = np.add.reduceat(y[:-1], starts) / counts
+    
+    # Вершины треугольника: средние корзин слева и справа (крайние — точки)
+    a_x = np.concatenate(([x[0]], avg_x[:-1]))[bucket]
+    a_y = np.concatenate(([y[0]], avg_y[:-1]))[bucket]
+    c_x = np.concatenate((avg_x[1:], [x[-1]]))[bucket]
+    c_y = np.concatenate((avg_y[1:], [y[-1]]))[bucket]
+    
+    inner_x = x[1:-1]
+    inner_y = y[1:-1]
+    area = np.abs((a_x - c_x) * (inner_y - a_y) - (a_x - inner_x) * (c_y - a_y))
+    
+    # Первая точка с наибольшей площадью в каждой корзине
+    best = area == np.repeat(np.maximum.reduceat(area, starts - 1), counts)
+    candidates = np.flatnonzero(best)
+    _, first = np.unique(bucket[candidates], return_index=True)
+    
+    return np.concatenate(([0], candidates[first] + 1, [size - 1]))
+
+
+def downsample(timestamps: np.ndarray, buy: np.ndarray, sell: np.ndarray,
+               max_points: int) -> np.ndarray:
+    """
+    Индексы общих для обеих серий точек: LTTB по покупке и продаже (по
+    половине max_points на серию) и минимумы/максимумы каждой серии, чтобы
+    пики и провалы курса не пропадали с графика.
+    """
+    if len(timestamps) <= max_points:
+        return np.arange(len(timestamps))
+    
+    x = timestamps.astype(np.float64)
+    half = max(3, max_points // 2)
+    extremes = [buy.argmin(), buy.argmax(), sell.argmin(), sell.argmax()]
+    return np.union1d(
+        np.union1d(lttb_indices(x, buy, half), lttb_indices(x, sell, half)),
+        extremes
+    )
+
+
+class ChartTemplate:
+    """
+    Фигура графика одной пары (валюта, период), собранная один раз:
+    заголовок, подписи, локаторы дат, сетка, легенда и рамка с текущим
+    курсом. Отрисовка меняет только данные линий, заливки и текст рамки.
+    """
+    
+    __slots__ = ('fig', 'ax', 'buy_line', 'sell_line', 'fill', 'current')
 
 
 class ChartGenerator:
@@ -16,41 +95,31 @@ class ChartGenerator:
             'EUR': '#3498db',
             'line': '#e74c3c'
         }
+        self.dpi = 150
+        self._templates: Dict[Tuple[str, str], ChartTemplate] = {}
     
-    def generate_rate_chart(self, currency: str, data: List[Dict], 
-                          period: str = 'day') -> io.BytesIO:
-        """
-        Генерация графика курса валюты
-        
-        Args:
-            currency: Код валюты (USD, EUR)
-            data: Список словарей с ключами timestamp, buy, sell
-            period: Период (day, week, month)
-        
-        Returns:
-            BytesIO объект с PNG изображением
-        """
-        if not data or len(data) < 2:
-            return self._generate_no_data_chart(currency)
-        
-        # Извлекаем данные
-        timestamps = [datetime.fromisoformat(d['timestamp']) for d in data]
-        buy_rates = [d['buy'] for d in data]
-        sell_rates = [d['sell'] for d in data]
-        
-        # Создаём фигуру
-        fig, ax = plt.subplots(figsize=(12, 6), facecolor='#f8f9fa')
+    def _build_template(self, currency: str, period: str) -> ChartTemplate:
+        # Figure без pyplot: шаблоны живут всё время процесса и не
+        # копятся в реестре открытых фигур
+        fig = Figure(figsize=(12, 6), facecolor='#f8f9fa')
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
         ax.set_facecolor('#ffffff')
+        ax.xaxis_date()
         
-        # Рисуем линии
-        ax.plot(timestamps, buy_rates, 
+        template = ChartTemplate()
+        template.fig = fig
+        template.ax = ax
+        
+        # Рисуем линии (данные подставляет render_template)
+        template.buy_line, = ax.plot([], [], 
                label=f'Покупка', 
                color=self.colors.get(currency, '#2ecc71'),
                linewidth=2.5,
                marker='o',
                markersize=4)
         
-        ax.plot(timestamps, sell_rates, 
+        template.sell_line, = ax.plot([], [], 
                label=f'Продажа', 
                color=self.colors['line'],
                linewidth=2.5,
@@ -59,7 +128,7 @@ class ChartGenerator:
                linestyle='--')
         
         # Заполнение между линиями
-        ax.fill_between(timestamps, buy_rates, sell_rates, 
+        template.fill = ax.fill_between([0, 1], [0, 0], [0, 0], 
                        alpha=0.2, 
                        color=self.colors.get(currency, '#2ecc71'))
         
@@ -89,7 +158,10 @@ class ChartGenerator:
             ax.xaxis.set_major_formatter(mdates.DateFormatter('%d.%m'))
             ax.xaxis.set_major_locator(mdates.DayLocator(interval=3))
         
-        plt.xticks(rotation=45, ha='right')
+        # Новые подписи делений копируют поворот и выравнивание первой
+        ax.tick_params(axis='x', labelrotation=45)
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment('right')
         
         # Сетка
         ax.grid(True, alpha=0.3, linestyle='--', linewidth=0.5)
@@ -100,30 +172,87 @@ class ChartGenerator:
                  shadow=True,
                  fontsize=11)
         
-        # Добавляем текущее значение
-        current_buy = buy_rates[-1]
-        current_sell = sell_rates[-1]
-        
-        textstr = f'Поточний курс:\nПокупка: {current_buy:.2f} ₴\nПродаж: {current_sell:.2f} ₴'
+        # Текущее значение (текст подставляет render_template)
         props = dict(boxstyle='round', facecolor='wheat', alpha=0.8)
-        ax.text(0.02, 0.98, textstr, 
+        template.current = ax.text(0.02, 0.98, '', 
                transform=ax.transAxes,
                fontsize=10,
                verticalalignment='top',
                bbox=props)
         
+        return template
+    
+    def _template(self, currency: str, period: str) -> ChartTemplate:
+        template = self._templates.get((currency, period))
+        if template is None:
+            template = self._templates[(currency, period)] = self._build_template(currency, period)
+        return template
+    
+    def _max_points(self, template: ChartTemplate) -> int:
+        width_px = template.ax.get_position().width * template.fig.get_figwidth() * self.dpi
+        return int(width_px // POINT_SPACING_PX)
+    
+    def generate_rate_chart(self, currency: str, data: RateWindow, 
+                          period: str = 'day') -> io.BytesIO:
+        """
+        Генерация графика курса валюты
+        
+        Args:
+            currency: Код валюты (USD, EUR)
+            data: Окно истории (колонки timestamps, buy, sell)
+            period: Период (day, week, month)
+        
+        Returns:
+            BytesIO объект с PNG изображением
+        """
+        if len(data) < 2:
+            return self._generate_no_data_chart(currency)
+        
+        # Извлекаем данные: колонки курсов передаются как есть, без копий
+        timestamps = np.frombuffer(data.timestamps, dtype=np.int64)
+        buy_rates = np.frombuffer(data.buy, dtype=np.float64)
+        sell_rates = np.frombuffer(data.sell, dtype=np.float64)
+        
+        template = self._template(currency, period)
+        ax = template.ax
+        
+        # Точек не больше, чем помещается по ширине осей в пикселях
+        keep = downsample(timestamps, buy_rates, sell_rates, self._max_points(template))
+        if len(keep) < len(timestamps):
+            timestamps, buy_rates, sell_rates = timestamps[keep], buy_rates[keep], sell_rates[keep]
+        
+        dates = mdates.date2num([datetime.fromtimestamp(ts) for ts in timestamps.tolist()])
+        
+        template.buy_line.set_data(dates, buy_rates)
+        template.sell_line.set_data(dates, sell_rates)
+        if hasattr(template.fill, 'set_data'):
+            template.fill.set_data(dates, buy_rates, sell_rates)
+        else:
+            # matplotlib < 3.10: заливку нельзя обновить, рисуем заново
+            template.fill.remove()
+            template.fill = ax.fill_between(dates, buy_rates, sell_rates,
+                                            alpha=0.2,
+                                            color=self.colors.get(currency, '#2ecc71'))
+        
+        template.current.set_text(
+            f'Поточний курс:\nПокупка: {buy_rates[-1]:.2f} ₴\nПродаж: {sell_rates[-1]:.2f} ₴'
+        )
+        
+        # Пределы осей по новым данным
+        ax.relim()
+        ax.autoscale_view()
+        
         # Плотная компоновка
-        plt.tight_layout()
+        template.fig.tight_layout()
         
         # Сохраняем в BytesIO
         buf = io.BytesIO()
-        plt.savefig(buf, 
+        template.fig.savefig(buf, 
                    format='png', 
-                   dpi=150, 
+                   dpi=self.dpi, 
                    bbox_inches='tight',
                    facecolor='#f8f9fa')
         buf.seek(0)
-        plt.close(fig)
         
         return buf
     
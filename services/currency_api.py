@@ -1,38 +1,330 @@
+import asyncio
+import json
+import logging
+import random
+import time
 import aiohttp
-from typing import Dict, Optional
-from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Sequence, Tuple
+from datetime import datetime, timedelta
 import pytz
+from config import (CURRENCIES, MONOBANK_BASE_URL, NBU_BASE_URL, PRIVATBANK_BASE_URL,
+                    UPDATE_INTERVAL)
+from services.provider_payloads import decode_mono, decode_nbu, decode_privat
+
+
+logger = logging.getLogger(__name__)
+
+# Поставщики курсов в порядке вывода
+PROVIDERS = ('nbu', 'monobank', 'privatbank')
+
+# Пути API банков; адрес сервера задаётся отдельно (config.*_BASE_URL)
+PROVIDER_PATHS = {
+    'nbu': '/NBUStatService/v1/statdirectory/exchange?json',
+    'monobank': '/bank/currency',
+    'privatbank': '/p24api/pubinfo?exchange&coursid=5'
+}
+DEFAULT_BASE_URLS = {
+    'nbu': NBU_BASE_URL,
+    'monobank': MONOBANK_BASE_URL,
+    'privatbank': PRIVATBANK_BASE_URL
+}
+
+KYIV_TZ = pytz.timezone('Europe/Kiev')
+
+
+def _freeze(value: Any) -> Any:
+    """Словари — в MappingProxyType, списки — в кортежи (рекурсивно)"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class CircuitOpen(Exception):
+    """Банк временно не опрашивается: автомат разомкнут"""
+
+
+class CircuitBreaker:
+    """
+    Автомат на один банк. После threshold ошибок подряд банк не
+    опрашивается base_delay секунд; каждая следующая ошибка удваивает
+    паузу (до max_delay) со случайным разбросом ±20%, чтобы повторы не
+    шли ровно в такт. По истечении паузы пропускается пробный запрос.
+    """
+    
+    __slots__ = ('threshold', 'base_delay', 'max_delay', 'failures',
+                 'open_until', 'trips', 'rejected')
+    
+    def __init__(self, threshold: int = 3, base_delay: float = 10.0,
+                 max_delay: float = 600.0):
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        
+        self.failures = 0        # ошибок подряд
+        self.open_until = 0.0    # time.monotonic() конца паузы
+        self.trips = 0           # сколько раз автомат размыкался
+        self.rejected = 0        # запросов, не пропущенных к банку
+    
+    @property
+    def state(self) -> str:
+        if self.failures < self.threshold:
+            return 'closed'
+        return 'open' if time.monotonic() < self.open_until else 'half-open'
+    
+    def allow(self) -> bool:
+        if self.state == 'open':
+            self.rejected += 1
+            return False
+        return True
+    
+    def record_success(self):
+        self.failures = 0
+        self.open_until = 0.0
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            delay = min(self.max_delay,
+                        self.base_delay * 2 ** (self.failures - self.threshold))
+            self.open_until = time.monotonic() + delay * random.uniform(0.8, 1.2)
+            self.trips += 1
+    
+    def stats(self) -> Dict:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'retry_in': round(max(0.0, self.open_until - time.monotonic()), 1),
+            'trips': self.trips,
+            'rejected': self.rejected
+        }
+
+
+class RateLimited(Exception):
+    """Запрос к банку не влезает в его лимит: жетонов в ведре нет"""
+
+
+class TokenBucket:
+    """
+    Лимит запросов к одному банку: capacity жетонов, пополняются со
+    скоростью rate в секунду. Запрос без жетона к банку не уходит.
+    """
+    
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'rejected')
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.rejected = 0
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        self.rejected += 1
+        return False
+    
+    def wait_time(self) -> float:
+        """Секунд до следующего жетона"""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class ProviderSchedule:
+    """
+    Когда опрашивать банк: каждые interval секунд (±jitter доли) или
+    раз в день в моменты daily_at (часы, минуты по Киеву) плюс случайная
+    задержка до jitter секунд.
+    """
+    
+    __slots__ = ('interval', 'daily_at', 'jitter')
+    
+    def __init__(self, interval: Optional[float] = None,
+                 daily_at: Sequence[Tuple[int, int]] = (), jitter: float = 0.1):
+        self.interval = interval
+        self.daily_at = tuple(daily_at)
+        self.jitter = jitter
+    
+    def next_delay(self, now: Optional[datetime] = None) -> float:
+        """Секунд до следующего опроса"""
+        if self.interval is not None:
+            return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        
+        now = now or datetime.now(KYIV_TZ)
+        candidates = []
+        for hour, minute in self.daily_at:
+            moment = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if moment <= now:
+                moment += timedelta(days=1)
+            candidates.append((moment - now).total_seconds())
+        return min(candidates) + random.uniform(0, self.jitter)
+    
+    def max_delay(self) -> float:
+        """Самая длинная возможная пауза между плановыми опросами, секунд"""
+        if self.interval is not None:
+            return self.interval * (1 + self.jitter)
+        
+        moments = sorted(hour * 3600 + minute * 60 for hour, minute in self.daily_at)
+        gaps = [later - earlier for earlier, later in zip(moments, moments[1:])]
+        gaps.append(moments[0] + 86400 - moments[-1])
+        return max(gaps) + self.jitter
+
+
+class RatesSnapshot:
+    """
+    Опубликованные курсы: результат get_all_rates, доступный только для
+    чтения. version растёт, только когда меняются курсы какого-либо банка
+    (отметки свежести и время обновляются и без этого), поэтому по номеру
+    видно, пришли ли новые курсы.
+    """
+    
+    __slots__ = ('version', 'rates', 'published')
+    
+    def __init__(self, version: int, rates: Dict, published: float):
+        self.version = version
+        self.rates: Mapping = _freeze(rates)
+        self.published = published  # time.monotonic()
+    
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.published
+    
+    def __repr__(self) -> str:
+        return f"RatesSnapshot(v{self.version}, {self.age:.0f} с)"
 
 
 class CurrencyAPI:
-    def __init__(self):
-        self.nbu_url = "https://bank.gov.ua/NBUStatService/v1/statdirectory/exchange?json"
-        self.mono_url = "https://api.monobank.ua/bank/currency"
-        self.privat_url = "https://api.privatbank.ua/p24api/pubinfo?exchange&coursid=5"
+    def __init__(self, base_urls: Optional[Dict[str, str]] = None):
+        # base_urls: банк -> адрес сервера, поверх config.*_BASE_URL
+        base_urls = {**DEFAULT_BASE_URLS, **(base_urls or {})}
+        self.nbu_url = base_urls['nbu'].rstrip('/') + PROVIDER_PATHS['nbu']
+        self.mono_url = base_urls['monobank'].rstrip('/') + PROVIDER_PATHS['monobank']
+        self.privat_url = base_urls['privatbank'].rstrip('/') + PROVIDER_PATHS['privatbank']
         
-        self.cache = {}
+        # Ответы банков: имя -> (time.monotonic() получения, курсы).
+        # Пока запись свежа (_is_fresh), банк повторно не опрашивается;
+        # одновременные промахи ждут один общий запрос (_inflight)
+        self.cache: Dict[str, Tuple[float, Dict]] = {}
         self.cache_timeout = 300  # 5 минут
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.cache_stats = {'hit': 0, 'miss': 0, 'coalesced': 0}
+        
+        # Неотвечающий банк отключается автоматом; пока он разомкнут,
+        # отдаются последние удачные курсы из cache с их возрастом
+        self.breakers = {name: CircuitBreaker() for name in PROVIDERS}
+        
+        # Одна сессия на весь процесс: соединения с банками живут между
+        # запросами (keep-alive), DNS и TLS не повторяются на каждый курс
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        # Банки опрашиваются параллельно: у каждого свой срок, а весь
+        # get_all_rates укладывается в общий бюджет. Кто не успел — приходит
+        # с пометкой в result['sources'], а не задерживает остальных
+        self.source_timeouts = {'nbu': 4.0, 'monobank': 4.0, 'privatbank': 4.0}
+        self.total_budget = 5.0
+        
+        # Снимок курсов публикует фоновое обновление (bot.py); хендлеры и
+        # проверка alerts только читают его. Старше snapshot_max_age —
+        # отдаётся как есть, а в фоне запускается одно обновление
+        self._snapshot: Optional[RatesSnapshot] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self.snapshot_max_age = 360  # с планировщиком снимок обновляется чаще
+        
+        # Планировщик (run_scheduler): у каждого банка свой ритм и лимит.
+        # НБУ меняет курс раз в сутки — опрос после полуночи (новый курс
+        # вступает в силу) и после дневной публикации; Monobank отдаёт
+        # /bank/currency не чаще раза в минуту (ведро), опрашиваем вдвое
+        # чаще прежних 5 минут; PrivatBank — в прежнем ритме. Вместе это
+        # не больше запросов, чем прежний опрос всех трёх раз в 5 минут.
+        # Пока не подошёл срок следующего опроса, кэш банка свежий
+        self.schedules = {
+            'nbu': ProviderSchedule(daily_at=[(0, 5), (16, 0)], jitter=300),
+            'monobank': ProviderSchedule(interval=UPDATE_INTERVAL / 2),
+            'privatbank': ProviderSchedule(interval=UPDATE_INTERVAL)
+        }
+        self.buckets = {
+            'nbu': TokenBucket(rate=1 / 300, capacity=3),
+            'monobank': TokenBucket(rate=1 / 60, capacity=1),
+            'privatbank': TokenBucket(rate=1 / 60, capacity=3)
+        }
+        self._next_due: Dict[str, float] = {}
+        
+        # Отпечаток курсов каждого банка: пока он не меняется, версия
+        # курсов банка (quote_versions) стоит на месте, и история, alerts
+        # и графики не пересчитываются. change_stats — сколько опросов
+        # что-то изменили, а сколько нет (пропущенная работа)
+        self._fingerprints: Dict[str, str] = {}
+        self.quote_versions = {name: 0 for name in PROVIDERS}
+        self._notified = {name: 0 for name in PROVIDERS}
+        self.change_stats = {name: {'changed': 0, 'unchanged': 0} for name in PROVIDERS}
+        self._published_quotes: Optional[tuple] = None
+        self.snapshots_unchanged = 0
+        self.schedule_grace = 30  # запас на опоздание опроса, секунд
+        # Последний запрос к банку не удался: его кэш уже не свежий, и
+        # снимок помечает банк stale, пока опрос не пройдёт успешно
+        self._last_failed = {name: False for name in PROVIDERS}
+        self.fetch_counts = {name: 0 for name in PROVIDERS}
+    
+    # === СЕССИЯ ===
+    @staticmethod
+    def _create_session() -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=20,
+            limit_per_host=4,        # к одному банку не больше 4 соединений
+            ttl_dns_cache=600,       # адреса банков кэшируются на 10 минут
+            keepalive_timeout=90     # дольше паузы между обновлениями курсов
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=10)
+        )
+    
+    async def start(self):
+        """Открыть сессию (on_startup); повторный вызов ничего не делает"""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+    
+    async def close(self):
+        """Закрыть сессию и её соединения (on_shutdown)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
-    async def _fetch(self, url: str) -> Optional[Dict]:
+    async def _fetch(self, url: str) -> Optional[bytes]:
+        """Тело ответа как есть; разбирают его decode_* (provider_payloads)"""
+        # Без on_startup (скрипты, бенчмарки) сессия открывается при первом запросе
+        await self.start()
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=10) as response:
-                    if response.status == 200:
-                        return await response.json()
+            async with self._session.get(url) as response:
+                if response.status == 200:
+                    return await response.read()
         except Exception as e:
-            print(f"Ошибка при запросе {url}: {e}")
+            logger.warning(f"Ошибка при запросе {url}: {e}")
         return None
     
     async def get_nbu_rates(self) -> Dict[str, float]:
         """Получить официальные курсы НБУ"""
-        data = await self._fetch(self.nbu_url)
+        raw = await self._fetch(self.nbu_url)
         
         rates = {}
-        if data:
-            for item in data:
-                if item.get('cc') in ['USD', 'EUR']:
-                    rates[item['cc']] = {
-                        'rate': round(item.get('rate', 0), 2),
+        if raw:
+            index = decode_nbu(raw)
+            for currency in CURRENCIES:
+                quote = index.get(currency)
+                # Без курса в ответе — нет котировки, а не ноль
+                if quote is not None and quote.rate is not None:
+                    rates[currency] = {
+                        'rate': round(quote.rate, 2),
                         'source': 'nbu'
                     }
         
@@ -40,22 +332,20 @@ class CurrencyAPI:
     
     async def get_mono_rates(self) -> Dict[str, Dict]:
         """Получить курсы Monobank"""
-        data = await self._fetch(self.mono_url)
+        raw = await self._fetch(self.mono_url)
         
         rates = {}
-        if data:
-            # Коды валют: 840 = USD, 978 = EUR, 980 = UAH
-            currency_codes = {840: 'USD', 978: 'EUR'}
-            
-            for item in data:
-                currency_code = item.get('currencyCodeA')
-                base_code = item.get('currencyCodeB')
-                
-                if currency_code in currency_codes and base_code == 980:
-                    currency = currency_codes[currency_code]
+        if raw:
+            index = decode_mono(raw)
+            for currency in CURRENCIES:
+                quote = index.get(currency)
+                # Для части валют (PLN, GBP...) Monobank отдаёт только
+                # кросс-курс rateCross без покупки и продажи: это не курс
+                # обмена, такие валюты считаются не котируемыми банком
+                if quote is not None and quote.buy is not None and quote.sell is not None:
                     rates[currency] = {
-                        'buy': round(item.get('rateBuy', 0), 2),
-                        'sell': round(item.get('rateSell', 0), 2),
+                        'buy': round(quote.buy, 2),
+                        'sell': round(quote.sell, 2),
                         'source': 'monobank'
                     }
         
@@ -63,46 +353,321 @@ class CurrencyAPI:
     
     async def get_privat_rates(self) -> Dict[str, Dict]:
         """Получить курсы PrivatBank"""
-        data = await self._fetch(self.privat_url)
+        raw = await self._fetch(self.privat_url)
         
         rates = {}
-        if data:
-            for item in data:
-                currency = item.get('ccy')
-                if currency in ['USD', 'EUR']:
+        if raw:
+            index = decode_privat(raw)
+            for currency in CURRENCIES:
+                quote = index.get(currency)
+                if quote is not None:
                     rates[currency] = {
-                        'buy': round(float(item.get('buy', 0)), 2),
-                        'sell': round(float(item.get('sale', 0)), 2),
+                        'buy': round(quote.buy, 2),
+                        'sell': round(quote.sell, 2),
                         'source': 'privatbank'
                     }
         
         return rates
     
-    async def get_all_rates(self) -> Dict:
-        """Получить все курсы одновременно"""
-        nbu = await self.get_nbu_rates()
-        mono = await self.get_mono_rates()
-        privat = await self.get_privat_rates()
-        
-        kyiv_tz = pytz.timezone('Europe/Kiev')
-        current_time = datetime.now(kyiv_tz).strftime('%H:%M')
-        
-        result = {
-            'timestamp': current_time,
-            'USD': {
-                'nbu': nbu.get('USD', {}).get('rate'),
-                'monobank': mono.get('USD', {}),
-                'privatbank': privat.get('USD', {})
-            },
-            'EUR': {
-                'nbu': nbu.get('EUR', {}).get('rate'),
-                'monobank': mono.get('EUR', {}),
-                'privatbank': privat.get('EUR', {})
-            }
+    # === КЭШ ===
+    async def _cached(self, name: str, loader: Callable[[], Awaitable[Dict]],
+                      max_age: Optional[float] = None) -> Dict:
+        """
+        Курсы банка name из кэша или от loader().
+        
+        max_age сужает срок годности кэша для этого вызова (0 — всегда
+        свежий запрос, но одновременный запрос к банку всё равно общий).
+        """
+        entry = self.cache.get(name)
+        if entry is not None and self._is_fresh(name, entry[0], max_age):
+            self.cache_stats['hit'] += 1
+            return entry[1]
+        
+        task = self._inflight.get(name)
+        if task is not None:
+            self.cache_stats['coalesced'] += 1
+        else:
+            if not self.breakers[name].allow():
+                raise CircuitOpen(name)
+            if not self.buckets[name].try_acquire():
+                raise RateLimited(name)
+            self.cache_stats['miss'] += 1
+            self.fetch_counts[name] += 1
+            task = asyncio.create_task(self._load(name, loader))
+            self._inflight[name] = task
+        
+        # shield: срок одного ожидающего (wait_for) не отменяет общий запрос
+        return await asyncio.shield(task)
+    
+    def _is_fresh(self, name: str, fetched: float, max_age: Optional[float]) -> bool:
+        """
+        Свежа ли запись кэша банка name, полученная в fetched.
+        
+        С планировщиком запись свежа до его следующего опроса, но не дольше
+        самой длинной паузы расписания плюс schedule_grace (планировщик мог
+        встать) и только если последний запрос к банку удался. Без
+        планировщика — cache_timeout секунд. max_age дополнительно
+        ограничивает возраст.
+        """
+        now = time.monotonic()
+        age = now - fetched
+        if max_age is not None and age >= max_age:
+            return False
+        if name in self._next_due:
+            if self._last_failed[name]:
+                return False
+            if age > self.schedules[name].max_delay() + self.schedule_grace:
+                return False
+            return now < self._next_due[name] + self.schedule_grace
+        return age < self.cache_timeout
+    
+    async def _load(self, name: str, loader: Callable[[], Awaitable[Dict]]) -> Dict:
+        breaker = self.breakers[name]
+        try:
+            rates = await loader()
+        except Exception:
+            self._last_failed[name] = True
+            breaker.record_failure()
+            raise
+        finally:
+            del self._inflight[name]
+        
+        # Пустой ответ — ошибка банка, его не кэшируем
+        self._last_failed[name] = not rates
+        if rates:
+            self.cache[name] = (time.monotonic(), rates)
+            self._track_change(name, rates)
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        return rates
+    
+    def _track_change(self, name: str, rates: Dict):
+        """Сдвинуть версию курсов банка, если они отличаются от прежних"""
+        fingerprint = json.dumps(rates, sort_keys=True)
+        if fingerprint == self._fingerprints.get(name):
+            self.change_stats[name]['unchanged'] += 1
+            return
+        
+        self._fingerprints[name] = fingerprint
+        self.quote_versions[name] += 1
+        self.change_stats[name]['changed'] += 1
+    
+    def get_cache_stats(self) -> Dict:
+        """Счётчики кэша и возраст записи каждого банка в секундах"""
+        now = time.monotonic()
+        return {
+            **self.cache_stats,
+            'age': {name: round(now - fetched, 1) for name, (fetched, _) in self.cache.items()}
+        }
+    
+    def get_change_stats(self) -> Dict:
+        """Опросы с новыми курсами и без, по банкам; снимки без изменений"""
+        return {
+            **{name: dict(stats) for name, stats in self.change_stats.items()},
+            'snapshots_unchanged': self.snapshots_unchanged
+        }
+    
+    def get_breaker_stats(self) -> Dict:
+        """Состояние автомата каждого банка: closed / open / half-open"""
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
+    
+    # === ВСЕ БАНКИ ===
+    async def _get_source(self, name: str,
+                          max_age: Optional[float] = None) -> Tuple[Dict, Dict]:
+        """
+        Курсы одного банка и отметка свежести. status: ok — ответ моложе
+        срока кэша; stale — банк не ответил (error / timeout / open), отданы
+        последние удачные курсы возрастом age секунд; error, timeout, open
+        или limited — удачных курсов ещё не было.
+        """
+        getter = {
+            'nbu': self.get_nbu_rates,
+            'monobank': self.get_mono_rates,
+            'privatbank': self.get_privat_rates
+        }[name]
+        
+        started = time.monotonic()
+        try:
+            rates = await asyncio.wait_for(self._cached(name, getter, max_age),
+                                           self.source_timeouts[name])
+            status = 'ok' if rates else 'error'
+        except asyncio.TimeoutError:
+            rates, status = {}, 'timeout'
+        except CircuitOpen:
+            rates, status = {}, 'open'
+        except RateLimited:
+            rates, status = {}, 'limited'
+        except Exception as e:
+            logger.exception(f"Ошибка при разборе курсов {name}: {e}")
+            rates, status = {}, 'error'
+        
+        return self._with_fallback(name, rates, status, started)
+    
+    def _with_fallback(self, name: str, rates: Dict, status: str,
+                       started: float) -> Tuple[Dict, Dict]:
+        """Вместо пустого ответа — последние удачные курсы банка из cache"""
+        entry = self.cache.get(name)
+        if not rates and entry is not None:
+            rates, status = entry[1], 'stale'
+        
+        # Время получения ответа банком, а не выдачи из кэша
+        age = fetched_at = None
+        if rates and entry is not None:
+            age = time.monotonic() - entry[0]
+            fetched_at = time.time() - age
+        
+        return rates, {
+            'status': status,
+            'elapsed': round(time.monotonic() - started, 3),
+            'fetched_at': fetched_at,
+            'age': round(age) if age is not None else None
+        }
+    
+    async def get_all_rates(self, max_age: Optional[float] = None) -> Dict:
+        """
+        Получить все курсы одновременно.
+        
+        Ответы банков берутся из кэша, пока они свежи (_is_fresh) и
+        моложе max_age секунд.
+        """
+        started = time.monotonic()
+        tasks = {
+            name: asyncio.create_task(self._get_source(name, max_age))
+            for name in PROVIDERS
         }
+        done, pending = await asyncio.wait(tasks.values(), timeout=self.total_budget)
+        
+        # Не уложившиеся в общий бюджет отменяются; вместо них — последние
+        # удачные курсы, если они есть
+        for task in pending:
+            task.cancel()
+        
+        results = {}
+        for name, task in tasks.items():
+            if task in done:
+                results[name] = task.result()
+            else:
+                results[name] = self._with_fallback(name, {}, 'timeout', started)
+        
+        nbu, mono, privat = (results[name][0] for name in PROVIDERS)
+        
+        current_time = datetime.now(KYIV_TZ).strftime('%H:%M')
+        
+        # Курсы по каждой валюте из CURRENCIES: НБУ — одно число, банки —
+        # покупка/продажа (пустой словарь, если банк её не котирует)
+        result = {'timestamp': current_time}
+        for currency in CURRENCIES:
+            result[currency] = {
+                'nbu': nbu.get(currency, {}).get('rate'),
+                'monobank': mono.get(currency, {}),
+                'privatbank': privat.get(currency, {})
+            }
+        result['sources'] = {name: results[name][1] for name in PROVIDERS}
         
         return result
     
+    # === СНИМОК КУРСОВ ===
+    async def refresh(self, max_age: Optional[float] = 0) -> RatesSnapshot:
+        """
+        Получить курсы и опубликовать их новым снимком. По умолчанию все
+        банки опрашиваются заново; max_age=None берёт свежий кэш.
+        """
+        rates = await self.get_all_rates(max_age=max_age)
+        
+        quotes = tuple(self.quote_versions[name] for name in PROVIDERS)
+        version = self._snapshot.version if self._snapshot else 0
+        if quotes != self._published_quotes:
+            version += 1
+            self._published_quotes = quotes
+        else:
+            self.snapshots_unchanged += 1
+        
+        self._snapshot = RatesSnapshot(version, rates, time.monotonic())
+        return self._snapshot
+    
+    async def get_snapshot(self) -> RatesSnapshot:
+        """
+        Последний опубликованный снимок без обращения к банкам.
+        
+        Сеть нужна только до первой публикации. Устаревший снимок
+        отдаётся сразу, обновление идёт в фоне (одно на всех).
+        """
+        if self._snapshot is None:
+            return await self._refresh_once()
+        
+        if self._snapshot.age > self.snapshot_max_age:
+            self._refresh_in_background()
+        return self._snapshot
+    
+    def _refresh_in_background(self):
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self.refresh(max_age=None))
+            self._refreshing.add_done_callback(self._log_refresh_error)
+    
+    async def _refresh_once(self) -> RatesSnapshot:
+        # Одновременные первые читатели ждут одно обновление
+        self._refresh_in_background()
+        return await asyncio.shield(self._refreshing)
+    
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Ошибка фонового обновления курсов: {task.exception()}")
+    
+    # === ПЛАНИРОВЩИК ===
+    async def run_scheduler(self, on_update: Callable[[str, RatesSnapshot], Awaitable]):
+        """
+        Опрашивать каждый банк в своём ритме (schedules) до отмены задачи.
+        
+        После каждого опроса публикуется снимок (остальные банки — из
+        кэша). Если курсы банка изменились, вызывается
+        on_update(имя банка, снимок) — один раз на каждое изменение.
+        """
+        await asyncio.gather(*(
+            self._schedule_loop(name, on_update) for name in PROVIDERS
+        ))
+    
+    async def _schedule_loop(self, name: str, on_update):
+        schedule = self.schedules[name]
+        breaker = self.breakers[name]
+        bucket = self.buckets[name]
+        
+        while True:
+            delay = schedule.next_delay()
+            try:
+                _, mark = await self._get_source(name, max_age=0)
+                snapshot = await self.refresh(max_age=None)
+                
+                if self.quote_versions[name] != self._notified[name]:
+                    self._notified[name] = self.quote_versions[name]
+                    await on_update(name, snapshot)
+                
+                if mark['status'] != 'ok':
+                    logger.warning(f"{name} без свежих курсов: {mark['status']}")
+                    # Неудача: повтор раньше обычного, но не раньше, чем
+                    # позволят автомат и лимит банка
+                    retry = max(30.0, breaker.stats()['retry_in'], bucket.wait_time())
+                    delay = min(delay, retry)
+            except Exception as e:
+                logger.error(f"Ошибка планировщика {name}: {e}")
+            
+            self._next_due[name] = time.monotonic() + delay
+            await asyncio.sleep(delay)
+    
+    def get_scheduler_stats(self) -> Dict:
+        """Опросов, секунд до следующего и жетонов каждого банка"""
+        now = time.monotonic()
+        return {
+            name: {
+                'fetches': self.fetch_counts[name],
+                'next_in': round(self._next_due[name] - now, 1) if name in self._next_due else None,
+                'tokens': round(self.buckets[name].tokens, 2),
+                'limited': self.buckets[name].rejected
+            }
+            for name in PROVIDERS
+        }
+    
     def calculate_change(self, current: float, previous: float) -> tuple:
         """Расчет изменения курса (разница и процент)"""
         if not previous or previous == 0:
@@ -0,0 +1,133 @@
+# Обменники, которыми заполняется новое хранилище
+DEFAULT_EXCHANGERS = [
+    {
+        "id": 1,
+        "name": "Обмінник Позняки",
+        "address": "просп. Петра Григоренка, 28, Київ",
+        "district": "Позняки",
+        "phone": "+380 (50) 388-88-65",
+        "lat": 50.4165,
+        "lon": 30.6327,
+        "rates": {
+            "USD": {"buy": None, "sell": None, "updated": None},
+            "EUR": {"buy": None, "sell": None, "updated": None}
+        }
+    },
+    {
+        "id": 2,
+        "name": "Money Exchange Kyiv",
+        "address": "вул. Ревуцького, 12/1, Київ",
+        "district": "Осокорки/Позняки",
+        "phone": "",
+        "lat": 50.4189,
+        "lon": 30.6145,
+        "rates": {
+            "USD": {"buy": None, "sell": None, "updated": None},
+            "EUR": {"buy": None, "sell": None, "updated": None}
+        }
+    },
+    {
+        "id": 3,
+        "name": "Обмін Валют GARANT",
+        "address": "Харківське шосе, 144В, Київ",
+        "district": "Харківський масив",
+        "phone": "",
+        "lat": 50.4012,
+        "lon": 30.6589,
+        "rates": {
+            "USD": {"buy": None, "sell": None, "updated": None},
+            "EUR": {"buy": None, "sell": None, "updated": None}
+        }
+    },
+    {
+        "id": 4,
+        "name": "Обмін валют",
+        "address": "вул. Ялтинська, 6, Київ",
+        "district": "Дарниця",
+        "phone": "",
+        "lat": 50.4453,
+        "lon": 30.6234,
+        "rates": {
+            "USD": {"buy": None, "sell": None, "updated": None},
+            "EUR": {"buy": None, "sell": None, "updated": None}
+        }
+    },
+    {
+        "id": 5,
+        "name": "Obmin Valyut",
+        "address": "вул. Срібнокільська, 1-А, Київ",
+        "district": "Осокорки/Позняки",
+        "phone": "",
+        "lat": 50.4001,
+        "lon": 30.6178,
+        "rates": {
+            "USD": {"buy": None, "sell": None, "updated": None},
+            "EUR": {"buy": None, "sell": None, "updated": None}
+        }
+    },
+    {
+        "id": 6,
+        "name": "Obmen Vsekh Valyut",
+        "address": "вул. Срібнокільська, 3Д, Київ",
+        "district": "Осокорки/Позняки",
+        "phone": "",
+        "lat": 50.3998,
+        "lon": 30.6201,
+        "rates": {
+            "USD": {"buy": None, "sell": None, "updated": None},
+            "EUR": {"buy": None, "sell": None, "updated": None}
+        }
+    },
+    {
+        "id": 7,
+        "name": "Obmin Valyut",
+        "address": "вул. Олени Пчілки, 2, Київ",
+        "district": "Дарницький",
+        "phone": "",
+        "lat": 50.4389,
+        "lon": 30.6123,
+        "rates": {
+            "USD": {"buy": None, "sell": None, "updated": None},
+            "EUR": {"buy": None, "sell": None, "updated": None}
+        }
+    },
+    {
+        "id": 8,
+        "name": "Обмін валют",
+        "address": "просп. Миколи Бажана, 26, Київ",
+        "district": "Осокорки/Позняки",
+        "phone": "",
+        "lat": 50.4234,
+        "lon": 30.6412,
+        "rates": {
+            "USD": {"buy": None, "sell": None, "updated": None},
+            "EUR": {"buy": None, "sell": None, "updated": None}
+        }
+    },
+    {
+        "id": 9,
+        "name": "Money Exchange Kyiv",
+        "address": "Дніпровська площа, 1, Київ",
+        "district": "Дарницький",
+        "phone": "",
+        "lat": 50.4512,
+        "lon": 30.6289,
+        "rates": {
+            "USD": {"buy": None, "sell": None, "updated": None},
+            "EUR": {"buy": None, "sell": None, "updated": None}
+        }
+    },
+    {
+        "id": 10,
+        "name": "Obmin Valyut",
+        "address": "вул. Михайла Драгоманова, 2, Київ",
+        "district": "Позняки/Харківський масив",
+        "phone": "",
+        "lat": 50.4089,
+        "lon": 30.6534,
+        "rates": {
+            "USD": {"buy": None, "sell": None, "updated": None},
+            "EUR": {"buy": None, "sell": None, "updated": None}
+        }
+    }
+]
@@ -0,0 +1,233 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+from services.rate_columns import RateWindow
+
+
+class RateHistoryLog:
+    """
+    Журнал истории курсов: JSON-строки, только дозапись.
+    
+    Журнал разбит на сегменты `<epoch_ms>.jsonl`, где имя — время первой
+    записи сегмента. Запись добавляется в конец последнего (активного)
+    сегмента за O(1); при превышении segment_max_bytes начинается новый.
+    Закрытые сегменты периодически сжимаются compact() — из них удаляются
+    записи старше max_age.
+    
+    Записи идут в порядке времени, поэтому чтение окна начинается с
+    бинарного поиска по смещениям в файле, а не с разбора всего журнала.
+    """
+    
+    SUFFIX = '.jsonl'
+    
+    def __init__(self, directory: str, segment_max_bytes: int = 1024 * 1024,
+                 max_age: timedelta = timedelta(hours=48)):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_age = max_age
+        
+        # Защищает список сегментов: дозапись и подмена файлов при сжатии
+        self._lock = threading.RLock()
+        
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+    
+    # === СЕГМЕНТЫ ===
+    def _segments(self) -> List[str]:
+        names = [
+            name for name in os.listdir(self.directory)
+            if name.endswith(self.SUFFIX)
+        ]
+        names.sort()
+        return [os.path.join(self.directory, name) for name in names]
+    
+    def _segment_path(self, timestamp: datetime) -> str:
+        epoch_ms = int(timestamp.timestamp() * 1000)
+        return os.path.join(self.directory, f"{epoch_ms:013d}{self.SUFFIX}")
+    
+    @classmethod
+    def _segment_start(cls, path: str) -> float:
+        return int(os.path.basename(path)[:-len(cls.SUFFIX)]) / 1000
+    
+    @staticmethod
+    def _encode(currency: str, source: str, buy: float, sell: float,
+                timestamp: str) -> str:
+        record = {
+            'currency': currency,
+            'source': source,
+            'buy': buy,
+            'sell': sell,
+            'timestamp': timestamp
+        }
+        return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+    
+    # === ЗАПИСЬ ===
+    def append(self, currency: str, source: str, buy: float, sell: float,
+               timestamp: Optional[datetime] = None):
+        timestamp = timestamp or datetime.now()
+        line = self._encode(currency, source, buy, sell, timestamp.isoformat())
+        
+        with self._lock:
+            segments = self._segments()
+            active = segments[-1] if segments else None
+            
+            if active is None or os.path.getsize(active) >= self.segment_max_bytes:
+                active = self._segment_path(timestamp)
+            
+            with open(active, 'a', encoding='utf-8') as f:
+                f.write(line)
+    
+    # === ЧТЕНИЕ ===
+    @staticmethod
+    def _line_time(line: bytes) -> Optional[datetime]:
+        try:
+            return datetime.fromisoformat(json.loads(line)['timestamp'])
+        except (ValueError, KeyError):
+            return None
+    
+    def _seek_offset(self, f, since: datetime) -> int:
+        """
+        Бинарный поиск смещения первой строки не раньше since.
+        
+        Смотрим на первую полную строку после середины интервала: если она
+        раньше since, всё до неё можно пропустить.
+        """
+        f.seek(0, os.SEEK_END)
+        lo, hi = 0, f.tell()
+        
+        while hi - lo > 4096:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            f.readline()  # дочитываем строку, в середину которой попали
+            line_start = f.tell()
+            line = f.readline()
+            
+            if not line:
+                hi = mid
+                continue
+            
+            line_time = self._line_time(line)
+            if line_time is not None and line_time < since:
+                lo = line_start
+            else:
+                hi = mid
+        
+        return lo
+    
+    def read(self, currency: str, source: str,
+             since: Optional[datetime] = None) -> List[Dict]:
+        """Записи пары (валюта, источник) строго новее since, по порядку"""
+        since_iso = since.isoformat() if since else ''
+        since_epoch = since.timestamp() if since else None
+        result = []
+        
+        with self._lock:
+            segments = self._segments()
+            
+            # Сегмент целиком старше окна, если следующий начинается до since
+            first = 0
+            if since_epoch is not None:
+                while (first + 1 < len(segments)
+                       and self._segment_start(segments[first + 1]) <= since_epoch):
+                    first += 1
+            
+            for i, path in enumerate(segments[first:]):
+                with open(path, 'rb') as f:
+                    if i == 0 and since is not None:
+                        f.seek(self._seek_offset(f, since))
+                    
+                    for line in f:
+                        record = json.loads(line)
+                        if (record['currency'] == currency
+                                and record['source'] == source
+                                and record['timestamp'] > since_iso):
+                            result.append({
+                                'buy': record['buy'],
+                                'sell': record['sell'],
+                                'timestamp': record['timestamp']
+                            })
+        
+        return result
+    
+    def window(self, currency: str, source: str,
+               since: Optional[datetime] = None) -> RateWindow:
+        return RateWindow.from_records(self.read(currency, source, since))
+    
+    def iter_records(self) -> Iterator[tuple]:
+        """(currency, source, buy, sell, timestamp) в порядке журнала"""
+        with self._lock:
+            segments = self._segments()
+        
+        for path in segments:
+            with open(path, 'rb') as f:
+                for line in f:
+                    record = json.loads(line)
+                    yield (record['currency'], record['source'], record['buy'],
+                           record['sell'], datetime.fromisoformat(record['timestamp']))
+    
+    def is_empty(self) -> bool:
+        with self._lock:
+            return not any(os.path.getsize(path) for path in self._segments())
+    
+    # === СЖАТИЕ ===
+    def compact(self, now: Optional[datetime] = None) -> int:
+        """
+        Удалить из закрытых сегментов записи старше max_age.
+        Возвращает число удалённых записей.
+        
+        Сегменты целиком старше срока просто удаляются; первый частично
+        устаревший переписывается с найденного бинарным поиском смещения.
+        Рассчитано на фоновый поток: под локом только подмена файлов.
+        """
+        cutoff = (now or datetime.now()) - self.max_age
+        cutoff_iso = cutoff.isoformat()
+        
+        with self._lock:
+            segments = self._segments()
+        
+        dropped = 0
+        for i, path in enumerate(segments[:-1]):
+            if self._segment_start(segments[i + 1]) <= cutoff.timestamp():
+                with open(path, 'rb') as f:
+                    dropped += sum(1 for _ in f)
+                with self._lock:
+                    os.remove(path)
+                continue
+            
+            tmp_path = os.path.join(self.directory, 'compact.tmp')
+            first_time = None
+            skipped = 0
+            with open(path, 'rb') as f, open(tmp_path, 'wb') as out:
+                # Всё до найденного смещения заведомо старше срока
+                offset = self._seek_offset(f, cutoff)
+                f.seek(0)
+                skipped += f.read(offset).count(b'\n')
+                
+                for line in f:
+                    record = json.loads(line)
+                    if first_time is None and record['timestamp'] < cutoff_iso:
+                        skipped += 1
+                        continue
+                    if first_time is None:
+                        first_time = datetime.fromisoformat(record['timestamp'])
+                    out.write(line)
+            
+            if not skipped:
+                os.remove(tmp_path)
+                break
+            dropped += skipped
+            
+            with self._lock:
+                if first_time is None:
+                    os.remove(tmp_path)
+                    os.remove(path)
+                else:
+                    target = self._segment_path(first_time)
+                    os.replace(tmp_path, target)
+                    if target != path:
+                        os.remove(path)
+            break
+        
+        return dropped
@@ -0,0 +1,129 @@
+import json
+from typing import Any, Iterator, Tuple
+
+
+class JsonStream:
+    """
+    Потоковое чтение большого JSON-файла без загрузки его в память.
+    
+    Файл читается кусками по chunk_size символов; контейнеры выше нужной
+    глубины проходятся посимвольно, а сами значения на этой глубине
+    разбираются json.raw_decode. В памяти одновременно лежит только
+    текущее значение и недочитанный хвост буфера.
+    """
+    
+    def __init__(self, path: str, chunk_size: int = 64 * 1024):
+        self.path = path
+        self.chunk_size = chunk_size
+        
+        self._decoder = json.JSONDecoder()
+        self._file = None
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+    
+    # === БУФЕР ===
+    def _fill(self, size: int = 0) -> bool:
+        """Дочитать кусок файла; False, если файл закончился"""
+        if self._eof:
+            return False
+        
+        chunk = self._file.read(max(size, self.chunk_size))
+        if not chunk:
+            self._eof = True
+            return False
+        
+        # Разобранное начало буфера больше не нужно
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+    
+    def _peek(self) -> str:
+        """Первый непробельный символ (без сдвига позиции)"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError(f"{self.path}: неожиданный конец файла")
+    
+    def _expect(self, char: str):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"{self.path}: ожидался '{char}', найден '{found}'")
+        self._pos += 1
+    
+    def _decode(self) -> Any:
+        """Разобрать одно значение целиком, дочитывая файл по необходимости"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Значение не поместилось: буфер растёт вдвое, чтобы большое
+                # значение не разбиралось заново на каждом куске
+                if self._fill(len(self._buf)):
+                    continue
+                raise
+            
+            # Число на границе куска могло оборваться: "12" из "123"
+            if end == len(self._buf) and self._fill(len(self._buf)):
+                continue
+            
+            self._pos = end
+            return value
+    
+    # === ОБХОД ===
+    def items(self, depth: int = 1) -> Iterator[Tuple[tuple, Any]]:
+        """
+        (путь, значение) для каждого значения на глубине depth.
+        
+        Путь — ключи объектов и индексы списков от корня. Для
+        user_settings.json depth=1 даёт (('123',), {...}), для
+        rates_history.json depth=3 — (('USD', 'nbu', 0), {...}).
+        """
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self._file = f
+            self._buf, self._pos, self._eof = '', 0, False
+            try:
+                yield from self._walk((), depth)
+            finally:
+                self._file = None
+                self._buf = ''
+    
+    def _walk(self, path: tuple, depth: int) -> Iterator[Tuple[tuple, Any]]:
+        if depth == 0:
+            yield path, self._decode()
+            return
+        
+        opening = self._peek()
+        if opening not in '{[':
+            # Значение мельче ожидаемой глубины — отдаём как есть
+            yield path, self._decode()
+            return
+        
+        closing = '}' if opening == '{' else ']'
+        self._pos += 1
+        
+        index = 0
+        while True:
+            if self._peek() == closing:
+                self._pos += 1
+                return
+            if index:
+                self._expect(',')
+            
+            if opening == '{':
+                key = self._decode()
+                self._expect(':')
+            else:
+                key = index
+            
+            yield from self._walk(path + (key,), depth - 1)
+            index += 1
+
+
+def iter_json_items(path: str, depth: int = 1) -> Iterator[Tuple[tuple, Any]]:
+    """Потоково обойти значения JSON-файла на глубине depth"""
+    return JsonStream(path).items(depth)
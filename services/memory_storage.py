@@ -0,0 +1,236 @@
+import threading
+from array import array
+from bisect import bisect_right
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import CURRENCIES
+from services.rate_columns import RateWindow
+from services.rollups import RAW_MAX_AGE, TIERS, bucket_start, merge_row, pick_tier
+from services.defaults import DEFAULT_EXCHANGERS
+from services.records import (Alert, Exchanger, ExchangerRate, RateSample,
+                              decode_exchangers)
+
+
+class InMemoryStorage:
+    """
+    Хранилище целиком в памяти, без диска.
+    
+    Для бенчмарков и нагрузочных прогонов: тот же контракт StorageBackend,
+    что у Storage и SQLiteStorage, но данные живут только в процессе.
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        
+        self._exchangers: List[Exchanger] = decode_exchangers(DEFAULT_EXCHANGERS)
+        # (currency, source) -> (timestamps, buy, sell)
+        self._raw: Dict[Tuple[str, str], Tuple[array, array, array]] = {}
+        # (tier, currency, source) -> строки свечей (см. rollups.ROW_FIELDS)
+        self._rollups: Dict[Tuple[str, str, str], List[List[float]]] = {}
+        self._settings: Dict[int, Dict] = {}
+        self._alerts: Dict[int, List[Alert]] = {}
+    
+    # === ЗАПИСЬ ПАЧКАМИ ===
+    @contextmanager
+    def deferred_writes(self):
+        """Диска нет — пачка просто выполняется под локом"""
+        with self._lock:
+            yield self
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        pass
+    
+    # === EXCHANGERS ===
+    def get_exchangers(self) -> List[Exchanger]:
+        return list(self._exchangers)
+    
+    def get_exchanger_by_id(self, exchanger_id: int) -> Optional[Exchanger]:
+        for ex in self._exchangers:
+            if ex.id == exchanger_id:
+                return ex
+        return None
+    
+    def add_exchanger(self, name: str, address: str, district: str,
+                      lat: float, lon: float, phone: str = "") -> Exchanger:
+        with self._lock:
+            new_id = max([ex.id for ex in self._exchangers], default=0) + 1
+            
+            new_exchanger = Exchanger(
+                new_id, name, address, district, phone, lat, lon,
+                {currency: ExchangerRate() for currency in CURRENCIES}
+            )
+            
+            self._exchangers = self._exchangers + [new_exchanger]
+            return new_exchanger
+    
+    def update_exchanger_rate(self, exchanger_id: int, currency: str,
+                              buy: float, sell: float):
+        with self._lock:
+            rate = ExchangerRate(buy, sell, datetime.now().isoformat())
+            self._exchangers = [
+                ex.with_rate(currency, rate) if ex.id == exchanger_id else ex
+                for ex in self._exchangers
+            ]
+    
+    # === RATES HISTORY ===
+    def save_rate(self, source: str, currency: str, buy: float, sell: float):
+        with self._lock:
+            self._append_rate(source, currency, buy, sell, datetime.now())
+    
+    def save_rates(self, source: str, quotes: Dict[str, Tuple[float, float]]):
+        now = datetime.now()
+        with self._lock:
+            for currency, (buy, sell) in quotes.items():
+                self._append_rate(source, currency, buy, sell, now)
+    
+    def _append_rate(self, source: str, currency: str, buy: float, sell: float,
+                     now: datetime):
+        ts, buys, sells = self._raw.setdefault(
+            (currency, source), (array('q'), array('d'), array('d'))
+        )
+        ts.append(int(now.timestamp()))
+        buys.append(buy)
+        sells.append(sell)
+        
+        for tier in TIERS:
+            rows = self._rollups.setdefault((tier, currency, source), [])
+            start = bucket_start(tier, now)
+            if rows and int(rows[-1][0]) == start:
+                merge_row(rows[-1], start, buy, sell)
+            elif not rows or int(rows[-1][0]) < start:
+                rows.append(merge_row(None, start, buy, sell))
+    
+    def get_rate_history(self, currency: str, source: str,
+                         hours: int = 24) -> List[RateSample]:
+        return self.get_rate_window(currency, source, hours).to_samples()
+    
+    def get_rate_window(self, currency: str, source: str,
+                        hours: int = 24) -> RateWindow:
+        since = datetime.now() - timedelta(hours=hours)
+        tier = pick_tier(hours)
+        
+        with self._lock:
+            if tier is None:
+                series = self._raw.get((currency, source))
+                if series is None:
+                    return RateWindow.empty()
+                ts, buys, sells = series
+                first = bisect_right(ts, int(since.timestamp()))
+                return RateWindow(ts[first:], buys[first:], sells[first:])
+            
+            rows = self._rollups.get((tier, currency, source), [])
+            # Свечи, которые заканчиваются позже since
+            rows = [row for row in rows if row[0] + TIERS[tier][0] > since.timestamp()]
+            return RateWindow(
+                array('q', [int(row[0]) for row in rows]),
+                array('d', [row[5] for row in rows]),
+                array('d', [row[9] for row in rows])
+            )
+    
+    def get_rate_at(self, currency: str, source: str,
+                    at: datetime) -> Optional[RateSample]:
+        at_ts = int(at.timestamp())
+        with self._lock:
+            series = self._raw.get((currency, source))
+            if series is not None:
+                ts, buys, sells = series
+                index = bisect_right(ts, at_ts)
+                if index:
+                    return RateSample(ts[index - 1], buys[index - 1], sells[index - 1])
+            
+            # Сырых замеров до at нет: закрытие последней завершённой свечи
+            for tier, (seconds, _) in TIERS.items():
+                rows = self._rollups.get((tier, currency, source), [])
+                closed = [row for row in rows if row[0] + seconds <= at_ts]
+                if closed:
+                    return RateSample(int(closed[-1][0]), closed[-1][5], closed[-1][9])
+        return None
+    
+    def compact_history(self) -> int:
+        now = datetime.now()
+        dropped = 0
+        
+        with self._lock:
+            cutoff = int((now - RAW_MAX_AGE).timestamp())
+            for key, (ts, buys, sells) in list(self._raw.items()):
+                extra = bisect_right(ts, cutoff)
+                if extra:
+                    self._raw[key] = (ts[extra:], buys[extra:], sells[extra:])
+                    dropped += extra
+            
+            for key, rows in self._rollups.items():
+                seconds, max_age = TIERS[key[0]]
+                if max_age is None:
+                    continue
+                cutoff = (now - max_age).timestamp()
+                kept = [row for row in rows if row[0] + seconds >= cutoff]
+                dropped += len(rows) - len(kept)
+                rows[:] = kept
+        
+        return dropped
+    
+    # === USER SETTINGS ===
+    def get_user_language(self, user_id: int) -> str:
+        return self._settings.get(user_id, {}).get('language', 'uk')
+    
+    def set_user_language(self, user_id: int, language: str):
+        with self._lock:
+            self._settings[user_id] = {
+                'language': language,
+                'updated': datetime.now().isoformat()
+            }
+    
+    def get_all_users(self) -> List[int]:
+        return list(self._settings)
+    
+    def iter_user_languages(self) -> Iterator[Tuple[int, str]]:
+        for user_id, settings in list(self._settings.items()):
+            yield user_id, settings.get('language', 'uk')
+    
+    # === USER ALERTS ===
+    def get_user_alerts(self, user_id: int) -> List[Alert]:
+        return list(self._alerts.get(user_id, []))
+    
+    def add_alert(self, user_id: int, currency: str, alert_type: str,
+                  threshold: float) -> Alert:
+        with self._lock:
+            user_alerts = self._alerts.get(user_id, [])
+            
+            new_alert = Alert(
+                max([a.id for a in user_alerts], default=0) + 1,
+                currency,
+                alert_type,  # 'percent' или 'price'
+                threshold,
+                True,
+                datetime.now().isoformat()
+            )
+            
+            self._alerts[user_id] = user_alerts + [new_alert]
+            return new_alert
+    
+    def delete_alert(self, user_id: int, alert_id: int):
+        with self._lock:
+            if user_id in self._alerts:
+                self._alerts[user_id] = [
+                    a for a in self._alerts[user_id]
+                    if a.id != alert_id
+                ]
+    
+    def get_all_alerts(self) -> Dict:
+        return {str(user_id): alerts for user_id, alerts in self.iter_all_alerts()}
+    
+    def iter_all_alerts(self) -> Iterator[Tuple[int, List[Alert]]]:
+        for user_id, alerts in list(self._alerts.items()):
+            if alerts:
+                yield user_id, alerts
+    
+    # === МАССОВАЯ ЗАГРУЗКА ===
+    def import_rates(self, records: List[tuple]):
+        """(currency, source, buy, sell, timestamp) по порядку времени"""
+        with self._lock:
+            for currency, source, buy, sell, timestamp in records:
+                self._append_rate(source, currency, buy, sell, timestamp)
@@ -0,0 +1,129 @@
+from typing import Callable, Dict, Optional, Union
+
+
+# JSON ответов банков — orjson, если он установлен, иначе стандартный json
+try:
+    import orjson
+    
+    def loads(raw: bytes):
+        return orjson.loads(raw)
+except ImportError:
+    import json
+    
+    def loads(raw: bytes):
+        return json.loads(raw)
+
+
+# Числовые коды ISO 4217 для ответа Monobank (в нём только числа).
+# Валюты вне таблицы индексируются только по числовому коду
+ISO_NUMERIC = {
+    36: 'AUD', 124: 'CAD', 156: 'CNY', 203: 'CZK', 208: 'DKK', 348: 'HUF',
+    356: 'INR', 376: 'ILS', 392: 'JPY', 398: 'KZT', 410: 'KRW', 498: 'MDL',
+    578: 'NOK', 752: 'SEK', 756: 'CHF', 826: 'GBP', 840: 'USD', 933: 'BYN',
+    941: 'RSD', 944: 'AZN', 946: 'RON', 949: 'TRY', 975: 'BGN', 978: 'EUR',
+    981: 'GEL', 985: 'PLN', 980: 'UAH'
+}
+ISO_ALPHA = {code: numeric for numeric, code in ISO_NUMERIC.items()}
+UAH_NUMERIC = 980
+
+
+class Quote:
+    """
+    Котировка одной валюты к гривне. Для НБУ заполнен только rate, для
+    коммерческих банков — buy и sell (у Monobank для части валют только
+    кросс-курс — он тоже в rate).
+    """
+    
+    __slots__ = ('code', 'numeric', 'buy', 'sell', 'rate')
+    
+    def __init__(self, code: Optional[str], numeric: Optional[int],
+                 buy: Optional[float] = None, sell: Optional[float] = None,
+                 rate: Optional[float] = None):
+        self.code = code
+        self.numeric = numeric
+        self.buy = buy
+        self.sell = sell
+        self.rate = rate
+    
+    def __repr__(self) -> str:
+        return f"Quote({self.code!r}, buy={self.buy}, sell={self.sell}, rate={self.rate})"
+
+
+class QuoteIndex:
+    """
+    Котировки банка по коду валюты — буквенному ('USD') или числовому
+    (840). Разбор ответа строит только словарь код -> элемент ответа за
+    один проход; Quote собирается при первом обращении к валюте: из
+    сотни с лишним валют Monobank нужны единицы.
+    """
+    
+    __slots__ = ('_items', '_make', '_quotes')
+    
+    def __init__(self, items: Dict[Union[str, int], Dict], make: Callable[[Dict], Quote]):
+        self._items = items
+        self._make = make
+        self._quotes: Dict[Union[str, int], Quote] = {}
+    
+    def _key(self, code: Union[str, int]) -> Union[str, int]:
+        # Код другого вида переводится по таблице ISO 4217
+        if code not in self._items:
+            if isinstance(code, int):
+                return ISO_NUMERIC.get(code, code)
+            return ISO_ALPHA.get(code, code)
+        return code
+    
+    def get(self, code: Union[str, int]) -> Optional[Quote]:
+        key = self._key(code)
+        quote = self._quotes.get(key)
+        if quote is None:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            quote = self._quotes[key] = self._make(item)
+        return quote
+    
+    def __contains__(self, code: Union[str, int]) -> bool:
+        return self._key(code) in self._items
+    
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# === БАНКИ ===
+def _nbu_quote(item: Dict) -> Quote:
+    return Quote(item.get('cc'), item.get('r030'), rate=item.get('rate'))
+
+
+def _mono_quote(item: Dict) -> Quote:
+    numeric = item['currencyCodeA']
+    return Quote(ISO_NUMERIC.get(numeric), numeric, item.get('rateBuy'),
+                 item.get('rateSell'), item.get('rateCross'))
+
+
+def _privat_quote(item: Dict) -> Quote:
+    return Quote(item['ccy'], ISO_ALPHA.get(item['ccy']),
+                 float(item.get('buy', 0)), float(item.get('sale', 0)))
+
+
+def decode_nbu(raw: bytes) -> QuoteIndex:
+    """[{"r030": 840, "cc": "USD", "rate": 41.23, ...}, ...]"""
+    return QuoteIndex({item['cc']: item for item in loads(raw)}, _nbu_quote)
+
+
+def decode_mono(raw: bytes) -> QuoteIndex:
+    """
+    [{"currencyCodeA": 840, "currencyCodeB": 980, "rateBuy": 41.1,
+    "rateSell": 41.6}, ...] — в индекс попадают только пары к гривне
+    """
+    return QuoteIndex({
+        item['currencyCodeA']: item
+        for item in loads(raw) if item.get('currencyCodeB') == UAH_NUMERIC
+    }, _mono_quote)
+
+
+def decode_privat(raw: bytes) -> QuoteIndex:
+    """[{"ccy": "USD", "base_ccy": "UAH", "buy": "41.1", "sale": "41.6"}, ...]"""
+    return QuoteIndex({
+        item['ccy']: item
+        for item in loads(raw) if item.get('base_ccy', 'UAH') == 'UAH'
+    }, _privat_quote)
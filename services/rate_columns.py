@@ -0,0 +1,272 @@
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from services.records import RateSample
+
+
+class RateWindow:
+    """
+    Окно истории одной серии (валюта, источник) в виде колонок.
+    
+    timestamps — секунды Unix (int), buy/sell — курсы (float). Для
+    колоночного хранилища это срезы memoryview поверх mmap без копирования,
+    поэтому окно стоит использовать сразу, а не хранить долго.
+    """
+    
+    __slots__ = ('timestamps', 'buy', 'sell')
+    
+    def __init__(self, timestamps: Sequence[int], buy: Sequence[float],
+                 sell: Sequence[float]):
+        self.timestamps = timestamps
+        self.buy = buy
+        self.sell = sell
+    
+    def __len__(self) -> int:
+        return len(self.timestamps)
+    
+    @classmethod
+    def empty(cls) -> 'RateWindow':
+        return cls(array('q'), array('d'), array('d'))
+    
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> 'RateWindow':
+        """Собрать окно из словарей журнала (timestamp — ISO-строка)"""
+        return cls(
+            array('q', [int(datetime.fromisoformat(r['timestamp']).timestamp()) for r in records]),
+            array('d', [r['buy'] for r in records]),
+            array('d', [r['sell'] for r in records])
+        )
+    
+    def to_samples(self) -> List[RateSample]:
+        """Окно в формате get_rate_history: список RateSample"""
+        return [
+            RateSample(int(ts), buy, sell)
+            for ts, buy, sell in zip(self.timestamps, self.buy, self.sell)
+        ]
+
+
+class _Column:
+    """Один файл-колонка с отображением в память"""
+    
+    __slots__ = ('path', 'typecode', '_mmap', '_view', '_stamp')
+    
+    def __init__(self, path: str, typecode: str):
+        self.path = path
+        self.typecode = typecode
+        self._mmap = None
+        self._view = None
+        self._stamp = None
+    
+    def append(self, value):
+        with open(self.path, 'ab') as f:
+            f.write(array(self.typecode, [value]).tobytes())
+    
+    def view(self) -> memoryview:
+        """memoryview всей колонки; переотображается, если файл изменился"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return memoryview(array(self.typecode))
+        
+        stamp = (st.st_ino, st.st_size)
+        if stamp != self._stamp:
+            # Старое отображение не закрываем явно: на него могут ссылаться
+            # выданные ранее срезы, оно освободится вместе с ними
+            if st.st_size == 0:
+                self._mmap = None
+                self._view = memoryview(array(self.typecode))
+            else:
+                with open(self.path, 'rb') as f:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                usable = st.st_size - st.st_size % 8
+                self._view = memoryview(self._mmap)[:usable].cast(self.typecode)
+            self._stamp = stamp
+        
+        return self._view
+
+
+class ColumnarRateHistory:
+    """
+    История курсов в колоночном формате с отображением в память.
+    
+    Для каждой серии (валюта, источник) три файла в `directory`:
+    `<CUR>.<source>.ts` (int64, секунды Unix), `.buy` и `.sell` (float64).
+    Дозапись — по 8 байт в конец каждого файла. Метка времени пишется
+    последней, а длиной серии считается минимальная длина колонок, так что
+    оборванная запись просто не видна читателям.
+    
+    Окно по времени ищется бинарным поиском по колонке меток времени и
+    отдаётся срезами memoryview без копирования данных.
+    """
+    
+    COLUMNS = (('ts', 'q'), ('buy', 'd'), ('sell', 'd'))
+    _SERIES_RE = re.compile(r'^([A-Z]{3})\.([\w-]+)\.ts$')
+    
+    def __init__(self, directory: str, max_age: timedelta = timedelta(hours=48)):
+        self.directory = directory
+        self.max_age = max_age
+        
+        self._series: Dict[Tuple[str, str], Dict[str, _Column]] = {}
+        self._lock = threading.RLock()
+        
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        self._recover()
+    
+    # === ФАЙЛЫ ===
+    def _path(self, currency: str, source: str, column: str) -> str:
+        return os.path.join(self.directory, f"{currency}.{source}.{column}")
+    
+    def _columns(self, currency: str, source: str) -> Dict[str, _Column]:
+        key = (currency, source)
+        columns = self._series.get(key)
+        if columns is None:
+            columns = {
+                name: _Column(self._path(currency, source, name), typecode)
+                for name, typecode in self.COLUMNS
+            }
+            self._repair(columns)
+            self._series[key] = columns
+        return columns
+    
+    @staticmethod
+    def _repair(columns: Dict[str, _Column]):
+        """
+        Обрезать колонки до общей длины после оборванной записи,
+        иначе следующие дозаписи разъедутся по строкам
+        """
+        sizes = {}
+        for name, column in columns.items():
+            try:
+                sizes[name] = os.path.getsize(column.path)
+            except FileNotFoundError:
+                sizes[name] = 0
+        
+        rows = min(size // 8 for size in sizes.values())
+        for name, column in columns.items():
+            if sizes[name] != rows * 8:
+                os.truncate(column.path, rows * 8)
+    
+    def series(self) -> List[Tuple[str, str]]:
+        """Все серии (валюта, источник), которые есть на диске"""
+        found = []
+        for name in sorted(os.listdir(self.directory)):
+            match = self._SERIES_RE.match(name)
+            if match:
+                found.append((match.group(1), match.group(2)))
+        return found
+    
+    def _recover(self):
+        """
+        Довести до конца прерванное сжатие.
+        
+        Маркер `.compacting` создаётся только когда все временные файлы
+        дописаны, поэтому при маркере их можно смело подставить, а без
+        маркера — выбросить.
+        """
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.compacting'):
+                prefix = path[:-len('.compacting')]
+                for column, _ in self.COLUMNS:
+                    tmp_path = f"{prefix}.{column}.tmp"
+                    if os.path.exists(tmp_path):
+                        os.replace(tmp_path, f"{prefix}.{column}")
+                os.remove(path)
+        
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                os.remove(os.path.join(self.directory, name))
+    
+    # === ЗАПИСЬ ===
+    def append(self, currency: str, source: str, buy: float, sell: float,
+               timestamp: Optional[datetime] = None):
+        timestamp = timestamp or datetime.now()
+        
+        with self._lock:
+            columns = self._columns(currency, source)
+            columns['buy'].append(float(buy))
+            columns['sell'].append(float(sell))
+            columns['ts'].append(int(timestamp.timestamp()))
+    
+    # === ЧТЕНИЕ ===
+    def _full(self, currency: str, source: str) -> RateWindow:
+        columns = self._columns(currency, source)
+        ts = columns['ts'].view()
+        buy = columns['buy'].view()
+        sell = columns['sell'].view()
+        n = min(len(ts), len(buy), len(sell))
+        return RateWindow(ts[:n], buy[:n], sell[:n])
+    
+    def window(self, currency: str, source: str,
+               since: Optional[datetime] = None) -> RateWindow:
+        """Срез серии строго новее since (без копирования)"""
+        with self._lock:
+            full = self._full(currency, source)
+        
+        if since is None:
+            return full
+        
+        start = bisect_right(full.timestamps, int(since.timestamp()))
+        return RateWindow(
+            full.timestamps[start:],
+            full.buy[start:],
+            full.sell[start:]
+        )
+    
+    def read(self, currency: str, source: str,
+             since: Optional[datetime] = None) -> List[RateSample]:
+        return self.window(currency, source, since).to_samples()
+    
+    def iter_records(self) -> Iterator[tuple]:
+        """(currency, source, buy, sell, timestamp) по всем сериям"""
+        for currency, source in self.series():
+            full = self.window(currency, source)
+            for ts, buy, sell in zip(full.timestamps, full.buy, full.sell):
+                yield currency, source, buy, sell, datetime.fromtimestamp(ts)
+    
+    def is_empty(self) -> bool:
+        return not any(len(self.window(c, s)) for c, s in self.series())
+    
+    # === СЖАТИЕ ===
+    def compact(self, now: Optional[datetime] = None) -> int:
+        """
+        Удалить из каждой серии записи старше max_age.
+        Возвращает число удалённых записей.
+        """
+        cutoff = int(((now or datetime.now()) - self.max_age).timestamp())
+        dropped = 0
+        
+        for currency, source in self.series():
+            with self._lock:
+                full = self._full(currency, source)
+                extra = bisect_right(full.timestamps, cutoff)
+                if not extra:
+                    continue
+                
+                prefix = os.path.join(self.directory, f"{currency}.{source}")
+                tails = {
+                    'ts': full.timestamps[extra:],
+                    'buy': full.buy[extra:],
+                    'sell': full.sell[extra:]
+                }
+                for column, tail in tails.items():
+                    with open(f"{prefix}.{column}.tmp", 'wb') as f:
+                        f.write(tail)
+                        f.flush()
+                        os.fsync(f.fileno())
+                
+                open(f"{prefix}.compacting", 'w').close()
+                for column in tails:
+                    os.replace(f"{prefix}.{column}.tmp", f"{prefix}.{column}")
+                os.remove(f"{prefix}.compacting")
+                
+                dropped += extra
+        
+        return dropped
@@ -0,0 +1,195 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class RateSample:
+    """
+    Один замер курса. Время — секунды Unix (int), а не ISO-строка:
+    восемь байт вместо полусотни и без разбора при сравнении.
+    """
+    
+    __slots__ = ('timestamp', 'buy', 'sell')
+    
+    def __init__(self, timestamp: int, buy: float, sell: float):
+        self.timestamp = timestamp
+        self.buy = buy
+        self.sell = sell
+    
+    @property
+    def time(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp)
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RateSample':
+        return cls(int(datetime.fromisoformat(data['timestamp']).timestamp()),
+                   data['buy'], data['sell'])
+    
+    def to_dict(self) -> Dict:
+        return {
+            'buy': self.buy,
+            'sell': self.sell,
+            'timestamp': self.time.isoformat()
+        }
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RateSample):
+            return NotImplemented
+        return (self.timestamp, self.buy, self.sell) == (other.timestamp, other.buy, other.sell)
+    
+    def __repr__(self) -> str:
+        return f"RateSample({self.timestamp}, {self.buy}, {self.sell})"
+
+
+class ExchangerRate:
+    """Курс обменника по одной валюте (None — курс ещё не вносили)"""
+    
+    __slots__ = ('buy', 'sell', 'updated')
+    
+    def __init__(self, buy: Optional[float] = None, sell: Optional[float] = None,
+                 updated: Optional[str] = None):
+        self.buy = buy
+        self.sell = sell
+        self.updated = updated
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ExchangerRate':
+        return cls(data.get('buy'), data.get('sell'), data.get('updated'))
+    
+    def to_dict(self) -> Dict:
+        return {'buy': self.buy, 'sell': self.sell, 'updated': self.updated}
+    
+    def __repr__(self) -> str:
+        return f"ExchangerRate({self.buy}, {self.sell}, {self.updated!r})"
+
+
+class Exchanger:
+    """
+    Обменник. rates — валюта -> ExchangerRate. Записи не меняются на
+    месте: обновление курса собирает новую (with_rate), поэтому выданный
+    читателю объект не меняется у него в руках.
+    """
+    
+    __slots__ = ('id', 'name', 'address', 'district', 'phone', 'lat', 'lon', 'rates')
+    
+    def __init__(self, id: int, name: str, address: str, district: str,
+                 phone: str, lat: float, lon: float,
+                 rates: Dict[str, ExchangerRate]):
+        self.id = id
+        self.name = name
+        self.address = address
+        self.district = district
+        self.phone = phone
+        self.lat = lat
+        self.lon = lon
+        self.rates = rates
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Exchanger':
+        return cls(
+            data['id'],
+            data['name'],
+            data['address'],
+            data['district'],
+            data.get('phone', ''),
+            data['lat'],
+            data['lon'],
+            {
+                currency: ExchangerRate.from_dict(rate)
+                for currency, rate in data.get('rates', {}).items()
+            }
+        )
+    
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'address': self.address,
+            'district': self.district,
+            'phone': self.phone,
+            'lat': self.lat,
+            'lon': self.lon,
+            'rates': {currency: rate.to_dict() for currency, rate in self.rates.items()}
+        }
+    
+    def with_rate(self, currency: str, rate: ExchangerRate) -> 'Exchanger':
+        """Копия обменника с новым курсом по currency"""
+        return Exchanger(self.id, self.name, self.address, self.district,
+                         self.phone, self.lat, self.lon, {**self.rates, currency: rate})
+    
+    def __repr__(self) -> str:
+        return f"Exchanger({self.id}, {self.name!r})"
+
+
+class Alert:
+    """Оповещение пользователя: type — 'percent' или 'price'"""
+    
+    __slots__ = ('id', 'currency', 'type', 'threshold', 'active', 'created')
+    
+    def __init__(self, id: int, currency: str, type: str, threshold: float,
+                 active: bool = True, created: Optional[str] = None):
+        self.id = id
+        self.currency = currency
+        self.type = type
+        self.threshold = threshold
+        self.active = active
+        self.created = created
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Alert':
+        return cls(data['id'], data['currency'], data['type'], data['threshold'],
+                   data.get('active', True), data.get('created'))
+    
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'currency': self.currency,
+            'type': self.type,
+            'threshold': self.threshold,
+            'active': self.active,
+            'created': self.created
+        }
+    
+    def __repr__(self) -> str:
+        return f"Alert({self.id}, {self.currency!r}, {self.type!r}, {self.threshold})"
+
+
+# === ФОРМАТ ФАЙЛОВ ===
+# Файлы на диске остаются прежними словарями; в памяти — записи
+def decode_exchangers(data: List[Dict]) -> List[Exchanger]:
+    return [Exchanger.from_dict(ex) for ex in data]
+
+
+def encode_exchangers(exchangers: List[Exchanger]) -> List[Dict]:
+    return [ex.to_dict() for ex in exchangers]
+
+
+def decode_alerts(data: Dict[str, List[Dict]]) -> Dict[str, List[Alert]]:
+    return {
+        user_key: [Alert.from_dict(a) for a in alerts]
+        for user_key, alerts in data.items()
+    }
+
+
+def encode_alerts(alerts: Dict[str, List[Alert]]) -> Dict[str, List[Dict]]:
+    return {
+        user_key: [a.to_dict() for a in user_alerts]
+        for user_key, user_alerts in alerts.items()
+    }
+
+
+def decode_legacy_alerts(alerts: List[Dict]) -> List[Alert]:
+    """
+    Alerts пользователя из старого user_alerts.json. Старый add_alert
+    выдавал id = len + 1, после удалений id могли повториться — повторы
+    получают новые номера (одинаково в migrate.py и в переносе Storage)
+    """
+    seen = set()
+    next_id = max((a['id'] for a in alerts), default=0) + 1
+    fixed = []
+    for alert in alerts:
+        if alert['id'] in seen:
+            alert = dict(alert, id=next_id)
+            next_id += 1
+        seen.add(alert['id'])
+        fixed.append(Alert.from_dict(alert))
+    return fixed
@@ -0,0 +1,196 @@
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+from services.rate_columns import RateWindow
+
+
+# Уровни хранения истории:
+#   сырые замеры          — 48 часов
+#   часовые свечи (OHLC)  — 90 дней
+#   дневные свечи (OHLC)  — бессрочно
+RAW_MAX_AGE = timedelta(hours=48)
+TIERS = {
+    'hour': (3600, timedelta(days=90)),
+    'day': (86400, None)
+}
+
+# Строка свечи: начало, число замеров, OHLC покупки, OHLC продажи
+ROW_FIELDS = ('start', 'count',
+              'buy_open', 'buy_high', 'buy_low', 'buy_close',
+              'sell_open', 'sell_high', 'sell_low', 'sell_close')
+ROW_LEN = len(ROW_FIELDS)
+ROW_SIZE = ROW_LEN * 8
+
+
+def pick_tier(hours: float) -> Optional[str]:
+    """Уровень для запроса истории за hours: None — сырые замеры"""
+    if timedelta(hours=hours) <= RAW_MAX_AGE:
+        return None
+    if timedelta(hours=hours) <= TIERS['hour'][1]:
+        return 'hour'
+    return 'day'
+
+
+def bucket_start(tier: str, timestamp: datetime) -> int:
+    """Начало свечи, в которую попадает timestamp (секунды Unix)"""
+    if tier == 'day':
+        # Сутки считаем по локальному времени, как и метки в истории
+        midnight = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+        return int(midnight.timestamp())
+    seconds = TIERS[tier][0]
+    epoch = int(timestamp.timestamp())
+    return epoch - epoch % seconds
+
+
+def merge_row(row: Optional[List[float]], start: int, buy: float,
+              sell: float) -> List[float]:
+    """Добавить замер в свечу (или открыть новую, если row None)"""
+    if row is None:
+        return [float(start), 1.0, buy, buy, buy, buy, sell, sell, sell, sell]
+    
+    row[1] += 1
+    row[3] = max(row[3], buy)
+    row[4] = min(row[4], buy)
+    row[5] = buy
+    row[7] = max(row[7], sell)
+    row[8] = min(row[8], sell)
+    row[9] = sell
+    return row
+
+
+class RateRollups:
+    """
+    Часовые и дневные свечи по каждой серии (валюта, источник).
+    
+    Файл `<CUR>.<source>.<tier>` — строки фиксированного размера по
+    ROW_FIELDS (float64). Новый замер либо переписывает последнюю строку
+    на месте (та же свеча), либо дописывает новую — O(1) на save_rate.
+    """
+    
+    _FILE_RE = re.compile(r'^([A-Z]{3})\.([\w-]+)\.(hour|day)$')
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.RLock()
+        
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+    
+    def _path(self, currency: str, source: str, tier: str) -> str:
+        return os.path.join(self.directory, f"{currency}.{source}.{tier}")
+    
+    def series(self) -> List[Tuple[str, str, str]]:
+        found = []
+        for name in sorted(os.listdir(self.directory)):
+            match = self._FILE_RE.match(name)
+            if match:
+                found.append(match.groups())
+        return found
+    
+    # === ЗАПИСЬ ===
+    def add(self, currency: str, source: str, buy: float, sell: float,
+            timestamp: Optional[datetime] = None):
+        timestamp = timestamp or datetime.now()
+        
+        with self._lock:
+            for tier in TIERS:
+                self._add_to_tier(self._path(currency, source, tier),
+                                  bucket_start(tier, timestamp),
+                                  float(buy), float(sell))
+    
+    @staticmethod
+    def _add_to_tier(path: str, start: int, buy: float, sell: float):
+        mode = 'r+b' if os.path.exists(path) else 'w+b'
+        with open(path, mode) as f:
+            size = f.seek(0, os.SEEK_END)
+            size -= size % ROW_SIZE  # хвост оборванной записи затираем
+            
+            last = None
+            if size:
+                f.seek(size - ROW_SIZE)
+                last = array('d', f.read(ROW_SIZE)).tolist()
+            
+            if last is not None and int(last[0]) == start:
+                row, offset = merge_row(last, start, buy, sell), size - ROW_SIZE
+            elif last is not None and int(last[0]) > start:
+                # Замер старше текущей свечи (часы сервера ушли назад) —
+                # в свечи его не вносим, сырые данные всё равно сохранены
+                return
+            else:
+                row, offset = merge_row(None, start, buy, sell), size
+            
+            f.seek(offset)
+            f.write(array('d', row).tobytes())
+            f.truncate()
+    
+    # === ЧТЕНИЕ ===
+    def _rows(self, currency: str, source: str, tier: str) -> array:
+        rows = array('d')
+        try:
+            with open(self._path(currency, source, tier), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return rows
+        rows.frombytes(data[:len(data) - len(data) % ROW_SIZE])
+        return rows
+    
+    def window(self, currency: str, source: str, tier: str,
+               since: Optional[datetime] = None) -> RateWindow:
+        """
+        Свечи уровня tier, которые заканчиваются позже since. В окне —
+        начало свечи и цены закрытия покупки и продажи.
+        """
+        with self._lock:
+            rows = self._rows(currency, source, tier)
+        
+        starts = rows[0::ROW_LEN]
+        first = 0
+        if since is not None:
+            # Свеча, внутри которой лежит since, тоже нужна
+            first = max(0, bisect_right(starts, since.timestamp()) - 1)
+            if first < len(starts) and starts[first] + TIERS[tier][0] <= since.timestamp():
+                first += 1
+        
+        return RateWindow(
+            array('q', [int(ts) for ts in starts[first:]]),
+            rows[first * ROW_LEN + 5::ROW_LEN],
+            rows[first * ROW_LEN + 9::ROW_LEN]
+        )
+    
+    # === СЖАТИЕ ===
+    def compact(self, now: Optional[datetime] = None) -> int:
+        """Удалить свечи старше срока хранения уровня. Возвращает число строк"""
+        now = now or datetime.now()
+        dropped = 0
+        
+        for currency, source, tier in self.series():
+            max_age = TIERS[tier][1]
+            if max_age is None:
+                continue
+            
+            cutoff = (now - max_age).timestamp()
+            path = self._path(currency, source, tier)
+            
+            with self._lock:
+                rows = self._rows(currency, source, tier)
+                starts = rows[0::ROW_LEN]
+                extra = bisect_right(starts, cutoff - TIERS[tier][0])
+                if not extra:
+                    continue
+                
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(rows[extra * ROW_LEN:].tobytes())
+                os.replace(tmp_path, path)
+                dropped += extra
+        
+        return dropped
+    
+    def rebuild(self, records: Iterator[tuple]):
+        """Построить свечи по (currency, source, buy, sell, timestamp) по порядку"""
+        for currency, source, buy, sell, timestamp in records:
+            self.add(currency, source, buy, sell, timestamp)
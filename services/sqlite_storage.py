@@ -0,0 +1,566 @@
+import os
+import sqlite3
+import threading
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import CURRENCIES, DATA_DIR
+from services.rate_columns import RateWindow
+from services.rollups import RAW_MAX_AGE, TIERS, bucket_start, pick_tier
+from services.defaults import DEFAULT_EXCHANGERS
+from services.records import Alert, Exchanger, ExchangerRate, RateSample
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exchangers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    address TEXT NOT NULL,
+    district TEXT NOT NULL,
+    phone TEXT NOT NULL DEFAULT '',
+    lat REAL NOT NULL,
+    lon REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS exchanger_rates (
+    exchanger_id INTEGER NOT NULL REFERENCES exchangers(id),
+    currency TEXT NOT NULL,
+    buy REAL,
+    sell REAL,
+    updated TEXT,
+    PRIMARY KEY (exchanger_id, currency)
+);
+
+CREATE TABLE IF NOT EXISTS rates_history (
+    id INTEGER PRIMARY KEY,
+    currency TEXT NOT NULL,
+    source TEXT NOT NULL,
+    buy REAL NOT NULL,
+    sell REAL NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rates_history_series
+    ON rates_history (currency, source, timestamp);
+
+CREATE TABLE IF NOT EXISTS rates_rollups (
+    tier TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    source TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    buy_open REAL NOT NULL,
+    buy_high REAL NOT NULL,
+    buy_low REAL NOT NULL,
+    buy_close REAL NOT NULL,
+    sell_open REAL NOT NULL,
+    sell_high REAL NOT NULL,
+    sell_low REAL NOT NULL,
+    sell_close REAL NOT NULL,
+    PRIMARY KEY (tier, currency, source, start)
+);
+
+CREATE TABLE IF NOT EXISTS user_settings (
+    user_id INTEGER PRIMARY KEY,
+    language TEXT NOT NULL,
+    updated TEXT
+);
+
+CREATE TABLE IF NOT EXISTS user_alerts (
+    user_id INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    type TEXT NOT NULL,
+    threshold REAL NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1,
+    created TEXT,
+    PRIMARY KEY (user_id, id)
+);
+"""
+
+# Новый замер открывает свечу или обновляет high/low/close текущей
+UPSERT_ROLLUP = (
+    'INSERT INTO rates_rollups (tier, currency, source, start, count, '
+    'buy_open, buy_high, buy_low, buy_close, '
+    'sell_open, sell_high, sell_low, sell_close) '
+    'VALUES (:tier, :currency, :source, :start, 1, '
+    ':buy, :buy, :buy, :buy, :sell, :sell, :sell, :sell) '
+    'ON CONFLICT (tier, currency, source, start) DO UPDATE SET '
+    'count = count + 1, '
+    'buy_high = MAX(buy_high, excluded.buy_high), '
+    'buy_low = MIN(buy_low, excluded.buy_low), '
+    'buy_close = excluded.buy_close, '
+    'sell_high = MAX(sell_high, excluded.sell_high), '
+    'sell_low = MIN(sell_low, excluded.sell_low), '
+    'sell_close = excluded.sell_close'
+)
+
+
+class SQLiteStorage:
+    """
+    Хранилище на SQLite с тем же API, что и Storage.
+    
+    Каждая мутация — запись одной строки, а не перезапись файла целиком.
+    """
+    
+    def __init__(self, data_dir: str = DATA_DIR, filename: str = 'storage.db'):
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+        
+        self.data_dir = data_dir
+        self.db_file = os.path.join(data_dir, filename)
+        
+        # isolation_level=None — автокоммит, транзакции открываем явно
+        self._conn = sqlite3.connect(
+            self.db_file,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+        
+        # Одно соединение на процесс: сериализуем транзакции между потоками
+        self._lock = threading.RLock()
+        self._tx_depth = 0
+        
+        self._init_db()
+    
+    def _init_db(self):
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+            
+            # Свечи для истории, записанной до их появления
+            has_rollups = self._conn.execute(
+                'SELECT 1 FROM rates_rollups LIMIT 1'
+            ).fetchone()
+            if not has_rollups:
+                with self._transaction():
+                    for row in self._conn.execute(
+                        'SELECT * FROM rates_history ORDER BY timestamp'
+                    ).fetchall():
+                        self._save_rollups(row['source'], row['currency'], row['buy'],
+                                           row['sell'], datetime.fromisoformat(row['timestamp']))
+            
+            has_exchangers = self._conn.execute(
+                'SELECT 1 FROM exchangers LIMIT 1'
+            ).fetchone()
+            if not has_exchangers:
+                with self._transaction():
+                    for ex in DEFAULT_EXCHANGERS:
+                        self._insert_exchanger(Exchanger.from_dict(ex))
+    
+    @contextmanager
+    def _transaction(self):
+        """
+        BEGIN IMMEDIATE ... COMMIT под общим локом. Вложенные вызовы
+        становятся точками сохранения: ошибка откатывает только их.
+        """
+        with self._lock:
+            depth = self._tx_depth
+            if depth:
+                self._conn.execute(f'SAVEPOINT sp{depth}')
+            else:
+                self._conn.execute('BEGIN IMMEDIATE')
+            self._tx_depth += 1
+            
+            try:
+                yield self._conn
+            except BaseException:
+                if depth:
+                    self._conn.execute(f'ROLLBACK TO sp{depth}')
+                    self._conn.execute(f'RELEASE sp{depth}')
+                else:
+                    self._conn.execute('ROLLBACK')
+                raise
+            else:
+                if depth:
+                    self._conn.execute(f'RELEASE sp{depth}')
+                else:
+                    self._conn.execute('COMMIT')
+            finally:
+                self._tx_depth -= 1
+    
+    def deferred_writes(self):
+        """Выполнить пачку мутаций одной транзакцией (один fsync WAL)"""
+        return self._transaction()
+    
+    def flush(self):
+        """Каждая транзакция фиксируется сразу — сбрасывать нечего"""
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+    
+    # === EXCHANGERS ===
+    def _insert_exchanger(self, ex: Exchanger):
+        self._conn.execute(
+            'INSERT INTO exchangers (id, name, address, district, phone, lat, lon) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (ex.id, ex.name, ex.address, ex.district, ex.phone, ex.lat, ex.lon)
+        )
+        self._conn.executemany(
+            'INSERT INTO exchanger_rates (exchanger_id, currency, buy, sell, updated) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [
+                (ex.id, currency, rate.buy, rate.sell, rate.updated)
+                for currency, rate in ex.rates.items()
+            ]
+        )
+    
+    def _load_exchangers(self, where: str = '', params: tuple = ()) -> List[Exchanger]:
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT * FROM exchangers {where} ORDER BY id', params
+            ).fetchall()
+            rate_rows = self._conn.execute(
+                'SELECT * FROM exchanger_rates '
+                f'WHERE exchanger_id IN (SELECT id FROM exchangers {where}) '
+                'ORDER BY exchanger_id, currency',
+                params
+            ).fetchall()
+        
+        rates: Dict[int, Dict[str, ExchangerRate]] = {}
+        for r in rate_rows:
+            rates.setdefault(r['exchanger_id'], {})[r['currency']] = ExchangerRate(
+                r['buy'], r['sell'], r['updated']
+            )
+        
+        return [
+            Exchanger(row['id'], row['name'], row['address'], row['district'],
+                      row['phone'], row['lat'], row['lon'], rates.get(row['id'], {}))
+            for row in rows
+        ]
+    
+    def get_exchangers(self) -> List[Exchanger]:
+        return self._load_exchangers()
+    
+    def get_exchanger_by_id(self, exchanger_id: int) -> Optional[Exchanger]:
+        found = self._load_exchangers('WHERE id = ?', (exchanger_id,))
+        return found[0] if found else None
+    
+    def add_exchanger(self, name: str, address: str, district: str,
+                     lat: float, lon: float, phone: str = "") -> Exchanger:
+        with self._transaction():
+            new_id = self._conn.execute(
+                'SELECT COALESCE(MAX(id), 0) + 1 FROM exchangers'
+            ).fetchone()[0]
+            
+            new_exchanger = Exchanger(
+                new_id, name, address, district, phone, lat, lon,
+                {currency: ExchangerRate() for currency in CURRENCIES}
+            )
+            self._insert_exchanger(new_exchanger)
+        
+        return new_exchanger
+    
+    def update_exchanger_rate(self, exchanger_id: int, currency: str,
+                             buy: float, sell: float):
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO exchanger_rates (exchanger_id, currency, buy, sell, updated) '
+                'SELECT id, ?, ?, ?, ? FROM exchangers WHERE id = ? '
+                'ON CONFLICT (exchanger_id, currency) DO UPDATE SET '
+                'buy = excluded.buy, sell = excluded.sell, updated = excluded.updated',
+                (currency, buy, sell, datetime.now().isoformat(), exchanger_id)
+            )
+    
+    # === RATES HISTORY ===
+    def _save_rollups(self, source: str, currency: str, buy: float, sell: float,
+                      timestamp: datetime):
+        self._conn.executemany(UPSERT_ROLLUP, [
+            {
+                'tier': tier,
+                'currency': currency,
+                'source': source,
+                'start': bucket_start(tier, timestamp),
+                'buy': buy,
+                'sell': sell
+            }
+            for tier in TIERS
+        ])
+    
+    def save_rate(self, source: str, currency: str, buy: float, sell: float):
+        now = datetime.now()
+        with self._transaction():
+            self._conn.execute(
+                'INSERT INTO rates_history (currency, source, buy, sell, timestamp) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (currency, source, buy, sell, now.isoformat())
+            )
+            self._save_rollups(source, currency, buy, sell, now)
+    
+    def save_rates(self, source: str, quotes: Dict[str, Tuple[float, float]]):
+        """Курсы всех валют одного опроса: {currency: (buy, sell)} — одной транзакцией"""
+        now = datetime.now()
+        self.import_rates([
+            (currency, source, buy, sell, now)
+            for currency, (buy, sell) in quotes.items()
+        ])
+    
+    def compact_history(self) -> int:
+        """Удалить сырые замеры старше 48 часов и часовые свечи старше 90 дней"""
+        now = datetime.now()
+        with self._transaction():
+            dropped = self._conn.execute(
+                'DELETE FROM rates_history WHERE timestamp < ?',
+                ((now - RAW_MAX_AGE).isoformat(),)
+            ).rowcount
+            
+            for tier, (seconds, max_age) in TIERS.items():
+                if max_age is None:
+                    continue
+                dropped += self._conn.execute(
+                    'DELETE FROM rates_rollups WHERE tier = ? AND start + ? < ?',
+                    (tier, seconds, int((now - max_age).timestamp()))
+                ).rowcount
+        
+        return dropped
+    
+    def _history_rows(self, currency: str, source: str, hours: float) -> List[tuple]:
+        """(секунды Unix, buy, sell) сырых замеров или свечей — по длине периода"""
+        since = datetime.now() - timedelta(hours=hours)
+        tier = pick_tier(hours)
+        
+        with self._lock:
+            if tier is None:
+                rows = self._conn.execute(
+                    'SELECT timestamp, buy, sell FROM rates_history '
+                    'WHERE currency = ? AND source = ? AND timestamp > ? '
+                    'ORDER BY timestamp',
+                    (currency, source, since.isoformat())
+                ).fetchall()
+                return [
+                    (int(datetime.fromisoformat(r[0]).timestamp()), r[1], r[2])
+                    for r in rows
+                ]
+            
+            # Свечи, которые заканчиваются позже since; цены — закрытия
+            return self._conn.execute(
+                'SELECT start, buy_close, sell_close FROM rates_rollups '
+                'WHERE tier = ? AND currency = ? AND source = ? AND start > ? '
+                'ORDER BY start',
+                (tier, currency, source, int(since.timestamp()) - TIERS[tier][0])
+            ).fetchall()
+    
+    def get_rate_history(self, currency: str, source: str,
+                        hours: int = 24) -> List[RateSample]:
+        return [RateSample(*row) for row in self._history_rows(currency, source, hours)]
+    
+    def get_rate_window(self, currency: str, source: str,
+                        hours: int = 24) -> RateWindow:
+        rows = self._history_rows(currency, source, hours)
+        return RateWindow(
+            array('q', [row[0] for row in rows]),
+            array('d', [row[1] for row in rows]),
+            array('d', [row[2] for row in rows])
+        )
+    
+    def get_rate_at(self, currency: str, source: str,
+                    at: datetime) -> Optional[RateSample]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT timestamp, buy, sell FROM rates_history '
+                'WHERE currency = ? AND source = ? AND timestamp <= ? '
+                'ORDER BY timestamp DESC LIMIT 1',
+                (currency, source, at.isoformat())
+            ).fetchone()
+            if row:
+                return RateSample(int(datetime.fromisoformat(row[0]).timestamp()), row[1], row[2])
+            
+            # Сырые замеры до at уже сжаты: закрытие последней завершённой свечи
+            for tier, (seconds, _) in TIERS.items():
+                row = self._conn.execute(
+                    'SELECT start, buy_close, sell_close FROM rates_rollups '
+                    'WHERE tier = ? AND currency = ? AND source = ? AND start <= ? '
+                    'ORDER BY start DESC LIMIT 1',
+                    (tier, currency, source, int(at.timestamp()) - seconds)
+                ).fetchone()
+                if row:
+                    return RateSample(*row)
+        return None
+    
+    # === USER SETTINGS ===
+    def get_user_language(self, user_id: int) -> str:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT language FROM user_settings WHERE user_id = ?',
+                (user_id,)
+            ).fetchone()
+        return row['language'] if row else 'uk'
+    
+    def set_user_language(self, user_id: int, language: str):
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO user_settings (user_id, language, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT (user_id) DO UPDATE SET '
+                'language = excluded.language, updated = excluded.updated',
+                (user_id, language, datetime.now().isoformat())
+            )
+    
+    def get_all_users(self) -> List[int]:
+        with self._lock:
+            rows = self._conn.execute('SELECT user_id FROM user_settings').fetchall()
+        return [row['user_id'] for row in rows]
+    
+    def iter_user_languages(self, batch: int = 1000) -> Iterator[Tuple[int, str]]:
+        """(user_id, язык) всех пользователей, порциями по batch строк"""
+        last_id = None
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT user_id, language FROM user_settings '
+                    'WHERE ? IS NULL OR user_id > ? ORDER BY user_id LIMIT ?',
+                    (last_id, last_id, batch)
+                ).fetchall()
+            
+            if not rows:
+                return
+            for row in rows:
+                yield row['user_id'], row['language']
+            last_id = rows[-1]['user_id']
+    
+    # === USER ALERTS ===
+    @staticmethod
+    def _alert_from_row(row: sqlite3.Row) -> Alert:
+        return Alert(row['id'], row['currency'], row['type'], row['threshold'],
+                     bool(row['active']), row['created'])
+    
+    def get_user_alerts(self, user_id: int) -> List[Alert]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM user_alerts WHERE user_id = ? ORDER BY id',
+                (user_id,)
+            ).fetchall()
+        return [self._alert_from_row(row) for row in rows]
+    
+    def add_alert(self, user_id: int, currency: str, alert_type: str,
+                  threshold: float) -> Alert:
+        with self._transaction():
+            # MAX(id) + 1, а не количество: после удаления id не повторяются
+            new_id = self._conn.execute(
+                'SELECT COALESCE(MAX(id), 0) + 1 FROM user_alerts WHERE user_id = ?',
+                (user_id,)
+            ).fetchone()[0]
+            
+            new_alert = Alert(
+                new_id,
+                currency,
+                alert_type,  # 'percent' или 'price'
+                threshold,
+                True,
+                datetime.now().isoformat()
+            )
+            
+            self._conn.execute(
+                'INSERT INTO user_alerts (user_id, id, currency, type, threshold, active, created) '
+                'VALUES (?, ?, ?, ?, ?, 1, ?)',
+                (user_id, new_id, currency, alert_type, threshold, new_alert.created)
+            )
+        
+        return new_alert
+    
+    def delete_alert(self, user_id: int, alert_id: int):
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM user_alerts WHERE user_id = ? AND id = ?',
+                (user_id, alert_id)
+            )
+    
+    def get_all_alerts(self) -> Dict:
+        return {str(user_id): alerts for user_id, alerts in self.iter_all_alerts()}
+    
+    def iter_all_alerts(self, batch: int = 1000) -> Iterator[Tuple[int, List[Alert]]]:
+        """(user_id, alerts) всех пользователей, порциями по batch пользователей"""
+        last_id = None
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT * FROM user_alerts WHERE user_id IN ('
+                    '  SELECT DISTINCT user_id FROM user_alerts '
+                    '  WHERE ? IS NULL OR user_id > ? ORDER BY user_id LIMIT ?'
+                    ') ORDER BY user_id, id',
+                    (last_id, last_id, batch)
+                ).fetchall()
+            
+            if not rows:
+                return
+            
+            user_id, user_alerts = rows[0]['user_id'], []
+            for row in rows:
+                if row['user_id'] != user_id:
+                    yield user_id, user_alerts
+                    user_id, user_alerts = row['user_id'], []
+                user_alerts.append(self._alert_from_row(row))
+            yield user_id, user_alerts
+            
+            last_id = user_id
+    
+    # === МАССОВАЯ ЗАГРУЗКА (migrate.py) ===
+    def replace_exchangers(self, exchangers: List[Exchanger]):
+        with self._transaction():
+            self._conn.execute('DELETE FROM exchanger_rates')
+            self._conn.execute('DELETE FROM exchangers')
+            for ex in exchangers:
+                self._insert_exchanger(ex)
+    
+    def import_rates(self, records: List[tuple]):
+        """(currency, source, buy, sell, timestamp) по порядку времени — одной транзакцией"""
+        with self._transaction():
+            self._conn.executemany(
+                'INSERT INTO rates_history (currency, source, buy, sell, timestamp) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [
+                    (currency, source, buy, sell, timestamp.isoformat())
+                    for currency, source, buy, sell, timestamp in records
+                ]
+            )
+            for currency, source, buy, sell, timestamp in records:
+                self._save_rollups(source, currency, buy, sell, timestamp)
+    
+    def import_user_settings(self, rows: List[Tuple[int, Dict]]):
+        with self._transaction():
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO user_settings (user_id, language, updated) '
+                'VALUES (?, ?, ?)',
+                [
+                    (user_id, settings.get('language', 'uk'), settings.get('updated'))
+                    for user_id, settings in rows
+                ]
+            )
+    
+    def import_alerts(self, rows: List[Tuple[int, List[Alert]]]):
+        with self._transaction():
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO user_alerts '
+                '(user_id, id, currency, type, threshold, active, created) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (user_id, a.id, a.currency, a.type, a.threshold,
+                     int(a.active), a.created)
+                    for user_id, alerts in rows
+                    for a in alerts
+                ]
+            )
+    
+    def count_rows(self) -> Dict[str, int]:
+        """Число записей по разделам — для сверки после переноса"""
+        queries = {
+            'exchangers': 'SELECT COUNT(*) FROM exchangers',
+            'rates': 'SELECT COUNT(*) FROM rates_history',
+            'settings': 'SELECT COUNT(*) FROM user_settings',
+            'alerts': 'SELECT COUNT(*) FROM user_alerts'
+        }
+        with self._lock:
+            return {
+                name: self._conn.execute(query).fetchone()[0]
+                for name, query in queries.items()
+            }
+    
+    def vacuum(self):
+        """Сжать историю, пересобрать файл базы и обрезать WAL"""
+        self.compact_history()
+        with self._lock:
+            self._conn.execute('VACUUM')
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
@@ -1,20 +1,59 @@
 import json
 import os
-from datetime import datetime
-from typing import Dict, List, Optional, Any
-from config import DATA_DIR
+import shutil
+import threading
+import zlib
+from bisect import bisect_right
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from config import CURRENCIES, DATA_DIR, STORAGE_BACKEND, RATES_HISTORY_FORMAT, USER_SHARDS
+from services.history_log import RateHistoryLog
+from services.rate_columns import ColumnarRateHistory, RateWindow
+from services.defaults import DEFAULT_EXCHANGERS
+from services.records import (Alert, Exchanger, ExchangerRate, RateSample,
+                              decode_alerts, decode_exchangers, decode_legacy_alerts,
+                              encode_alerts, encode_exchangers)
+from services.rollups import RAW_MAX_AGE, TIERS, RateRollups, pick_tier
 
 
 class Storage:
-    def __init__(self):
+    def __init__(self, data_dir: str = DATA_DIR, user_shards: int = USER_SHARDS):
         # Создаём папку data если её нет
-        if not os.path.exists(DATA_DIR):
-            os.makedirs(DATA_DIR)
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
         
-        self.exchangers_file = os.path.join(DATA_DIR, 'exchangers.json')
-        self.rates_history_file = os.path.join(DATA_DIR, 'rates_history.json')
-        self.user_alerts_file = os.path.join(DATA_DIR, 'user_alerts.json')
-        self.user_settings_file = os.path.join(DATA_DIR, 'user_settings.json')
+        self.data_dir = data_dir
+        self.exchangers_file = os.path.join(data_dir, 'exchangers.json')
+        # Старый формат истории: читается один раз для переноса в новый
+        self.rates_history_file = os.path.join(data_dir, 'rates_history.json')
+        self.rates_history_dir = os.path.join(data_dir, 'rates_history')
+        self.rates_columns_dir = os.path.join(data_dir, 'rates_columns')
+        self.rates_rollups_dir = os.path.join(data_dir, 'rates_rollups')
+        # Старые единые файлы пользователей: переносятся в шарды один раз
+        self.user_alerts_file = os.path.join(data_dir, 'user_alerts.json')
+        self.user_settings_file = os.path.join(data_dir, 'user_settings.json')
+        
+        # Настройки и alerts разбиты на шарды по хэшу user_id: изменение
+        # одного пользователя переписывает только его шард
+        self.users_dir = os.path.join(data_dir, 'users')
+        self.users_meta_file = os.path.join(self.users_dir, 'meta.json')
+        self.user_shards = user_shards
+        
+        # Разобранные файлы в памяти: путь -> данные и "отпечаток" файла
+        # (inode, mtime, size) на момент чтения/записи. Если файл изменили
+        # снаружи, отпечаток не совпадёт и файл будет перечитан.
+        # Возвращаемые объекты общие для всех вызовов — их нельзя менять
+        # в обход методов Storage.
+        self._cache: Dict[str, Any] = {}
+        self._cache_stamps: Dict[str, tuple] = {}
+        
+        # Мутации из разных потоков выполняются по очереди. Внутри
+        # deferred_writes() изменения копятся в кэше (_dirty) и попадают
+        # на диск одной записью на файл при выходе из блока.
+        self._lock = threading.RLock()
+        self._deferred = 0
+        self._dirty: set = set()
         
         # Инициализируем файлы если их нет
         self._init_files()
@@ -22,316 +61,460 @@ class Storage:
     def _init_files(self):
         # Инициализация exchangers.json
         if not os.path.exists(self.exchangers_file):
-            initial_exchangers = [
-                {
-                    "id": 1,
-                    "name": "Обмінник Позняки",
-                    "address": "просп. Петра Григоренка, 28, Київ",
-                    "district": "Позняки",
-                    "phone": "+380 (50) 388-88-65",
-                    "lat": 50.4165,
-                    "lon": 30.6327,
-                    "rates": {
-                        "USD": {"buy": None, "sell": None, "updated": None},
-                        "EUR": {"buy": None, "sell": None, "updated": None}
-                    }
-                },
-                {
-                    "id": 2,
-                    "name": "Money Exchange Kyiv",
-                    "address": "вул. Ревуцького, 12/1, Київ",
-                    "district": "Осокорки/Позняки",
-                    "phone": "",
-                    "lat": 50.4189,
-                    "lon": 30.6145,
-                    "rates": {
-                        "USD": {"buy": None, "sell": None, "updated": None},
-                        "EUR": {"buy": None, "sell": None, "updated": None}
-                    }
-                },
-                {
-                    "id": 3,
-                    "name": "Обмін Валют GARANT",
-                    "address": "Харківське шосе, 144В, Київ",
-                    "district": "Харківський масив",
-                    "phone": "",
-                    "lat": 50.4012,
-                    "lon": 30.6589,
-                    "rates": {
-                        "USD": {"buy": None, "sell": None, "updated": None},
-                        "EUR": {"buy": None, "sell": None, "updated": None}
-                    }
-                },
-                {
-                    "id": 4,
-                    "name": "Обмін валют",
-                    "address": "вул. Ялтинська, 6, Київ",
-                    "district": "Дарниця",
-                    "phone": "",
-                    "lat": 50.4453,
-                    "lon": 30.6234,
-                    "rates": {
-                        "USD": {"buy": None, "sell": None, "updated": None},
-                        "EUR": {"buy": None, "sell": None, "updated": None}
-                    }
-                },
-                {
-                    "id": 5,
-                    "name": "Obmin Valyut",
-                    "address": "вул. Срібнокільська, 1-А, Київ",
-                    "district": "Осокорки/Позняки",
-                    "phone": "",
-                    "lat": 50.4001,
-                    "lon": 30.6178,
-                    "rates": {
-                        "USD": {"buy": None, "sell": None, "updated": None},
-                        "EUR": {"buy": None, "sell": None, "updated": None}
-                    }
-                },
-                {
-                    "id": 6,
-                    "name": "Obmen Vsekh Valyut",
-                    "address": "вул. Срібнокільська, 3Д, Київ",
-                    "district": "Осокорки/Позняки",
-                    "phone": "",
-                    "lat": 50.3998,
-                    "lon": 30.6201,
-                    "rates": {
-                        "USD": {"buy": None, "sell": None, "updated": None},
-                        "EUR": {"buy": None, "sell": None, "updated": None}
-                    }
-                },
-                {
-                    "id": 7,
-                    "name": "Obmin Valyut",
-                    "address": "вул. Олени Пчілки, 2, Київ",
-                    "district": "Дарницький",
-                    "phone": "",
-                    "lat": 50.4389,
-                    "lon": 30.6123,
-                    "rates": {
-                        "USD": {"buy": None, "sell": None, "updated": None},
-                        "EUR": {"buy": None, "sell": None, "updated": None}
-                    }
-                },
-                {
-                    "id": 8,
-                    "name": "Обмін валют",
-                    "address": "просп. Миколи Бажана, 26, Київ",
-                    "district": "Осокорки/Позняки",
-                    "phone": "",
-                    "lat": 50.4234,
-                    "lon": 30.6412,
-                    "rates": {
-                        "USD": {"buy": None, "sell": None, "updated": None},
-                        "EUR": {"buy": None, "sell": None, "updated": None}
-                    }
-                },
-                {
-                    "id": 9,
-                    "name": "Money Exchange Kyiv",
-                    "address": "Дніпровська площа, 1, Київ",
-                    "district": "Дарницький",
-                    "phone": "",
-                    "lat": 50.4512,
-                    "lon": 30.6289,
-                    "rates": {
-                        "USD": {"buy": None, "sell": None, "updated": None},
-                        "EUR": {"buy": None, "sell": None, "updated": None}
-                    }
-                },
-                {
-                    "id": 10,
-                    "name": "Obmin Valyut",
-                    "address": "вул. Михайла Драгоманова, 2, Київ",
-                    "district": "Позняки/Харківський масив",
-                    "phone": "",
-                    "lat": 50.4089,
-                    "lon": 30.6534,
-                    "rates": {
-                        "USD": {"buy": None, "sell": None, "updated": None},
-                        "EUR": {"buy": None, "sell": None, "updated": None}
-                    }
-                }
-            ]
-            self._write_json(self.exchangers_file, initial_exchangers)
+            self._write_json(self.exchangers_file, decode_exchangers(DEFAULT_EXCHANGERS))
+        
+        # Инициализация истории курсов (с переносом старых данных)
+        self.rates_history = self._open_rates_history()
+        
+        # Часовые и дневные свечи строятся по сырой истории один раз
+        self.rates_rollups = self._open_imported(
+            self.rates_rollups_dir,
+            RateRollups,
+            lambda rollups: rollups.rebuild(self.rates_history.iter_records())
+        )
+        
+        # Инициализация шардов пользователей (с переносом старых файлов)
+        if not os.path.exists(self.users_dir):
+            os.makedirs(self.users_dir)
+        
+        # Число шардов записано рядом с шардами: с другим USER_SHARDS
+        # пользователи попали бы не в свои файлы и "потеряли" бы данные
+        meta = None
+        if os.path.exists(self.users_meta_file):
+            meta = self._read_json(self.users_meta_file)
+        if meta is not None and meta.get('shards') != self.user_shards:
+            raise RuntimeError(
+                f"{self.users_dir} разбит на {meta.get('shards')} шардов, "
+                f"а USER_SHARDS={self.user_shards}: верните прежнее значение"
+            )
+        
+        for shard in range(self.user_shards):
+            for kind in ('settings', 'alerts'):
+                path = self._shard_path(kind, shard)
+                if not os.path.exists(path):
+                    self._write_json(path, {})
+        
+        # Перенос считается сделанным только после записи meta.json:
+        # прерванный перенос при следующем запуске повторится
+        if meta is None:
+            self._import_users()
+            self._write_json(self.users_meta_file, {'shards': self.user_shards})
+    
+    @staticmethod
+    def _file_stamp(filepath: str) -> Optional[tuple]:
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    
+    @staticmethod
+    def _open_imported(directory: str, factory: Callable, fill: Callable):
+        """
+        Открыть хранилище factory(directory). Новое наполняется fill() во
+        временной папке и подставляется целиком только после успешного
+        переноса: прерванный перенос при следующем запуске начнётся заново,
+        а не оставит частичные данные.
+        """
+        if not os.path.exists(directory):
+            tmp_dir = f"{directory}.tmp"
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir)
+            fill(factory(tmp_dir))
+            os.replace(tmp_dir, directory)
+        
+        return factory(directory)
+    
+    def _open_rates_history(self):
+        if RATES_HISTORY_FORMAT == 'log':
+            return self._open_imported(
+                self.rates_history_dir,
+                lambda path: RateHistoryLog(path, max_age=RAW_MAX_AGE),
+                self._import_history
+            )
+        return self._open_imported(
+            self.rates_columns_dir,
+            lambda path: ColumnarRateHistory(path, max_age=RAW_MAX_AGE),
+            self._import_history
+        )
+    
+    def _import_history(self, target):
+        """Перенести историю из журнала или rates_history.json в новый формат"""
+        if (not isinstance(target, RateHistoryLog)
+                and os.path.exists(self.rates_history_dir)):
+            for record in RateHistoryLog(self.rates_history_dir).iter_records():
+                target.append(*record)
+            return
         
-        # Инициализация rates_history.json
         if not os.path.exists(self.rates_history_file):
-            self._write_json(self.rates_history_file, {})
+            return
         
-        # Инициализация user_alerts.json
-        if not os.path.exists(self.user_alerts_file):
-            self._write_json(self.user_alerts_file, {})
+        history = self._read_json(self.rates_history_file)
+        records = [
+            (r['timestamp'], currency, source, r['buy'], r['sell'])
+            for currency, sources in history.items()
+            for source, rates in sources.items()
+            for r in rates
+        ]
+        records.sort()
+        
+        for timestamp, currency, source, buy, sell in records:
+            target.append(currency, source, buy, sell,
+                          datetime.fromisoformat(timestamp))
         
-        # Инициализация user_settings.json
-        if not os.path.exists(self.user_settings_file):
-            self._write_json(self.user_settings_file, {})
+        self._invalidate(self.rates_history_file)
+    
+    def _import_users(self):
+        with self.deferred_writes():
+            for kind, legacy_file in (('settings', self.user_settings_file),
+                                      ('alerts', self.user_alerts_file)):
+                if not os.path.exists(legacy_file):
+                    continue
+                
+                for user_key, value in self._read_json(legacy_file).items():
+                    if kind == 'alerts':
+                        value = decode_legacy_alerts(value)
+                    path = self._user_path(kind, int(user_key))
+                    # Уже перенесённых (и, возможно, изменённых потом)
+                    # пользователей повторный перенос не трогает
+                    self._read_json(path).setdefault(user_key, value)
+                    self._write_json(path, self._read_json(path))
+                
+                self._invalidate(legacy_file)
+    
+    # === ШАРДЫ ===
+    def _shard_path(self, kind: str, shard: int) -> str:
+        return os.path.join(self.users_dir, f"{kind}-{shard:03d}.json")
+    
+    def _user_path(self, kind: str, user_id: int) -> str:
+        # crc32, а не hash(): шард должен совпадать между перезапусками
+        shard = zlib.crc32(str(user_id).encode()) % self.user_shards
+        return self._shard_path(kind, shard)
+    
+    def _iter_shards(self, kind: str) -> Iterator[Dict]:
+        for shard in range(self.user_shards):
+            yield self._read_json(self._shard_path(kind, shard))
+    
+    def _codec(self, filepath: str) -> Optional[Tuple[Callable, Callable]]:
+        """
+        (decode, encode) для файлов, которые в памяти держатся записями
+        из services.records, а не словарями
+        """
+        if filepath == self.exchangers_file:
+            return decode_exchangers, encode_exchangers
+        if os.path.basename(filepath).startswith('alerts-'):
+            return decode_alerts, encode_alerts
+        return None
     
     def _read_json(self, filepath: str) -> Any:
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Ошибка чтения {filepath}: {e}")
-            return {} if 'history' in filepath or 'alerts' in filepath or 'settings' in filepath else []
+        # Изменения, ещё не сброшенные на диск, важнее файла
+        if filepath in self._dirty:
+            return self._cache[filepath]
+        
+        stamp = self._file_stamp(filepath)
+        if stamp is not None and self._cache_stamps.get(filepath) == stamp:
+            return self._cache[filepath]
+        
+        with self._lock:
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                codec = self._codec(filepath)
+                if codec is not None:
+                    data = codec[0](data)
+            except Exception as e:
+                print(f"Ошибка чтения {filepath}: {e}")
+                return {} if 'history' in filepath or 'alerts' in filepath or 'settings' in filepath else []
+            
+            self._cache[filepath] = data
+            self._cache_stamps[filepath] = stamp
+            return data
     
     def _write_json(self, filepath: str, data: Any):
+        with self._lock:
+            self._cache[filepath] = data
+            
+            if self._deferred:
+                self._dirty.add(filepath)
+                return
+            
+            self._dump(filepath, data)
+    
+    def _dump(self, filepath: str, data: Any):
+        # Пишем во временный файл и атомарно подменяем, чтобы читатели
+        # никогда не видели наполовину записанный JSON
+        tmp_path = f"{filepath}.tmp"
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
+            codec = self._codec(filepath)
+            if codec is not None:
+                data = codec[1](data)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, filepath)
         except Exception as e:
             print(f"Ошибка записи {filepath}: {e}")
+            # Кэш мог уже содержать изменения, которые не попали на диск
+            self._invalidate(filepath)
+            return
+        
+        self._cache_stamps[filepath] = self._file_stamp(filepath)
+    
+    def _invalidate(self, filepath: str):
+        self._cache.pop(filepath, None)
+        self._cache_stamps.pop(filepath, None)
+    
+    @contextmanager
+    def deferred_writes(self):
+        """
+        Выполнить пачку мутаций с одной записью на диск на каждый файл.
+        
+        Пока блок открыт, другие потоки не могут менять данные.
+        """
+        with self._lock:
+            self._deferred += 1
+            try:
+                yield self
+            finally:
+                self._deferred -= 1
+                if not self._deferred:
+                    self.flush()
+    
+    def flush(self):
+        """Сбросить на диск файлы, изменённые внутри deferred_writes()"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            for filepath in dirty:
+                self._dump(filepath, self._cache[filepath])
+    
+    def close(self):
+        self.flush()
     
     # === EXCHANGERS ===
-    def get_exchangers(self) -> List[Dict]:
-        return self._read_json(self.exchangers_file)
+    def get_exchangers(self) -> List[Exchanger]:
+        return list(self._read_json(self.exchangers_file))
     
-    def get_exchanger_by_id(self, exchanger_id: int) -> Optional[Dict]:
+    def get_exchanger_by_id(self, exchanger_id: int) -> Optional[Exchanger]:
         exchangers = self.get_exchangers()
         for ex in exchangers:
-            if ex.get('id') == exchanger_id:
+            if ex.id == exchanger_id:
                 return ex
         return None
     
     def add_exchanger(self, name: str, address: str, district: str, 
-                     lat: float, lon: float, phone: str = "") -> Dict:
-        exchangers = self.get_exchangers()
-        new_id = max([ex.get('id', 0) for ex in exchangers], default=0) + 1
-        
-        new_exchanger = {
-            "id": new_id,
-            "name": name,
-            "address": address,
-            "district": district,
-            "phone": phone,
-            "lat": lat,
-            "lon": lon,
-            "rates": {
-                "USD": {"buy": None, "sell": None, "updated": None},
-                "EUR": {"buy": None, "sell": None, "updated": None}
-            }
-        }
-        
-        exchangers.append(new_exchanger)
-        self._write_json(self.exchangers_file, exchangers)
-        return new_exchanger
+                     lat: float, lon: float, phone: str = "") -> Exchanger:
+        with self._lock:
+            exchangers = self._read_json(self.exchangers_file)
+            new_id = max([ex.id for ex in exchangers], default=0) + 1
+            
+            new_exchanger = Exchanger(
+                new_id, name, address, district, phone, lat, lon,
+                {currency: ExchangerRate() for currency in CURRENCIES}
+            )
+            
+            self._write_json(self.exchangers_file, exchangers + [new_exchanger])
+            return new_exchanger
     
     def update_exchanger_rate(self, exchanger_id: int, currency: str, 
                              buy: float, sell: float):
-        exchangers = self.get_exchangers()
-        
-        for ex in exchangers:
-            if ex.get('id') == exchanger_id:
-                ex['rates'][currency] = {
-                    'buy': buy,
-                    'sell': sell,
-                    'updated': datetime.now().isoformat()
-                }
-                break
-        
-        self._write_json(self.exchangers_file, exchangers)
+        with self._lock:
+            exchangers = self._read_json(self.exchangers_file)
+            
+            rate = ExchangerRate(buy, sell, datetime.now().isoformat())
+            exchangers = [
+                ex.with_rate(currency, rate) if ex.id == exchanger_id else ex
+                for ex in exchangers
+            ]
+            
+            self._write_json(self.exchangers_file, exchangers)
     
     # === RATES HISTORY ===
     def save_rate(self, source: str, currency: str, buy: float, sell: float):
-        history = self._read_json(self.rates_history_file)
-        
-        if currency not in history:
-            history[currency] = {}
-        
-        if source not in history[currency]:
-            history[currency][source] = []
-        
-        history[currency][source].append({
-            'buy': buy,
-            'sell': sell,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        # Храним только последние 1000 записей для каждого источника
-        if len(history[currency][source]) > 1000:
-            history[currency][source] = history[currency][source][-1000:]
-        
-        self._write_json(self.rates_history_file, history)
+        now = datetime.now()
+        with self._lock:
+            self.rates_history.append(currency, source, buy, sell, now)
+            self.rates_rollups.add(currency, source, buy, sell, now)
+    
+    def save_rates(self, source: str, quotes: Dict[str, Tuple[float, float]]):
+        """Курсы всех валют одного опроса: {currency: (buy, sell)}, одна отметка времени"""
+        now = datetime.now()
+        with self._lock:
+            self.import_rates([
+                (currency, source, buy, sell, now)
+                for currency, (buy, sell) in quotes.items()
+            ])
     
     def get_rate_history(self, currency: str, source: str, 
-                        hours: int = 24) -> List[Dict]:
-        history = self._read_json(self.rates_history_file)
-        
-        if currency not in history or source not in history[currency]:
-            return []
+                        hours: int = 24) -> List[RateSample]:
+        return self.get_rate_window(currency, source, hours).to_samples()
+    
+    def get_rate_window(self, currency: str, source: str,
+                        hours: int = 24) -> RateWindow:
+        """
+        История за последние hours в виде колонок (см. RateWindow).
         
-        from datetime import timedelta
+        До 48 часов — сырые замеры, до 90 дней — часовые свечи, дальше —
+        дневные. Для свечей в окне цены закрытия.
+        """
         cutoff_time = datetime.now() - timedelta(hours=hours)
+        tier = pick_tier(hours)
+        if tier is None:
+            return self.rates_history.window(currency, source, since=cutoff_time)
+        return self.rates_rollups.window(currency, source, tier, since=cutoff_time)
+    
+    def get_rate_at(self, currency: str, source: str,
+                    at: datetime) -> Optional[RateSample]:
+        """
+        Последний замер не позже at. Курс пишется только при изменении, так
+        что это действующий на момент at курс. Если сырых замеров за 48 часов
+        до at нет — закрытие последней завершённой к at свечи.
+        """
+        at_ts = int(at.timestamp())
+        raw = self.rates_history.window(currency, source, since=at - RAW_MAX_AGE)
+        index = bisect_right(raw.timestamps, at_ts)
+        if index:
+            return RateSample(int(raw.timestamps[index - 1]), raw.buy[index - 1],
+                              raw.sell[index - 1])
         
-        rates = history[currency][source]
-        filtered = [
-            r for r in rates 
-            if datetime.fromisoformat(r['timestamp']) > cutoff_time
-        ]
-        
-        return filtered
+        for tier, (seconds, _) in TIERS.items():
+            candles = self.rates_rollups.window(currency, source, tier)
+            index = bisect_right(candles.timestamps, at_ts - seconds)
+            if index:
+                return RateSample(candles.timestamps[index - 1], candles.buy[index - 1],
+                                  candles.sell[index - 1])
+        return None
+    
+    def compact_history(self) -> int:
+        """Удалить сырые замеры старше 48 часов и часовые свечи старше 90 дней"""
+        return self.rates_history.compact() + self.rates_rollups.compact()
     
     # === USER SETTINGS ===
     def get_user_language(self, user_id: int) -> str:
-        settings = self._read_json(self.user_settings_file)
+        settings = self._read_json(self._user_path('settings', user_id))
         return settings.get(str(user_id), {}).get('language', 'uk')
     
     def set_user_language(self, user_id: int, language: str):
-        settings = self._read_json(self.user_settings_file)
-        
-        if str(user_id) not in settings:
-            settings[str(user_id)] = {}
-        
-        settings[str(user_id)]['language'] = language
-        settings[str(user_id)]['updated'] = datetime.now().isoformat()
-        
-        self._write_json(self.user_settings_file, settings)
+        path = self._user_path('settings', user_id)
+        with self._lock:
+            settings = self._read_json(path)
+            
+            # Запись собирается целиком и подставляется одним присваиванием:
+            # читатели в других потоках не должны увидеть её наполовину
+            user_settings = dict(settings.get(str(user_id), {}))
+            user_settings['language'] = language
+            user_settings['updated'] = datetime.now().isoformat()
+            settings[str(user_id)] = user_settings
+            
+            self._write_json(path, settings)
     
     def get_all_users(self) -> List[int]:
-        settings = self._read_json(self.user_settings_file)
-        return [int(uid) for uid in settings.keys()]
+        return [user_id for user_id, _ in self.iter_user_languages()]
+    
+    def iter_user_languages(self) -> Iterator[Tuple[int, str]]:
+        """(user_id, язык) всех пользователей, шард за шардом"""
+        for settings in self._iter_shards('settings'):
+            for uid, user_settings in list(settings.items()):
+                yield int(uid), user_settings.get('language', 'uk')
     
     # === USER ALERTS ===
-    def get_user_alerts(self, user_id: int) -> List[Dict]:
-        alerts = self._read_json(self.user_alerts_file)
-        return alerts.get(str(user_id), [])
+    def get_user_alerts(self, user_id: int) -> List[Alert]:
+        alerts = self._read_json(self._user_path('alerts', user_id))
+        return list(alerts.get(str(user_id), []))
     
     def add_alert(self, user_id: int, currency: str, alert_type: str, 
-                  threshold: float):
-        alerts = self._read_json(self.user_alerts_file)
-        
-        if str(user_id) not in alerts:
-            alerts[str(user_id)] = []
-        
-        new_alert = {
-            'id': len(alerts[str(user_id)]) + 1,
-            'currency': currency,
-            'type': alert_type,  # 'percent' или 'price'
-            'threshold': threshold,
-            'active': True,
-            'created': datetime.now().isoformat()
-        }
-        
-        alerts[str(user_id)].append(new_alert)
-        self._write_json(self.user_alerts_file, alerts)
-        
-        return new_alert
+                  threshold: float) -> Alert:
+        path = self._user_path('alerts', user_id)
+        with self._lock:
+            alerts = self._read_json(path)
+            user_alerts = list(alerts.get(str(user_id), []))
+            
+            new_alert = Alert(
+                max([a.id for a in user_alerts], default=0) + 1,
+                currency,
+                alert_type,  # 'percent' или 'price'
+                threshold,
+                True,
+                datetime.now().isoformat()
+            )
+            
+            # Список заменяется, а не дописывается: читатели в других
+            # потоках могут как раз по нему итерироваться
+            user_alerts.append(new_alert)
+            alerts[str(user_id)] = user_alerts
+            self._write_json(path, alerts)
+            
+            return new_alert
     
     def delete_alert(self, user_id: int, alert_id: int):
-        alerts = self._read_json(self.user_alerts_file)
-        
-        if str(user_id) in alerts:
-            alerts[str(user_id)] = [
-                a for a in alerts[str(user_id)] 
-                if a.get('id') != alert_id
-            ]
-            self._write_json(self.user_alerts_file, alerts)
+        path = self._user_path('alerts', user_id)
+        with self._lock:
+            alerts = self._read_json(path)
+            
+            if str(user_id) in alerts:
+                alerts[str(user_id)] = [
+                    a for a in alerts[str(user_id)] 
+                    if a.id != alert_id
+                ]
+                self._write_json(path, alerts)
     
     def get_all_alerts(self) -> Dict:
-        return self._read_json(self.user_alerts_file)
-
-
-# Глобальный экземпляр
-storage = Storage()
+        return {str(user_id): alerts for user_id, alerts in self.iter_all_alerts()}
+    
+    def iter_all_alerts(self) -> Iterator[Tuple[int, List[Alert]]]:
+        """(user_id, alerts) всех пользователей, шард за шардом"""
+        for alerts in self._iter_shards('alerts'):
+            for uid, user_alerts in list(alerts.items()):
+                if user_alerts:
+                    yield int(uid), user_alerts
+    
+    # === МАССОВАЯ ЗАГРУЗКА (migrate.py) ===
+    def replace_exchangers(self, exchangers: List[Exchanger]):
+        self._write_json(self.exchangers_file, exchangers)
+    
+    def import_rates(self, records: List[tuple]):
+        """(currency, source, buy, sell, timestamp) по порядку времени"""
+        for currency, source, buy, sell, timestamp in records:
+            self.rates_history.append(currency, source, buy, sell, timestamp)
+            self.rates_rollups.add(currency, source, buy, sell, timestamp)
+    
+    def _import_user_values(self, kind: str, rows: List[Tuple[int, Any]]):
+        # Одна запись на каждый затронутый шард за пачку
+        with self.deferred_writes():
+            for user_id, value in rows:
+                path = self._user_path(kind, user_id)
+                data = self._read_json(path)
+                data[str(user_id)] = value
+                self._write_json(path, data)
+    
+    def import_user_settings(self, rows: List[Tuple[int, Dict]]):
+        self._import_user_values('settings', rows)
+    
+    def import_alerts(self, rows: List[Tuple[int, List[Alert]]]):
+        self._import_user_values('alerts', rows)
+    
+    def count_rows(self) -> Dict[str, int]:
+        """Число записей по разделам — для сверки после переноса"""
+        return {
+            'exchangers': len(self.get_exchangers()),
+            'rates': sum(1 for _ in self.rates_history.iter_records()),
+            'settings': sum(1 for _ in self.iter_user_languages()),
+            'alerts': sum(len(alerts) for _, alerts in self.iter_all_alerts())
+        }
+    
+    def vacuum(self):
+        """Сжать историю; файлы пользователей и так переписываются целиком"""
+        self.compact_history()
 
+def create_storage():
+    """
+    Создать хранилище согласно STORAGE_BACKEND.
+    
+    Глобального экземпляра нет: импорт модуля не трогает диск, хранилище
+    для бота создаётся в bot.py и передаётся в async_storage.
+    """
+    if STORAGE_BACKEND == 'sqlite':
+        from services.sqlite_storage import SQLiteStorage
+        return SQLiteStorage()
+    if STORAGE_BACKEND == 'memory':
+        from services.memory_storage import InMemoryStorage
+        return InMemoryStorage()
+    return Storage()